@@ -0,0 +1,92 @@
+"""
+JWT authentication with a cached user principal.
+
+Resolving the user behind a JWT costs a ``User`` query on every request.
+``CachedJWTAuthentication`` caches a compact principal (id, email, role,
+flags, company id and quotas) per user and rebuilds ``request.user`` from it,
+so steady-state requests don't query the database to authenticate. The
+rebuilt user is a regular ``User`` instance whose remaining fields are
+deferred: code that reads one of them loads it on first access, and
+``save()`` only writes the fields that were loaded.
+
+The principal records the user's token version, the password-hash claim
+simplejwt embeds when ``CHECK_REVOKE_TOKEN`` is enabled. Tokens carrying an
+older version are rejected without reaching the database. Entries are
+removed whenever the user is saved (profile edits, password changes,
+deactivation) or deleted; see ``authentication.signals``. Bulk
+``QuerySet.update()`` calls bypass those signals and must call
+``invalidate_principal`` themselves.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+KEY_PREFIX = 'auth:principal'
+PRINCIPAL_TIMEOUT = getattr(settings, 'AUTH_PRINCIPAL_CACHE_TIMEOUT', 300)
+PRINCIPAL_FIELDS = (
+    'id', 'email', 'first_name', 'last_name', 'role', 'is_active', 'is_staff', 'is_superuser',
+    'broker_company_id', 'daily_form_quota', 'monthly_form_quota',
+)
+
+
+def principal_key(user_id):
+    return f'{KEY_PREFIX}:{user_id}'
+
+
+def invalidate_principal(user_id):
+    """Drop the cached principal now and again once the current transaction commits."""
+    key = principal_key(user_id)
+    cache.delete(key)
+    # A request that read the old row before the commit may have re-cached it
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves users from a cached principal."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        principal = cache.get(principal_key(user_id))
+        if principal is None:
+            principal = self._load_principal(user_id)
+            cache.set(principal_key(user_id), principal, PRINCIPAL_TIMEOUT)
+
+        fields = principal['fields']
+        if not fields['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != principal['token_version']:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        # from_db() takes the loaded values in model field order
+        user_model = get_user_model()
+        names = [field.attname for field in user_model._meta.concrete_fields if field.attname in fields]
+        return user_model.from_db(user_model.objects.db, names, [fields[name] for name in names])
+
+    def _load_principal(self, user_id):
+        user_model = get_user_model()
+        row = (
+            user_model.objects
+            .filter(**{api_settings.USER_ID_FIELD: user_id})
+            .values_list(*PRINCIPAL_FIELDS, 'password')
+            .first()
+        )
+        if row is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        return {
+            'fields': dict(zip(PRINCIPAL_FIELDS, row[:-1])),
+            'token_version': get_md5_hash_password(row[-1]),
+        }
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from broker_pdf_filler.authentication.revocation import prune_expired_tokens, warm_revocation_cache
+from broker_pdf_filler.users.models import OneTimeToken
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired refresh tokens and one-time (verification, reset) tokens in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Number of tokens deleted per statement (default: 5000)')
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Reload the cached revocation set from the blacklist afterwards')
+
+    def handle(self, *args, **options):
+        outstanding, blacklisted = prune_expired_tokens(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {outstanding} expired outstanding tokens ({blacklisted} blacklisted)'
+        ))
+        one_time = OneTimeToken.objects.purge_expired(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {one_time} expired one-time tokens'))
+        if options['warm_cache']:
+            count = warm_revocation_cache()
+            self.stdout.write(self.style.SUCCESS(f'Cached {count} revoked tokens'))
@@ -0,0 +1,137 @@
+"""
+Refresh token revocation backed by the cache.
+
+simplejwt records revoked refresh tokens in the ``token_blacklist`` tables,
+which grow with every rotation and logout. Here revoked token ids (``jti``)
+are also written to the Django cache, with an expiry equal to the time the
+token has left to live, so the cache holds exactly the revocations that
+still matter. A revocation check is then a single cache lookup:
+
+- a hit means the token is revoked;
+- on a miss, the database is consulted (and a revocation found there is
+  cached again), unless ``JWT_REVOCATION_CACHE_AUTHORITATIVE`` is set.
+
+Treating a miss as "not revoked" is only safe while the cache holds every
+revocation: entries lost to a flush, restart or eviction, or tokens revoked
+before the cache was in use, would be accepted again. It is off by default.
+
+The database tables remain the durable record. ``warm_revocation_cache``
+reloads the cache from them (e.g. after the cache was flushed), and the
+``prune_tokens`` command removes rows for tokens that have expired.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+KEY_PREFIX = 'auth:revoked'
+CACHE_AUTHORITATIVE = getattr(settings, 'JWT_REVOCATION_CACHE_AUTHORITATIVE', False)
+
+
+def _key(jti):
+    return f'{KEY_PREFIX}:{jti}'
+
+
+def _remaining_seconds(expires_at):
+    return int((expires_at - aware_utcnow()).total_seconds()) + 1
+
+
+def mark_revoked(jti, expires_at):
+    """Add a token id to the cached revocation set until the token expires."""
+    timeout = _remaining_seconds(expires_at)
+    if timeout > 0:
+        cache.set(_key(jti), True, timeout)
+
+
+def is_revoked(jti):
+    """Return True if the refresh token with id ``jti`` has been revoked."""
+    if cache.get(_key(jti)):
+        return True
+    if CACHE_AUTHORITATIVE:
+        return False
+
+    blacklisted = (
+        BlacklistedToken.objects
+        .filter(token__jti=jti)
+        .values_list('token__expires_at', flat=True)
+        .first()
+    )
+    if blacklisted is None:
+        return False
+    mark_revoked(jti, blacklisted)
+    return True
+
+
+def warm_revocation_cache(chunk_size=5000):
+    """Load every revoked, unexpired token id into the cache; returns the count."""
+    count = 0
+    rows = (
+        BlacklistedToken.objects
+        .filter(token__expires_at__gt=aware_utcnow())
+        .values_list('token__jti', 'token__expires_at')
+        .iterator(chunk_size=chunk_size)
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            count += _store(batch)
+            batch = []
+    if batch:
+        count += _store(batch)
+    return count
+
+
+def _store(batch):
+    # set_many() takes one timeout, so group entries by remaining lifetime (in minutes)
+    groups = {}
+    for jti, expires_at in batch:
+        timeout = _remaining_seconds(expires_at)
+        if timeout > 0:
+            groups.setdefault(timeout // 60, {})[_key(jti)] = True
+    for minutes, entries in groups.items():
+        cache.set_many(entries, (minutes + 1) * 60)
+    return sum(len(entries) for entries in groups.values())
+
+
+def prune_expired_tokens(chunk_size=5000):
+    """Delete expired outstanding tokens and their blacklist entries in chunks.
+
+    Each chunk is deleted in its own short statement pair, so pruning a large
+    backlog doesn't hold locks on the tables for long. Returns
+    ``(outstanding, blacklisted)`` row counts.
+    """
+    outstanding = blacklisted = 0
+    expired = OutstandingToken.objects.filter(expires_at__lte=aware_utcnow()).order_by('id')
+    while True:
+        ids = list(expired.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return outstanding, blacklisted
+        blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+        outstanding += OutstandingToken.objects.filter(id__in=ids).delete()[0]
+
+
+class RevocableRefreshToken(RefreshToken):
+    """Refresh token whose blacklist checks go through the cached revocation set."""
+
+    def check_blacklist(self):
+        if is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        expires_at = datetime_from_epoch(self.payload['exp'])
+        token, created = OutstandingToken.objects.get_or_create(
+            jti=jti,
+            defaults={
+                'token': str(self),
+                'expires_at': expires_at,
+            },
+        )
+        result = BlacklistedToken.objects.get_or_create(token=token)
+        mark_revoked(jti, expires_at)
+        return result
@@ -1,15 +1,19 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenBlacklistSerializer
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer, TokenBlacklistSerializer, TokenRefreshSerializer
+)
 from rest_framework_simplejwt.tokens import RefreshToken
 from broker_pdf_filler.users.models import UserActivity
+from .revocation import RevocableRefreshToken
 
 User = get_user_model()
 
 
 class LoginSerializer(TokenObtainPairSerializer):
     """Custom login serializer that includes user data in response."""
+    token_class = RevocableRefreshToken
     
     def validate(self, attrs):
         """Validate credentials and add user data to token."""
@@ -135,6 +139,12 @@ class TokenRefreshResponseSerializer(serializers.Serializer):
         raise NotImplementedError()
 
 
+class RevocationAwareTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh that checks and records rotated tokens in the revocation set."""
+    token_class = RevocableRefreshToken
+
+
 class LogoutSerializer(TokenBlacklistSerializer):
     """Serializer for logout."""
-    pass 
\ No newline at end of file
+    token_class = RevocableRefreshToken
+ 
\ No newline at end of file
@@ -1,3 +1,17 @@
 """
 Signal handlers for the authentication app.
-""" 
\ No newline at end of file
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_principal
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_principal(sender, instance, **kwargs):
+    """Drop the cached JWT principal whenever a user changes or is deleted."""
+    invalidate_principal(instance.pk)
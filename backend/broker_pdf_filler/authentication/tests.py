@@ -1,12 +1,27 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APIClient
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
 from datetime import timedelta
-from broker_pdf_filler.users.models import UserActivity, BrokerCompany
+from broker_pdf_filler.users.models import OneTimeToken, UserActivity, BrokerCompany
+from broker_pdf_filler.utils.throttling import (
+    ScopedSlidingRateThrottle, UserSlidingRateThrottle, get_counter_store, parse_rate
+)
+from .backends import CachedJWTAuthentication
+from .revocation import RevocableRefreshToken, is_revoked, warm_revocation_cache
 
 User = get_user_model()
 
@@ -110,17 +125,12 @@ class AuthenticationTests(TestCase):
         ).exists())
         
         # Check that token was generated
-        self.user.refresh_from_db()
-        self.assertIsNotNone(self.user.reset_password_token)
-        self.assertIsNotNone(self.user.reset_password_token_expiry)
+        self.assertTrue(OneTimeToken.objects.filter(user=self.user, purpose='password_reset').exists())
     
     def test_password_reset_confirm(self):
         """Test password reset confirmation."""
         # Generate reset token
-        token = 'test-token'
-        self.user.reset_password_token = token
-        self.user.reset_password_token_expiry = timezone.now() + timedelta(hours=24)
-        self.user.save()
+        token = self.user.generate_password_reset_token()
         
         url = reverse('authentication:password_reset_confirm')
         data = {
@@ -138,12 +148,11 @@ class AuthenticationTests(TestCase):
             action='password_reset'
         ).exists())
         
-        # Check that token was cleared
-        self.user.refresh_from_db()
-        self.assertIsNone(self.user.reset_password_token)
-        self.assertIsNone(self.user.reset_password_token_expiry)
+        # Check that token was consumed
+        self.assertFalse(OneTimeToken.objects.filter(user=self.user).exists())
         
         # Check that new password works
+        self.user.refresh_from_db()
         self.assertTrue(self.user.check_password('newpassword123'))
     
     def test_password_change(self):
@@ -170,3 +179,183 @@ class AuthenticationTests(TestCase):
         # Check that new password works
         self.user.refresh_from_db()
         self.assertTrue(self.user.check_password('newpassword123'))
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Tests for JWT authentication with a cached user principal."""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='principal@example.com',
+            password='testpassword123',
+            role='standard'
+        )
+        self.auth = CachedJWTAuthentication()
+        self.factory = APIRequestFactory()
+    
+    def _authenticate(self, user=None):
+        token = AccessToken.for_user(user or self.user)
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return self.auth.authenticate(request)[0]
+    
+    def test_cached_principal_needs_no_queries(self):
+        user = self._authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        
+        with self.assertNumQueries(0):
+            user = self._authenticate()
+            self.assertEqual(user.role, 'standard')
+            self.assertEqual(user.daily_form_quota, 10)
+            self.assertTrue(user.is_authenticated)
+        
+        # Fields outside the principal are loaded on demand
+        self.assertIsNotNone(user.created_at)
+    
+    def test_save_invalidates_principal(self):
+        self._authenticate()
+        self.user.role = 'admin'
+        self.user.save()
+        self.assertEqual(self._authenticate().role, 'admin')
+    
+    def test_deactivated_user_rejected(self):
+        self._authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+    
+    def test_password_change_revokes_tokens(self):
+        token = AccessToken.for_user(self.user)
+        token[api_settings.REVOKE_TOKEN_CLAIM] = get_md5_hash_password(self.user.password)
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        
+        with mock.patch.object(api_settings, 'CHECK_REVOKE_TOKEN', True):
+            self.auth.authenticate(request)
+            
+            self.user.set_password('newpassword123')
+            self.user.save()
+            with self.assertRaises(AuthenticationFailed):
+                self.auth.authenticate(request)
+    
+    def test_bearer_request_end_to_end(self):
+        token = AccessToken.for_user(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = client.get(reverse('user-me'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], 'principal@example.com')
+
+
+class TokenRevocationTests(TestCase):
+    """Tests for cached refresh token revocation and pruning."""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='revocation@example.com',
+            password='testpassword123'
+        )
+        self.client = APIClient()
+    
+    def test_rotated_refresh_token_is_revoked(self):
+        refresh = str(RevocableRefreshToken.for_user(self.user))
+        url = reverse('authentication:token_refresh')
+        
+        response = self.client.post(url, {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('refresh', response.data)
+        
+        # The cached revocation set answers without touching the database
+        with self.assertNumQueries(0):
+            self.assertTrue(is_revoked(RefreshToken(refresh, verify=False)['jti']))
+        
+        response = self.client.post(url, {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_logout_revokes_token_after_cache_loss(self):
+        refresh = str(RevocableRefreshToken.for_user(self.user))
+        response = self.client.post(reverse('authentication:logout'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        # The blacklist table is still checked when the cache lost the entry
+        cache.clear()
+        response = self.client.post(
+            reverse('authentication:token_refresh'), {'refresh': refresh}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(warm_revocation_cache(), 1)
+    
+    def test_prune_tokens_deletes_expired_rows(self):
+        expired = timezone.now() - timedelta(days=1)
+        for index in range(5):
+            token = OutstandingToken.objects.create(
+                user=self.user, jti=f'expired-{index}', token='x', expires_at=expired
+            )
+            if index % 2 == 0:
+                BlacklistedToken.objects.create(token=token)
+        RevocableRefreshToken.for_user(self.user)
+        self.user.generate_password_reset_token()
+        OneTimeToken.objects.update(expires_at=expired)
+        
+        out = StringIO()
+        call_command('prune_tokens', chunk_size=2, stdout=out)
+        self.assertIn('Deleted 5 expired outstanding tokens (3 blacklisted)', out.getvalue())
+        self.assertIn('Deleted 1 expired one-time tokens', out.getvalue())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class SlidingWindowThrottleTests(TestCase):
+    """Tests for the sliding-window throttles."""
+    
+    def setUp(self):
+        get_counter_store().clear()
+    
+    def tearDown(self):
+        get_counter_store().clear()
+    
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/m'), (10, 60))
+        self.assertEqual(parse_rate('5/15m'), (5, 900))
+        self.assertEqual(parse_rate('100/day'), (100, 86400))
+        with self.assertRaises(ImproperlyConfigured):
+            parse_rate('ten/m')
+    
+    def test_previous_window_is_weighted(self):
+        class Throttle(UserSlidingRateThrottle):
+            rate = '10/m'
+            now = 0
+            
+            def timer(self):
+                return self.now
+        
+        request = APIRequestFactory().get('/')
+        request.user = User(pk='8b53c695-de48-4a5e-8d41-b013c777e52f')
+        throttle = Throttle()
+        
+        # 10 requests at the end of one window; rejected retries aren't counted
+        Throttle.now = 59
+        self.assertTrue(all(throttle.allow_request(request, None) for _ in range(10)))
+        self.assertFalse(any(throttle.allow_request(request, None) for _ in range(5)))
+        self.assertAlmostEqual(throttle.wait(), 7)  # Until 10 * (1 - t) + 1 <= 10 in the next window
+        
+        # A quarter into the next window, 3/4 of those 10 hits still count
+        Throttle.now = 75
+        self.assertTrue(throttle.allow_request(request, None))
+        self.assertTrue(throttle.allow_request(request, None))
+        self.assertFalse(throttle.allow_request(request, None))
+        self.assertAlmostEqual(throttle.wait(), 3)
+        
+        # Retrying after Retry-After is let back in
+        Throttle.now = 75 + throttle.wait()
+        self.assertTrue(throttle.allow_request(request, None))
+    
+    def test_login_throttled_per_ip(self):
+        url = reverse('authentication:login')
+        data = {'email': 'nobody@example.com', 'password': 'wrongpassword'}
+        with mock.patch.dict(ScopedSlidingRateThrottle.THROTTLE_RATES, {'login': '3/m'}):
+            statuses = [self.client.post(url, data, format='json').status_code for _ in range(4)]
+            response = self.client.post(url, data, format='json', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(statuses, [401, 401, 401, 429])
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -4,20 +4,18 @@ from django.utils.translation import gettext_lazy as _
 from rest_framework import status, views, permissions
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenBlacklistView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
-from django.core.mail import send_mail
+from django.db import transaction
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
-from django.utils.crypto import get_random_string
-from django.utils import timezone
-from datetime import timedelta
 from .serializers import (
     LoginSerializer, PasswordResetRequestSerializer, PasswordResetConfirmSerializer,
     PasswordChangeSerializer, LogoutSerializer, TokenRefreshResponseSerializer
 )
-from broker_pdf_filler.users.models import UserActivity
+from broker_pdf_filler.users.models import OneTimeToken, UserActivity
+from broker_pdf_filler.users.outbox import queue_email
+from .revocation import RevocableRefreshToken
 
 User = get_user_model()
 
@@ -25,6 +23,7 @@ User = get_user_model()
 class LoginView(TokenObtainPairView):
     """Custom login view that includes user data in response."""
     serializer_class = LoginSerializer
+    throttle_scope = 'login'
 
 
 class LogoutView(TokenBlacklistView):
@@ -36,7 +35,7 @@ class LogoutView(TokenBlacklistView):
         """Handle logout request."""
         try:
             # Track logout activity before blacklisting token
-            refresh = RefreshToken(request.data.get('refresh'))
+            refresh = RevocableRefreshToken(request.data.get('refresh'))
             user = User.objects.get(id=refresh['user_id'])
             
             UserActivity.objects.create(
@@ -83,38 +82,28 @@ class PasswordResetRequestView(views.APIView):
         email = serializer.validated_data['email']
         try:
             user = User.objects.get(email=email)
-            token = self._generate_password_reset_token()
             
-            # Store token and expiry in user model
-            user.reset_password_token = token
-            user.reset_password_token_expiry = timezone.now() + timedelta(hours=24)
-            user.save(update_fields=['reset_password_token', 'reset_password_token_expiry'])
-            
-            # Track password reset request activity
-            UserActivity.objects.create(
-                user=user,
-                action='password_reset_request',
-                ip_address=self._get_client_ip(request)
-            )
-            
-            # Send password reset email
-            try:
-                self._send_password_reset_email(user, token)
-            except Exception as e:
-                # Log the error but don't expose it to the user
-                print(f"Error sending password reset email: {str(e)}")
+            with transaction.atomic():
+                # Only the token's digest is stored; the plaintext goes in the email
+                token = OneTimeToken.objects.issue(user, 'password_reset')
+                
+                # Track password reset request activity
+                UserActivity.objects.create(
+                    user=user,
+                    action='password_reset_request',
+                    ip_address=self._get_client_ip(request)
+                )
+                
+                # Queue the password reset email; the outbox sender delivers it
+                self._queue_password_reset_email(user, token)
             
             return Response({"detail": _("Password reset email sent if account exists.")})
         except User.DoesNotExist:
             # Return success even if user doesn't exist for security
             return Response({"detail": _("Password reset email sent if account exists.")})
     
-    def _generate_password_reset_token(self):
-        """Generate a random token for password reset."""
-        return get_random_string(64)
-    
-    def _send_password_reset_email(self, user, token):
-        """Send password reset email to user."""
+    def _queue_password_reset_email(self, user, token):
+        """Queue the password reset email to user in the outbox."""
         subject = _('Password Reset Request')
         reset_url = f"{settings.FRONTEND_URL}/reset-password?token={token}"
         
@@ -127,13 +116,11 @@ class PasswordResetRequestView(views.APIView):
         )
         plain_message = strip_tags(html_message)
         
-        send_mail(
+        queue_email(
             subject,
             plain_message,
-            settings.DEFAULT_FROM_EMAIL,
             [user.email],
-            html_message=html_message,
-            fail_silently=False,
+            html_body=html_message,
         )
     
     def _get_client_ip(self, request):
@@ -157,16 +144,17 @@ class PasswordResetConfirmView(views.APIView):
         serializer.is_valid(raise_exception=True)
         
         token = serializer.validated_data['token']
-        try:
-            user = User.objects.get(
-                reset_password_token=token,
-                reset_password_token_expiry__gt=timezone.now()
-            )
+        with transaction.atomic():
+            user_id = OneTimeToken.objects.consume(token, 'password_reset')
+            if user_id is None:
+                return Response(
+                    {"detail": _("Invalid or expired token.")},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            user = User.objects.get(pk=user_id)
             
             # Set new password
             user.set_password(serializer.validated_data['new_password'])
-            user.reset_password_token = None
-            user.reset_password_token_expiry = None
             user.save()
             
             # Track password reset activity
@@ -175,13 +163,8 @@ class PasswordResetConfirmView(views.APIView):
                 action='password_reset',
                 ip_address=self._get_client_ip(request)
             )
-            
-            return Response({"detail": _("Password reset successful.")})
-        except User.DoesNotExist:
-            return Response(
-                {"detail": _("Invalid or expired token.")},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        
+        return Response({"detail": _("Password reset successful.")})
     
     def _get_client_ip(self, request):
         """Extract client IP address from request."""
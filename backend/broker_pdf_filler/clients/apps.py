@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ClientsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'broker_pdf_filler.clients'
+
+    def ready(self):
+        """Import signals when app is ready."""
+        import broker_pdf_filler.clients.signals
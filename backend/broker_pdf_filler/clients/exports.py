@@ -0,0 +1,154 @@
+"""
+Streaming client export.
+
+Rows are read with ``values_list(...).iterator()`` so only one chunk of tuples
+is held in memory at a time, formatted without instantiating ``Client``
+objects, and written straight into a ``StreamingHttpResponse`` (optionally
+gzip-compressed on the fly).
+"""
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Client
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Rows are buffered up to roughly this many bytes before being yielded
+STREAM_BUFFER_SIZE = 64 * 1024
+
+ADDRESS_FIELDS = ['address_line1', 'address_line2', 'city', 'state', 'postal_code', 'country']
+
+
+def _created_date(created_at):
+    return created_at.strftime('%Y-%m-%d')
+
+
+# column key -> (CSV header, source fields, formatter taking the field values)
+EXPORT_COLUMNS = {
+    'id': ('ID', ['id'], str),
+    'full_name': ('Full Name', ['first_name', 'last_name'], lambda first, last: f"{first} {last}"),
+    'first_name': ('First Name', ['first_name'], None),
+    'last_name': ('Last Name', ['last_name'], None),
+    'id_number': ('ID Number', ['id_number'], None),
+    'email': ('Email', ['email'], None),
+    'phone_number': ('Phone', ['phone_number'], None),
+    'address': ('Address', ADDRESS_FIELDS, Client.format_address),
+    'city': ('City', ['city'], None),
+    'country': ('Country', ['country'], None),
+    'date_of_birth': ('Date of Birth', ['date_of_birth'], None),
+    'gender': ('Gender', ['gender'], None),
+    'marital_status': ('Marital Status', ['marital_status'], None),
+    'nationality': ('Nationality', ['nationality'], None),
+    'occupation': ('Occupation', ['occupation'], None),
+    'employer': ('Employer', ['employer'], None),
+    'is_active': ('Active', ['is_active'], None),
+    'created_at': ('Created Date', ['created_at'], _created_date),
+}
+
+DEFAULT_EXPORT_COLUMNS = [
+    'id', 'full_name', 'id_number', 'email', 'phone_number',
+    'address', 'city', 'country', 'created_at'
+]
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+
+class _Echo:
+    """File-like object whose write() just returns the value (see Django's CSV streaming docs)."""
+
+    def write(self, value):
+        return value
+
+
+class ClientExporter:
+    """Formats a client queryset as a stream of CSV or JSON Lines chunks."""
+
+    def __init__(self, queryset, columns=None, export_format='csv', compress=False):
+        self.columns = columns or DEFAULT_EXPORT_COLUMNS
+        unknown = [column for column in self.columns if column not in EXPORT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+
+        self.queryset = queryset
+        self.export_format = export_format
+        self.compress = compress
+
+        # Fetch each source field once, even if several columns share it
+        self.fields = []
+        for column in self.columns:
+            for field in EXPORT_COLUMNS[column][1]:
+                if field not in self.fields:
+                    self.fields.append(field)
+        self._plan = [
+            (column, [self.fields.index(f) for f in EXPORT_COLUMNS[column][1]], EXPORT_COLUMNS[column][2])
+            for column in self.columns
+        ]
+
+    @property
+    def content_type(self):
+        if self.compress:
+            return 'application/gzip'
+        return EXPORT_FORMATS[self.export_format][0]
+
+    @property
+    def filename_extension(self):
+        extension = EXPORT_FORMATS[self.export_format][1]
+        return f"{extension}.gz" if self.compress else extension
+
+    def _values(self, row):
+        for column, positions, formatter in self._plan:
+            values = [row[position] for position in positions]
+            if formatter is not None:
+                yield column, formatter(*values)
+            else:
+                yield column, values[0]
+
+    def _rows(self):
+        return self.queryset.values_list(*self.fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    def _lines(self):
+        if self.export_format == 'csv':
+            writer = csv.writer(_Echo())
+            yield writer.writerow([EXPORT_COLUMNS[column][0] for column in self.columns])
+            for row in self._rows():
+                yield writer.writerow([value for _, value in self._values(row)])
+        else:
+            for row in self._rows():
+                yield json.dumps(dict(self._values(row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+    def _buffered(self):
+        """Group small lines into larger chunks to keep per-chunk overhead low."""
+        buffer = []
+        size = 0
+        for line in self._lines():
+            data = line.encode('utf-8')
+            buffer.append(data)
+            size += len(data)
+            if size >= STREAM_BUFFER_SIZE:
+                yield b''.join(buffer)
+                buffer = []
+                size = 0
+        if buffer:
+            yield b''.join(buffer)
+
+    def stream(self):
+        """Yield the encoded (and optionally gzip-compressed) export."""
+        if not self.compress:
+            yield from self._buffered()
+            return
+
+        # wbits=31 produces a gzip container rather than a raw zlib stream
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in self._buffered():
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
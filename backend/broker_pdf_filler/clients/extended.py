@@ -0,0 +1,165 @@
+"""
+Extended client attributes.
+
+Standardized fields that have no column on ``Client`` (``fullNameChinese``,
+``DOB_D``, ``birthplace``, ...) are stored in the ``Client.extended_data``
+JSONB document, keyed by their standardized field key. The document is GIN
+indexed, so containment (``extended_data__contains``) and key existence
+(``extended_data__has_key``) lookups are served by the index. Other databases
+fall back to portable key lookups.
+"""
+from functools import lru_cache
+
+from django.db import connections, transaction
+from django.db.models import F, Func, JSONField, TextField, Value
+from django.contrib.postgres.fields import ArrayField
+from django.utils import timezone
+from rest_framework import serializers
+
+from ..utils.standardized_fields import get_standardized_fields
+
+# Standardized fields stored in (or derived from) regular Client columns
+CLIENT_COLUMN_FIELDS = {
+    'fullName': None,
+    'firstName': 'first_name',
+    'lastName': 'last_name',
+    'dateOfBirth': 'date_of_birth',
+    'idNumber': 'id_number',
+    'nationality': 'nationality',
+    'gender': 'gender',
+    'maritalStatus': 'marital_status',
+    'phoneNumber': 'phone_number',
+    'email': 'email',
+    'fullAddress': None,
+    'exployerName': 'employer',
+    'occupation': 'occupation',
+    'officeFullAddress': 'work_address',
+    'taxResidency': 'tax_residency',
+    'monthlyExpenses': 'monthly_expenses',
+    'paymentMethod': 'payment_method',
+    'paymentPeriod': 'payment_period',
+}
+
+# Registry categories that describe someone other than the client
+NON_CLIENT_CATEGORIES = {'Advisor Information'}
+
+MAX_VALUE_LENGTH = 1000
+
+
+@lru_cache(maxsize=1)
+def extended_field_names():
+    """Return the standardized field keys that belong in ``extended_data``."""
+    return frozenset(
+        key for key, definition in get_standardized_fields().items()
+        if key not in CLIENT_COLUMN_FIELDS
+        and definition.get('category') not in NON_CLIENT_CATEGORIES
+    )
+
+
+def validate_extended_data(data, allow_null=False):
+    """Validate an ``extended_data`` document (or a patch when ``allow_null``).
+
+    Keys must be extended standardized fields and values must be scalars;
+    in a patch, ``None`` means "remove this key".
+    """
+    if not isinstance(data, dict):
+        raise serializers.ValidationError('Expected an object of standardized field values.')
+
+    allowed = extended_field_names()
+    errors = {}
+    for key, value in data.items():
+        if key not in allowed:
+            if key in CLIENT_COLUMN_FIELDS:
+                errors[key] = ['This field is stored on the client record, not in extended data.']
+            else:
+                errors[key] = ['Unknown standardized field.']
+        elif value is None:
+            if not allow_null:
+                errors[key] = ['This field may not be null.']
+        elif isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            errors[key] = ['Expected a string or number.']
+        elif isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+            errors[key] = [f'Ensure this field has no more than {MAX_VALUE_LENGTH} characters.']
+    if errors:
+        raise serializers.ValidationError(errors)
+    return data
+
+
+def extract_extended_data(client_data):
+    """Pick extended standardized fields out of ad-hoc batch ``client_data``.
+
+    Values may be given at the top level or under ``client``; empty values
+    are ignored.
+    """
+    if not isinstance(client_data, dict):
+        return {}
+    allowed = extended_field_names()
+    found = {}
+    sources = [client_data]
+    if isinstance(client_data.get('client'), dict):
+        sources.append(client_data['client'])
+    for source in sources:
+        for key, value in source.items():
+            if key in allowed and isinstance(value, (str, int, float)) and not isinstance(value, bool):
+                if value != '':
+                    found[key] = value
+    return found
+
+
+class JSONBConcat(Func):
+    """``jsonb || jsonb``: set keys in a document."""
+    arg_joiner = ' || '
+    template = '(%(expressions)s)'
+    output_field = JSONField()
+
+
+class JSONBDeleteKeys(Func):
+    """``jsonb - text[]``: remove keys from a document."""
+    arg_joiner = ' - '
+    template = '(%(expressions)s)'
+    output_field = JSONField()
+
+
+def filter_extended_data(queryset, key, value):
+    """Filter ``queryset`` to clients whose extended attribute ``key`` equals ``value``."""
+    if connections[queryset.db].vendor == 'postgresql':
+        # Containment is served by the GIN index; a key lookup is not
+        return queryset.filter(extended_data__contains={key: value})
+    return queryset.filter(**{f'extended_data__{key}': value})
+
+
+def patch_extended_data(queryset, changes):
+    """Set and remove individual ``extended_data`` keys in a single UPDATE.
+
+    ``changes`` maps keys to new values, or to ``None`` to remove them. On
+    PostgreSQL the merge runs in the database, so only the changed keys are
+    sent and concurrent patches to different keys do not overwrite each other.
+    Returns the number of clients updated.
+    """
+    updates = {key: value for key, value in changes.items() if value is not None}
+    removals = [key for key, value in changes.items() if value is None]
+
+    if connections[queryset.db].vendor != 'postgresql':
+        return _patch_in_python(queryset, updates, removals)
+
+    document = F('extended_data')
+    if updates:
+        document = JSONBConcat(document, Value(updates, output_field=JSONField()))
+    if removals:
+        document = JSONBDeleteKeys(document, Value(removals, output_field=ArrayField(TextField())))
+    return queryset.update(extended_data=document, updated_at=timezone.now())
+
+
+def _patch_in_python(queryset, updates, removals):
+    """Read-modify-write fallback for databases without jsonb operators."""
+    count = 0
+    with transaction.atomic(using=queryset.db):
+        for client in queryset.select_for_update():
+            data = dict(client.extended_data or {})
+            data.update(updates)
+            for key in removals:
+                data.pop(key, None)
+            client.extended_data = data
+            client.save(update_fields=['extended_data', 'updated_at'])
+            count += 1
+    return count
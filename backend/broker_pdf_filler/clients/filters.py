@@ -0,0 +1,12 @@
+from rest_framework import filters
+from .search import search_clients
+
+
+class ClientSearchFilter(filters.SearchFilter):
+    """SearchFilter that uses the indexed client search instead of icontains scans."""
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        if not text.strip():
+            return queryset
+        return search_clients(queryset, text)
@@ -0,0 +1,243 @@
+"""
+Bulk client import.
+
+Uploads are parsed as a stream of CSV or JSON Lines records and processed in
+chunks: every row in a chunk is validated in memory, ID-number uniqueness is
+checked with a single ``id_number__in`` query per chunk, and the valid rows
+are written with one ``bulk_create``. Rows that fail are collected into a
+per-row error report instead of aborting the import.
+"""
+import csv
+import io
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Client, ClientImport
+from .search import update_search_vectors
+from .serializers import ClientImportRowSerializer
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+
+SYNC_MAX_BYTES = getattr(settings, 'CLIENT_IMPORT_SYNC_MAX_BYTES', 1024 * 1024)
+
+# Only the first errors are kept in the report; error_count has the total
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_format(filename):
+    """Guess the import format from a file name, defaulting to CSV."""
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+
+def iter_records(stream, file_format):
+    """Yield ``(row number, record dict)`` from a binary file-like object.
+
+    Records are read one at a time so the whole upload is never held in
+    memory. Row numbers count data records from 1 (the CSV header is not a
+    row). A JSON Lines record that cannot be parsed is yielded as ``None``.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if file_format == 'csv':
+            for number, record in enumerate(csv.DictReader(text), start=1):
+                # Empty cells mean "not provided" rather than an empty value
+                yield number, {
+                    key.strip(): value.strip()
+                    for key, value in record.items()
+                    if key and value not in (None, '')
+                }
+        else:
+            number = 0
+            for line in text:
+                if not line.strip():
+                    continue
+                number += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield number, record if isinstance(record, dict) else None
+    finally:
+        # Leave the underlying upload open for the caller to close
+        text.detach()
+
+
+class ClientImporter:
+    """Validates and writes client records for one user in chunks."""
+
+    def __init__(self, user, chunk_size=IMPORT_CHUNK_SIZE, on_progress=None):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        self.processed_rows = 0
+        self.created_count = 0
+        self.error_count = 0
+        self.errors = []
+        # ID numbers already claimed earlier in this file
+        self._seen_id_numbers = set()
+
+    def run(self, records):
+        """Import an iterable of ``(row number, record)`` pairs."""
+        chunk = []
+        for item in records:
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                self._process_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._process_chunk(chunk)
+        return self
+
+    def _add_error(self, row, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'errors': errors})
+
+    def _validate(self, chunk):
+        """Return ``[(row number, validated data)]`` for rows that pass field validation."""
+        valid = []
+        for row, record in chunk:
+            if record is None:
+                self._add_error(row, {'non_field_errors': ['Invalid JSON record.']})
+                continue
+            serializer = ClientImportRowSerializer(data=record)
+            if not serializer.is_valid():
+                self._add_error(row, {
+                    field: [str(message) for message in messages]
+                    for field, messages in serializer.errors.items()
+                })
+                continue
+            valid.append((row, serializer.validated_data))
+        return valid
+
+    def _process_chunk(self, chunk):
+        valid = self._validate(chunk)
+
+        # One query for the whole chunk instead of an exists() per row
+        existing = set(
+            Client.objects.filter(id_number__in=[data['id_number'] for _, data in valid])
+            .values_list('id_number', flat=True)
+        )
+
+        clients = []
+        for row, data in valid:
+            id_number = data['id_number']
+            if id_number in existing:
+                self._add_error(row, {'id_number': ['A client with this ID number already exists.']})
+            elif id_number in self._seen_id_numbers:
+                self._add_error(row, {'id_number': ['Duplicate ID number within the import file.']})
+            else:
+                self._seen_id_numbers.add(id_number)
+                clients.append((row, Client(user=self.user, **data)))
+
+        self._write(clients)
+        self.processed_rows += len(chunk)
+        if self.on_progress:
+            self.on_progress(self)
+
+    def _write(self, clients):
+        if not clients:
+            return
+        try:
+            with transaction.atomic():
+                Client.objects.bulk_create([client for _, client in clients])
+        except IntegrityError:
+            # A row conflicts with data written concurrently (typically a client
+            # with the same ID number); write the rows one by one so only the
+            # conflicting ones fail.
+            self._write_rows(clients)
+            return
+
+        # bulk_create bypasses Client.save(), which maintains search_vector
+        update_search_vectors(Client.objects.filter(pk__in=[client.pk for _, client in clients]))
+        self.created_count += len(clients)
+
+    def _write_rows(self, clients):
+        for row, client in clients:
+            try:
+                with transaction.atomic():
+                    client.save(force_insert=True)
+            except IntegrityError as e:
+                if Client.objects.filter(id_number=client.id_number).exists():
+                    self._add_error(row, {'id_number': ['A client with this ID number already exists.']})
+                else:
+                    logger.warning(f"Error importing row {row} for user {self.user.pk}: {str(e)}")
+                    self._add_error(row, {'non_field_errors': ['The client could not be saved.']})
+                continue
+            self.created_count += 1
+
+
+class ClientImportService:
+    """Service for running import jobs inline or in the background."""
+
+    @staticmethod
+    def run(job, stream):
+        """Run ``job`` against an open binary stream, recording progress on the job."""
+        def record_progress(importer):
+            ClientImport.objects.filter(pk=job.pk).update(
+                processed_rows=importer.processed_rows,
+                created_count=importer.created_count,
+                error_count=importer.error_count,
+            )
+
+        job.status = 'processing'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+
+        importer = ClientImporter(job.user, on_progress=record_progress)
+        try:
+            importer.run(iter_records(stream, job.file_format))
+        except Exception as e:
+            logger.error(f"Error importing clients for job {job.id}: {str(e)}", exc_info=True)
+            job.status = 'failed'
+            job.error_message = str(e)
+        else:
+            job.status = 'completed'
+
+        job.processed_rows = importer.processed_rows
+        job.created_count = importer.created_count
+        job.error_count = importer.error_count
+        job.errors = importer.errors
+        job.completed_at = timezone.now()
+        job.save()
+        return job
+
+    @staticmethod
+    def run_stored(job_id):
+        """Run a job from its stored upload, then delete the upload."""
+        job = ClientImport.objects.select_related('user').get(pk=job_id)
+        try:
+            with job.file.open('rb') as stream:
+                ClientImportService.run(job, stream)
+        finally:
+            # The upload holds client PII and is not needed once imported
+            job.file.delete(save=False)
+            ClientImport.objects.filter(pk=job.pk).update(file='')
+
+    @staticmethod
+    def start_background(job):
+        """Process a stored upload on a background thread."""
+        def target():
+            try:
+                ClientImportService.run_stored(job.pk)
+            except Exception as e:
+                logger.error(f"Background client import {job.pk} failed: {str(e)}", exc_info=True)
+                ClientImport.objects.filter(pk=job.pk).exclude(status='completed').update(
+                    status='failed', error_message=str(e), completed_at=timezone.now()
+                )
+            finally:
+                # Threads get their own connection, which Django won't close for us
+                connection.close()
+
+        thread = threading.Thread(target=target, name=f'client-import-{job.pk}', daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,104 @@
+import random
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Q
+from broker_pdf_filler.clients.models import Client
+from broker_pdf_filler.clients.search import search_clients, update_search_vectors, has_trigram_support
+
+User = get_user_model()
+
+FIRST_NAMES = ['John', 'Mary', 'Wing', 'Ka Ming', 'Siu Fung', 'Peter', 'Grace', 'Chi Keung', 'Mei Ling', 'David']
+LAST_NAMES = ['Chan', 'Wong', 'Lee', 'Cheung', 'Lau', 'Ng', 'Ho', 'Leung', 'Tam', 'Yip']
+CITIES = ['Hong Kong', 'Kowloon', 'Sha Tin', 'Tsuen Wan', 'Tuen Mun']
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks client search at increasing table sizes (all data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 50000, 500000],
+                            help='Client counts to benchmark at')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        sizes = sorted(options['sizes'])
+        self.stdout.write(
+            f'Database: {connection.vendor}, pg_trgm: {"yes" if has_trigram_support() else "no"}'
+        )
+
+        with transaction.atomic():
+            user = User.objects.create_user(email='search-benchmark@example.com', password=None)
+            inserted = 0
+            for size in sizes:
+                inserted = self._insert_clients(user, inserted, size, options['batch_size'])
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE clients_client')
+                self._run_queries(user, size)
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished; generated clients were rolled back'))
+
+    def _insert_clients(self, user, start, end, batch_size):
+        rng = random.Random(start)
+        for offset in range(start, end, batch_size):
+            batch = [
+                Client(
+                    user=user,
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    date_of_birth=date(1960 + n % 40, 1 + n % 12, 1 + n % 28),
+                    gender=rng.choice('MF'),
+                    marital_status='single',
+                    id_number=f'BM{n:08d}',
+                    nationality='Hong Kong',
+                    phone_number=f'+852{rng.randint(50000000, 99999999)}',
+                    email=f'client{n}@example.com',
+                    address_line1=f'{n} Nathan Road',
+                    city=rng.choice(CITIES),
+                    state='Hong Kong',
+                    postal_code='999077',
+                    country='Hong Kong',
+                )
+                for n in range(offset, min(offset + batch_size, end))
+            ]
+            Client.objects.bulk_create(batch)
+        update_search_vectors(Client.objects.filter(user=user, search_vector__isnull=True))
+        return end
+
+    def _run_queries(self, user, size):
+        queryset = Client.objects.filter(user=user)
+        queries = {
+            'name': 'Chan',
+            'full name': 'Mei Ling Wong',
+            'id prefix': f'BM{size // 2:08d}'[:7],
+            'phone fragment': '852912',
+        }
+        self.stdout.write(f'\n{size} clients')
+        for label, text in queries.items():
+            indexed = self._time(
+                lambda: list(search_clients(queryset, text).order_by('-search_rank')[:20])
+            )
+            legacy = self._time(lambda: list(queryset.filter(
+                Q(first_name__icontains=text) | Q(last_name__icontains=text) |
+                Q(id_number__icontains=text) | Q(email__icontains=text) |
+                Q(phone_number__icontains=text)
+            )[:20]))
+            self.stdout.write(
+                f'  {label:<15} indexed {indexed:8.1f} ms   icontains {legacy:8.1f} ms'
+            )
+
+    def _time(self, func):
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
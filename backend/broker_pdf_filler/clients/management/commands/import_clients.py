@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from broker_pdf_filler.clients.imports import ClientImporter, IMPORT_CHUNK_SIZE, detect_format, iter_records
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Bulk imports clients for a user from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='CSV or JSON Lines file to import')
+        parser.add_argument('email', type=str, help='Email of the user who will own the clients')
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'jsonl'],
+                            help='File format (default: guessed from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Rows per chunk')
+        parser.add_argument('--show-errors', type=int, default=20,
+                            help='Number of row errors to print (default: 20)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"User with email {options['email']} does not exist")
+
+        file_format = options['file_format'] or detect_format(options['path'])
+        started = time.perf_counter()
+
+        def report(importer):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{importer.processed_rows} rows processed, {importer.created_count} created, '
+                f'{importer.error_count} errors ({importer.processed_rows / elapsed * 60:,.0f} rows/min)'
+            )
+
+        importer = ClientImporter(user, chunk_size=options['chunk_size'], on_progress=report)
+        try:
+            with open(options['path'], 'rb') as stream:
+                importer.run(iter_records(stream, file_format))
+        except OSError as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+
+        for error in importer.errors[:options['show_errors']]:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']}: {error['errors']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.created_count} of {importer.processed_rows} rows '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
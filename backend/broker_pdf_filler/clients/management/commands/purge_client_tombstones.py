@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from broker_pdf_filler.clients.sync import purge_tombstones, TOMBSTONE_RETENTION_DAYS
+
+
+class Command(BaseCommand):
+    help = 'Deletes client tombstones older than the delta-sync retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=TOMBSTONE_RETENTION_DAYS,
+                            help=f'Retention period in days (default: {TOMBSTONE_RETENTION_DAYS})')
+
+    def handle(self, *args, **options):
+        deleted = purge_tombstones(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} client tombstones'))
@@ -0,0 +1,68 @@
+# Generated by Django 5.1 on 2026-10-19 04:45
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+TRIGRAM_INDEXES = {
+    'clients_cli_first_n_trgm_idx': 'first_name',
+    'clients_cli_last_na_trgm_idx': 'last_name',
+    'clients_cli_id_numb_trgm_idx': 'id_number',
+    'clients_cli_phone_n_trgm_idx': 'phone_number',
+}
+
+SEARCH_VECTOR_SQL = """
+    UPDATE clients_client SET search_vector =
+        setweight(to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(id_number, '') || ' ' || coalesce(phone_number, '') || ' ' || coalesce(email, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(occupation, '') || ' ' || coalesce(employer, '')), 'C')
+"""
+
+
+def create_search_indexes(apps, schema_editor):
+    """Create the GIN indexes and backfill vectors (PostgreSQL only)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(SEARCH_VECTOR_SQL)
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS clients_cli_search__gin_idx '
+            'ON clients_client USING gin (search_vector)'
+        )
+
+        # Trigram indexes need the pg_trgm contrib extension; search degrades
+        # to full-text plus icontains where it cannot be installed.
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for index_name, column in TRIGRAM_INDEXES.items():
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {index_name} '
+                f'ON clients_client USING gin ({column} gin_trgm_ops)'
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for index_name in ['clients_cli_search__gin_idx', *TRIGRAM_INDEXES]:
+            cursor.execute(f'DROP INDEX IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-19 04:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_client_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='client',
+            name='clients_cli_user_id_370815_idx',
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='clients_cli_user_id_cbcada_idx'),
+        ),
+    ]
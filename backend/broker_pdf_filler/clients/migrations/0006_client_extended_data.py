@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-19 05:02
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0005_client_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='extended_data',
+            field=models.JSONField(blank=True, default=dict, verbose_name='extended data'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['extended_data'], name='client_extended_data_gin'),
+        ),
+    ]
@@ -1,8 +1,12 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 import uuid
 
+from .search import SEARCH_VECTOR_WEIGHTS, update_search_vectors
+
 class Client(models.Model):
     """Model to store client information."""
     
@@ -55,24 +59,42 @@ class Client(models.Model):
     payment_method = models.CharField(_('payment method'), max_length=50, blank=True)
     payment_period = models.CharField(_('payment period'), max_length=50, blank=True)
     
+    # Standardized fields without a column of their own, keyed by field key
+    # (see clients.extended); GIN indexed for containment and key lookups
+    extended_data = models.JSONField(_('extended data'), default=dict, blank=True)
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     
+    # Weighted full-text vector maintained on write; GIN indexed on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     class Meta:
         verbose_name = _('client')
         verbose_name_plural = _('clients')
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['user', 'created_at']),
+            # Serves newest-first listing and keyset pagination on (created_at, id)
+            models.Index(fields=['user', 'created_at', 'id']),
+            # Serves the delta-sync change feed
+            models.Index(fields=['user', 'updated_at', 'id']),
             models.Index(fields=['id_number']),
             models.Index(fields=['first_name', 'last_name']),
+            GinIndex(fields=['extended_data'], name='client_extended_data_gin'),
         ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.id_number})"
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        searchable = {field for fields in SEARCH_VECTOR_WEIGHTS.values() for field in fields}
+        if update_fields is None or searchable.intersection(update_fields):
+            update_search_vectors(Client.objects.filter(pk=self.pk))
+    
     @property
     def full_name(self):
         """Return the client's full name."""
@@ -81,13 +103,77 @@ class Client(models.Model):
     @property
     def full_address(self):
         """Return the client's full address."""
-        address_parts = [self.address_line1]
-        if self.address_line2:
-            address_parts.append(self.address_line2)
-        address_parts.extend([
+        return self.format_address(
+            self.address_line1,
+            self.address_line2,
             self.city,
             self.state,
             self.postal_code,
             self.country
-        ])
+        )
+    
+    @staticmethod
+    def format_address(address_line1, address_line2, city, state, postal_code, country):
+        """Join address parts, so callers with raw column values need no instance."""
+        address_parts = [address_line1]
+        if address_line2:
+            address_parts.append(address_line2)
+        address_parts.extend([city, state, postal_code, country])
         return ", ".join(filter(None, address_parts))
+
+
+class ClientTombstone(models.Model):
+    """Record of a deleted client, kept so delta-sync can report the deletion."""
+    
+    client_id = models.UUIDField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='client_tombstones')
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('client tombstone')
+        verbose_name_plural = _('client tombstones')
+        indexes = [
+            models.Index(fields=['user', 'deleted_at']),
+        ]
+    
+    def __str__(self):
+        return f"Deleted client {self.client_id}"
+
+
+class ClientImport(models.Model):
+    """A bulk client import and its per-row error report."""
+    
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('processing', _('Processing')),
+        ('completed', _('Completed')),
+        ('failed', _('Failed')),
+    ]
+    
+    FORMAT_CHOICES = [
+        ('csv', _('CSV')),
+        ('jsonl', _('JSON Lines')),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='client_imports')
+    file = models.FileField(upload_to='clients/imports/', null=True, blank=True)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    # [{'row': <1-based record number>, 'errors': {field: [messages]}}, ...]
+    errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('client import')
+        verbose_name_plural = _('client imports')
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Import {self.id} - {self.user} - {self.status}"
@@ -0,0 +1,136 @@
+"""
+Indexed client search.
+
+On PostgreSQL, clients are matched against a weighted ``search_vector`` column
+(names weighted highest, then identifiers and contact details, then location
+and employment) using prefix queries, plus trigram word similarity on names,
+ID numbers and phone numbers when the ``pg_trgm`` extension is installed. All
+of these predicates are served by GIN indexes created in the clients
+migrations. On other databases (SQLite in local testing) search falls back to
+``icontains`` with a simple relevance ranking.
+"""
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+)
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+SEARCH_CONFIG = 'simple'
+
+# Weighted columns that make up Client.search_vector
+SEARCH_VECTOR_WEIGHTS = {
+    'A': ['first_name', 'last_name'],
+    'B': ['id_number', 'phone_number', 'email'],
+    'C': ['city', 'occupation', 'employer'],
+}
+
+# Columns carrying a trigram GIN index when pg_trgm is available
+TRIGRAM_FIELDS = ['first_name', 'last_name', 'id_number', 'phone_number']
+NAME_FIELDS = ['first_name', 'last_name']
+FALLBACK_FIELDS = ['first_name', 'last_name', 'id_number', 'email', 'phone_number']
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_trigram_support = {}
+
+
+def build_search_vector():
+    """Return the weighted SearchVector expression stored in Client.search_vector."""
+    vector = None
+    for weight, fields in SEARCH_VECTOR_WEIGHTS.items():
+        part = SearchVector(*fields, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def is_postgres(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def has_trigram_support(using='default'):
+    """Check (once per process) whether the pg_trgm extension is installed."""
+    if using not in _trigram_support:
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            _trigram_support[using] = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                _trigram_support[using] = cursor.fetchone() is not None
+    return _trigram_support[using]
+
+
+def update_search_vectors(queryset):
+    """Recompute search_vector for every client in ``queryset`` in one UPDATE."""
+    if is_postgres(queryset.db):
+        queryset.update(search_vector=build_search_vector())
+
+
+def _prefix_query(text):
+    """Turn free text into a prefix tsquery such as ``john:* & a123:*``."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    raw = ' & '.join(f'{token}:*' for token in tokens)
+    return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_clients(queryset, text, names_only=False):
+    """Filter ``queryset`` to clients matching ``text`` and annotate ``search_rank``.
+
+    The queryset is not reordered; callers order by ``-search_rank`` when
+    they want the most relevant clients first.
+    """
+    text = text.strip()
+    if not text:
+        return queryset
+
+    if not is_postgres(queryset.db):
+        return _fallback_search(queryset, text, names_only)
+
+    query = _prefix_query(text)
+    condition = Q()
+    rank_parts = []
+
+    if query is not None and not names_only:
+        condition |= Q(search_vector=query)
+        rank_parts.append(SearchRank(F('search_vector'), query))
+
+    fields = NAME_FIELDS if names_only else TRIGRAM_FIELDS
+    if has_trigram_support(queryset.db):
+        for field in fields:
+            condition |= Q(**{f'{field}__trigram_word_similar': text})
+            rank_parts.append(TrigramWordSimilarity(text, field))
+    elif names_only:
+        # Without pg_trgm, OR-ing unindexed icontains predicates onto the
+        # full-text match would force a sequential scan, so only the name
+        # filter keeps them.
+        for field in fields:
+            condition |= Q(**{f'{field}__icontains': text})
+
+    if not rank_parts:
+        rank = Value(0.0, output_field=FloatField())
+    elif len(rank_parts) == 1:
+        rank = rank_parts[0]
+    else:
+        rank = Greatest(*rank_parts, output_field=FloatField())
+
+    return queryset.filter(condition).annotate(search_rank=rank)
+
+
+def _fallback_search(queryset, text, names_only):
+    """Portable search used when PostgreSQL features are unavailable."""
+    fields = NAME_FIELDS if names_only else FALLBACK_FIELDS
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': text})
+
+    rank = Case(
+        When(id_number__iexact=text, then=Value(1.0)),
+        When(Q(first_name__istartswith=text) | Q(last_name__istartswith=text), then=Value(0.75)),
+        default=Value(0.5),
+        output_field=FloatField(),
+    )
+    return queryset.filter(condition).annotate(search_rank=rank)
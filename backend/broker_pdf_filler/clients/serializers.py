@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Client
+from .models import Client, ClientImport
+from . import extended
 
 class ClientSerializer(serializers.ModelSerializer):
     """Serializer for the Client model."""
@@ -16,8 +17,8 @@ class ClientSerializer(serializers.ModelSerializer):
             'address_line2', 'city', 'state', 'postal_code', 'country',
             'full_address', 'employer', 'occupation', 'work_address',
             'annual_income', 'monthly_expenses', 'tax_residency',
-            'payment_method', 'payment_period', 'created_at', 'updated_at',
-            'is_active'
+            'payment_method', 'payment_period', 'extended_data',
+            'created_at', 'updated_at', 'is_active'
         ]
         read_only_fields = ['id', 'user', 'created_at', 'updated_at']
     
@@ -29,6 +30,10 @@ class ClientSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("A client with this ID number already exists.")
         return value
     
+    def validate_extended_data(self, value):
+        """Validate extended data against the standardized field registry."""
+        return extended.validate_extended_data(value)
+    
     def validate(self, data):
         """Validate the data."""
         # Ensure email is provided if phone number is not
@@ -56,4 +61,30 @@ class ClientListSerializer(serializers.ModelSerializer):
             'id', 'full_name', 'id_number', 'phone_number', 'email',
             'city', 'country', 'created_at', 'is_active'
         ]
-        read_only_fields = ['id', 'created_at'] 
\ No newline at end of file
+        read_only_fields = ['id', 'created_at'] 
+
+class ClientImportRowSerializer(ClientSerializer):
+    """Validates one imported row without touching the database.
+    
+    ID-number uniqueness is checked for a whole chunk at once by the importer,
+    so the per-row ``exists()`` query and the model's UniqueValidator are
+    disabled here.
+    """
+    
+    class Meta(ClientSerializer.Meta):
+        extra_kwargs = {'id_number': {'validators': []}}
+    
+    def validate_id_number(self, value):
+        return value
+
+class ClientImportSerializer(serializers.ModelSerializer):
+    """Serializer for bulk import progress and error reports."""
+    
+    class Meta:
+        model = ClientImport
+        fields = [
+            'id', 'file_format', 'status', 'processed_rows', 'created_count',
+            'error_count', 'errors', 'error_message', 'created_at',
+            'started_at', 'completed_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,19 @@
+"""
+Signal handlers for the clients app.
+"""
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Client, ClientTombstone
+
+
+@receiver(post_delete, sender=Client)
+def record_client_tombstone(sender, instance, origin=None, **kwargs):
+    """Remember deleted clients so the change feed can report them."""
+    # Clients removed by a cascade (e.g. their user being deleted) have no
+    # one left to sync with, and the tombstone's user may be gone too.
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is not Client:
+        return
+    ClientTombstone.objects.create(client_id=instance.pk, user_id=instance.user_id)
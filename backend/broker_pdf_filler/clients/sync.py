@@ -0,0 +1,126 @@
+"""
+Delta-sync change feed for client records.
+
+A sync token is a signed, opaque snapshot of how far a user's local copy has
+caught up. It records:
+
+- the position reached in the ``(updated_at, id)`` ordered change stream, or
+  the time the client last caught up completely;
+- the time from which deletions (``ClientTombstone`` rows) still need to be
+  reported.
+
+Changes are returned oldest first in pages. Deletions are returned once the
+change stream has caught up. Reads after catching up start slightly before the
+recorded time (``SYNC_OVERLAP``), so a write that committed late is not
+missed. A record may therefore be returned twice, and callers apply changes
+idempotently by id.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Client, ClientTombstone
+
+SYNC_TOKEN_SALT = 'broker_pdf_filler.clients.sync'
+SYNC_OVERLAP = timedelta(seconds=5)
+SYNC_PAGE_SIZE = 500
+MAX_SYNC_PAGE_SIZE = 1000
+
+# Tombstones (and so sync tokens) older than this are purged
+TOMBSTONE_RETENTION_DAYS = getattr(settings, 'CLIENT_SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+
+
+class InvalidSyncToken(Exception):
+    """The token is malformed, forged or belongs to another user."""
+
+
+class ExpiredSyncToken(Exception):
+    """Deletions since the token were purged; the client must resync fully."""
+
+
+def make_token(user, changes_at, deletions_at, last_id=None):
+    payload = {
+        'u': str(user.pk),
+        'c': changes_at.isoformat() if changes_at else None,
+        'i': str(last_id) if last_id else None,
+        'd': deletions_at.isoformat(),
+    }
+    return signing.dumps(payload, salt=SYNC_TOKEN_SALT, compress=True)
+
+
+def read_token(user, token):
+    """Return ``(changes_at, last_id, deletions_at)`` from a sync token."""
+    try:
+        payload = signing.loads(token, salt=SYNC_TOKEN_SALT)
+        if payload['u'] != str(user.pk):
+            raise InvalidSyncToken('Sync token belongs to another user')
+        changes_at = datetime.fromisoformat(payload['c']) if payload['c'] else None
+        deletions_at = datetime.fromisoformat(payload['d'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidSyncToken('Invalid sync token')
+
+    if deletions_at < timezone.now() - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        raise ExpiredSyncToken('Sync token expired; start a full sync')
+    return changes_at, payload['i'], deletions_at
+
+
+def get_changes(user, token=None, limit=SYNC_PAGE_SIZE):
+    """Return one page of the change feed for ``user``.
+
+    Without a token, all of the user's clients are returned (a full sync);
+    otherwise only clients created or changed since the token, plus the ids
+    of clients deleted since it.
+    """
+    now = timezone.now()
+    if token:
+        changes_at, last_id, deletions_at = read_token(user, token)
+    else:
+        changes_at, last_id, deletions_at = None, None, now
+
+    queryset = Client.objects.filter(user=user).order_by('updated_at', 'id')
+    if changes_at is not None:
+        if last_id:
+            # Mid-way through a page sequence: continue exactly after the last row
+            queryset = queryset.filter(
+                Q(updated_at__gt=changes_at) | Q(updated_at=changes_at, id__gt=last_id)
+            )
+        else:
+            queryset = queryset.filter(updated_at__gte=changes_at - SYNC_OVERLAP)
+
+    changed = list(queryset[:limit + 1])
+    has_more = len(changed) > limit
+    changed = changed[:limit]
+
+    if has_more:
+        last = changed[-1]
+        return {
+            'changed': changed,
+            'deleted': [],
+            'has_more': True,
+            'sync_token': make_token(user, last.updated_at, deletions_at, last_id=last.pk),
+        }
+
+    deleted = []
+    if token:
+        deleted = list(
+            ClientTombstone.objects
+            .filter(user=user, deleted_at__gte=deletions_at - SYNC_OVERLAP)
+            .values_list('client_id', flat=True)
+            .distinct()
+        )
+    return {
+        'changed': changed,
+        'deleted': deleted,
+        'has_more': False,
+        'sync_token': make_token(user, now, now),
+    }
+
+
+def purge_tombstones(days=TOMBSTONE_RETENTION_DAYS):
+    """Delete tombstones older than the retention period; returns the count."""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = ClientTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -1,10 +1,27 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from django.contrib.auth import get_user_model
-from .models import Client
-from datetime import date
+from django.db import connection
+from unittest import mock, skipUnless
+from .imports import ClientImporter
+from .models import Client, ClientImport, ClientTombstone
+from .search import search_clients
+from .serializers import ClientSerializer
+from ..utils.conditional import ConditionalGetMixin
+from ..utils.throttling import ScopedSlidingRateThrottle, get_counter_store
+from datetime import date, timedelta
+from django.utils import timezone
+from django.utils.http import http_date
+from io import StringIO
+import os
+import tempfile
+import time
+import gzip
+import json
 
 User = get_user_model()
 
@@ -138,6 +155,48 @@ class ClientAPITests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['ID', 'Full Name', 'ID Number'])
+        self.assertIn('John Doe', lines[1])
+        self.assertIn('"123 Main St, Hong Kong, Hong Kong, 999077, Hong Kong"', lines[1])
+    
+    def test_export_throttled_per_user(self):
+        """Test the export scope's sliding-window limit."""
+        get_counter_store().clear()
+        url = reverse('client-export')
+        with mock.patch.dict(ScopedSlidingRateThrottle.THROTTLE_RATES, {'export': '2/h'}):
+            statuses = [self.client.get(url).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        get_counter_store().clear()
+    
+    def test_export_selected_columns_jsonl(self):
+        """Test exporting selected columns as JSON Lines."""
+        Client.objects.create(user=self.user, **self.client_data)
+        url = reverse('client-export')
+        response = self.client.get(url, {'file_format': 'jsonl', 'columns': 'full_name,id_number'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('.jsonl"', response['Content-Disposition'])
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(rows, [{'full_name': 'John Doe', 'id_number': 'A1234567'}])
+    
+    def test_export_gzip(self):
+        """Test exporting a gzip-compressed CSV."""
+        Client.objects.create(user=self.user, **self.client_data)
+        url = reverse('client-export')
+        response = self.client.get(url, {'gzip': 'true', 'columns': 'id_number'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.csv.gz"', response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        self.assertEqual(content.splitlines(), ['ID Number', 'A1234567'])
+    
+    def test_export_invalid_columns(self):
+        """Test that unknown export columns are rejected."""
+        url = reverse('client-export')
+        response = self.client.get(url, {'columns': 'id_number,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
     
     def test_toggle_active(self):
         """Test toggling client active status."""
@@ -176,3 +235,500 @@ class ClientAPITests(APITestCase):
         # Filter by non-existent city
         response = self.client.get(url, {'city': 'Tokyo'})
         self.assertEqual(len(response.data['results']), 0)
+
+
+class ClientSearchTests(APITestCase):
+    """Test the indexed client search."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='search@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        base = {
+            'user': self.user,
+            'date_of_birth': date(1990, 1, 1),
+            'gender': 'M',
+            'marital_status': 'single',
+            'nationality': 'Hong Kong',
+            'address_line1': '123 Main St',
+            'city': 'Hong Kong',
+            'state': 'Hong Kong',
+            'postal_code': '999077',
+            'country': 'Hong Kong'
+        }
+        self.chan = Client.objects.create(
+            first_name='Tai Man', last_name='Chan', id_number='A1234567',
+            phone_number='+85291234567', **base
+        )
+        self.wong = Client.objects.create(
+            first_name='Siu Ming', last_name='Wong', id_number='B7654321',
+            phone_number='+85298765432', email='chan.fan@example.com', **base
+        )
+    
+    def test_search_ranks_name_matches_first(self):
+        """A name match outranks a match in contact details."""
+        url = reverse('client-search')
+        response = self.client.get(url, {'q': 'chan'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [row['id'] for row in response.data['results']]
+        self.assertEqual(ids[0], str(self.chan.id))
+    
+    def test_search_matches_id_number_prefix(self):
+        url = reverse('client-search')
+        response = self.client.get(url, {'q': 'B765'})
+        ids = [row['id'] for row in response.data['results']]
+        self.assertEqual(ids, [str(self.wong.id)])
+    
+    def test_search_requires_query(self):
+        url = reverse('client-search')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_name_filter_ignores_contact_details(self):
+        url = reverse('client-list')
+        response = self.client.get(url, {'name': 'chan'})
+        self.assertEqual(len(response.data['results']), 1)
+    
+    @skipUnless(connection.vendor == 'postgresql', 'search_vector is PostgreSQL only')
+    def test_search_vector_maintained_on_write(self):
+        self.chan.last_name = 'Cheung'
+        self.chan.save()
+        results = search_clients(Client.objects.all(), 'cheung')
+        self.assertEqual(list(results), [self.chan])
+
+
+class ClientKeysetPaginationTests(APITestCase):
+    """Test opt-in keyset pagination of the client list."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='pages@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        for n in range(25):
+            Client.objects.create(
+                user=self.user, first_name='Client', last_name=str(n),
+                date_of_birth=date(1990, 1, 1), gender='M', marital_status='single',
+                id_number=f'P{n:07d}', nationality='Hong Kong', phone_number='+85212345678',
+                address_line1='123 Main St', city='Hong Kong', state='Hong Kong',
+                postal_code='999077', country='Hong Kong'
+            )
+        # Ties on created_at must be broken by id
+        Client.objects.filter(last_name__in=['3', '4', '5']).update(
+            created_at=Client.objects.get(last_name='3').created_at
+        )
+        self.expected = [
+            str(pk) for pk in Client.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        ]
+    
+    def test_walk_forward_and_back(self):
+        url = reverse('client-list')
+        response = self.client.get(url, {'pagination': 'cursor', 'page_size': 10})
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        
+        seen = []
+        pages = []
+        while True:
+            page = [row['id'] for row in response.data['results']]
+            pages.append(page)
+            seen.extend(page)
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([row['id'] for row in response.data['results']], pages[1])
+    
+    def test_estimated_count(self):
+        url = reverse('client-list')
+        response = self.client.get(url, {'pagination': 'cursor', 'count': 'estimate'})
+        self.assertIn('estimated_count', response.data)
+        self.assertIsInstance(response.data['estimated_count'], int)
+    
+    def test_other_orderings_rejected(self):
+        url = reverse('client-list')
+        response = self.client.get(url, {'pagination': 'cursor', 'ordering': 'last_name'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pagination', response.data)
+        response = self.client.get(reverse('client-search'), {'pagination': 'cursor', 'q': 'chan'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pagination', response.data)
+        response = self.client.get(url, {'pagination': 'cursor', 'ordering': '-created_at'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_invalid_cursor(self):
+        url = reverse('client-list')
+        response = self.client.get(url, {'pagination': 'cursor', 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_page_number_pagination_by_default(self):
+        url = reverse('client-list')
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 25)
+
+
+IMPORT_HEADER = (
+    'first_name,last_name,date_of_birth,gender,marital_status,id_number,'
+    'nationality,phone_number,email,address_line1,city,state,postal_code,country\n'
+)
+
+
+def import_row(id_number, first_name='Tai Man', date_of_birth='1990-01-01'):
+    return (
+        f'{first_name},Chan,{date_of_birth},M,single,{id_number},Hong Kong,'
+        f'+85291234567,,1 Nathan Road,Hong Kong,Hong Kong,999077,Hong Kong\n'
+    )
+
+
+class ClientImportTests(APITestCase):
+    """Test bulk client import."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='import@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def upload(self, content, name='clients.csv', **data):
+        upload = SimpleUploadedFile(name, content.encode('utf-8'))
+        return self.client.post(reverse('client-import-clients'), {'file': upload, **data}, format='multipart')
+    
+    def test_import_csv_with_error_report(self):
+        Client.objects.create(
+            user=self.user, first_name='Existing', last_name='Client',
+            date_of_birth=date(1980, 1, 1), gender='F', marital_status='single',
+            id_number='E0000001', nationality='Hong Kong', phone_number='+85212345678',
+            address_line1='1 Main St', city='Hong Kong', state='Hong Kong',
+            postal_code='999077', country='Hong Kong'
+        )
+        content = (
+            IMPORT_HEADER
+            + import_row('I0000001')
+            + import_row('I0000002', date_of_birth='01/02/1990')
+            + import_row('E0000001')
+            + import_row('I0000001')
+            + import_row('I0000003')
+        )
+        response = self.upload(content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['processed_rows'], 5)
+        self.assertEqual(response.data['created_count'], 2)
+        self.assertEqual(response.data['error_count'], 3)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4])
+        self.assertIn('date_of_birth', response.data['errors'][0]['errors'])
+        self.assertEqual(
+            set(Client.objects.filter(user=self.user).values_list('id_number', flat=True)),
+            {'E0000001', 'I0000001', 'I0000003'}
+        )
+    
+    def test_import_jsonl(self):
+        content = (
+            json.dumps({
+                'first_name': 'Siu Ming', 'last_name': 'Wong', 'date_of_birth': '1985-05-05',
+                'gender': 'M', 'marital_status': 'married', 'id_number': 'J0000001',
+                'nationality': 'Hong Kong', 'phone_number': '+85298765432',
+                'address_line1': '2 Queen Road', 'city': 'Hong Kong', 'state': 'Hong Kong',
+                'postal_code': '999077', 'country': 'Hong Kong'
+            }) + '\n'
+            + 'not json\n'
+        )
+        response = self.upload(content, name='clients.jsonl')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created_count'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        self.assertEqual(Client.objects.get(id_number='J0000001').user, self.user)
+    
+    def test_concurrently_created_rows_reported_individually(self):
+        write = ClientImporter._write
+        
+        def write_after_concurrent_create(importer, clients):
+            # Another request creates a client with the first ID number in the meantime
+            Client.objects.create(
+                user=self.user, first_name='Concurrent', last_name='Client',
+                date_of_birth=date(1980, 1, 1), gender='F', marital_status='single',
+                id_number=clients[0][1].id_number, nationality='Hong Kong', phone_number='+85212345678',
+                address_line1='1 Main St', city='Hong Kong', state='Hong Kong',
+                postal_code='999077', country='Hong Kong'
+            )
+            return write(importer, clients)
+        
+        with mock.patch.object(ClientImporter, '_write', write_after_concurrent_create):
+            response = self.upload(IMPORT_HEADER + import_row('R0000001') + import_row('R0000002'))
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['created_count'], 1)
+        self.assertEqual(response.data['errors'], [
+            {'row': 1, 'errors': {'id_number': ['A client with this ID number already exists.']}}
+        ])
+        self.assertEqual(Client.objects.get(id_number='R0000002').first_name, 'Tai Man')
+    
+    @skipUnless(connection.vendor == 'postgresql', 'search_vector is PostgreSQL only')
+    def test_imported_clients_are_searchable(self):
+        self.upload(IMPORT_HEADER + import_row('S0000001', first_name='Searchable'))
+        response = self.client.get(reverse('client-search'), {'q': 'searchable'})
+        self.assertEqual(len(response.data['results']), 1)
+    
+    def test_import_requires_file(self):
+        response = self.client.post(reverse('client-import-clients'), {}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_import_status_is_private(self):
+        other = User.objects.create_user(email='other@example.com', password='testpass123')
+        job = ClientImport.objects.create(user=other)
+        url = reverse('client-import-status', kwargs={'import_id': job.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(IMPORT_HEADER + import_row('C0000001') + import_row('C0000002'))
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('import_clients', f.name, self.user.email, '--chunk-size', '1', stdout=out)
+        self.assertIn('Imported 2 of 2 rows', out.getvalue())
+        self.assertEqual(Client.objects.filter(user=self.user).count(), 2)
+
+
+# Requests here run outside a test transaction, so the middleware would queue
+# activity rows in the process-wide buffer, to be flushed after teardown
+@override_settings(ACTIVITY_BUFFER_ENABLED=False)
+class ClientBackgroundImportTests(TransactionTestCase):
+    """Test that large imports run in the background with progress reporting."""
+    
+    def test_background_import(self):
+        user = User.objects.create_user(email='bgimport@example.com', password='testpass123')
+        api = APIClient()
+        api.force_authenticate(user=user)
+        
+        content = IMPORT_HEADER + ''.join(import_row(f'B{n:07d}') for n in range(50))
+        upload = SimpleUploadedFile('clients.csv', content.encode('utf-8'))
+        response = api.post(
+            reverse('client-import-clients'), {'file': upload, 'background': 'true'}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        
+        url = reverse('client-import-status', kwargs={'import_id': response.data['id']})
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            response = api.get(url)
+            if response.data['status'] in ('completed', 'failed'):
+                break
+            time.sleep(0.05)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['created_count'], 50)
+        self.assertFalse(ClientImport.objects.get(pk=response.data['id']).file)
+
+
+
+class ClientConditionalGetTests(APITestCase):
+    """Test ETag / Last-Modified handling on client endpoints."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='etag@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.record = Client.objects.create(
+            user=self.user, first_name='Tai Man', last_name='Chan',
+            date_of_birth=date(1990, 1, 1), gender='M', marital_status='single',
+            id_number='T1234567', nationality='Hong Kong', phone_number='+85291234567',
+            address_line1='1 Nathan Road', city='Hong Kong', state='Hong Kong',
+            postal_code='999077', country='Hong Kong'
+        )
+    
+    def test_detail_not_modified_skips_serializer(self):
+        url = reverse('client-detail', args=[self.record.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        
+        with mock.patch.object(ClientSerializer, 'to_representation') as to_representation:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        to_representation.assert_not_called()
+    
+    def test_detail_etag_changes_on_update(self):
+        url = reverse('client-detail', args=[self.record.id])
+        etag = self.client.get(url)['ETag']
+        self.record.occupation = 'Engineer'
+        self.record.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['occupation'], 'Engineer')
+    
+    def test_list_etag_changes_on_delete(self):
+        url = reverse('client-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.record.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+    
+    def test_list_has_no_last_modified(self):
+        url = reverse('client-list')
+        response = self.client.get(url)
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+        
+        # A delete advances no timestamp, so If-Modified-Since must not 304
+        self.record.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+    
+    def test_list_etag_depends_on_query(self):
+        url = reverse('client-list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, {'city': 'Kowloon'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_cursor_list_skips_validators(self):
+        url = reverse('client-list')
+        with mock.patch.object(ConditionalGetMixin, 'get_validators') as get_validators:
+            response = self.client.get(url, {'pagination': 'cursor'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', response)
+        get_validators.assert_not_called()
+
+
+class ClientDeltaSyncTests(APITestCase):
+    """Test the delta-sync change feed."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='sync@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('client-changes')
+        self.records = [self.create_client(n) for n in range(3)]
+    
+    def create_client(self, n):
+        return Client.objects.create(
+            user=self.user, first_name='Sync', last_name=str(n),
+            date_of_birth=date(1990, 1, 1), gender='M', marital_status='single',
+            id_number=f'Y{n:07d}', nationality='Hong Kong', phone_number='+85291234567',
+            address_line1='1 Nathan Road', city='Hong Kong', state='Hong Kong',
+            postal_code='999077', country='Hong Kong'
+        )
+    
+    def age_records(self, seconds=60):
+        """Move existing changes outside the overlap window."""
+        past = timezone.now() - timedelta(seconds=seconds)
+        Client.objects.update(updated_at=past)
+        ClientTombstone.objects.update(deleted_at=past)
+    
+    def test_full_sync_pages(self):
+        response = self.client.get(self.url, {'limit': 2})
+        self.assertTrue(response.data['has_more'])
+        ids = [row['id'] for row in response.data['changed']]
+        
+        response = self.client.get(self.url, {'limit': 2, 'updated_since': response.data['sync_token']})
+        self.assertFalse(response.data['has_more'])
+        ids += [row['id'] for row in response.data['changed']]
+        self.assertEqual(sorted(ids), sorted(str(record.id) for record in self.records))
+    
+    def test_incremental_changes_and_tombstones(self):
+        token = self.client.get(self.url).data['sync_token']
+        self.age_records()
+        
+        changed = self.records[0]
+        changed.is_active = False
+        changed.save()
+        deleted_id = self.records[1].id
+        self.records[1].delete()
+        created = self.create_client(9)
+        
+        response = self.client.get(self.url, {'updated_since': token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {row['id'] for row in response.data['changed']},
+            {str(changed.id), str(created.id)}
+        )
+        self.assertEqual(response.data['deleted'], [deleted_id])
+        
+        self.age_records()
+        response = self.client.get(self.url, {'updated_since': response.data['sync_token']})
+        self.assertEqual(response.data['changed'], [])
+        self.assertEqual(response.data['deleted'], [])
+    
+    def test_token_is_bound_to_user(self):
+        token = self.client.get(self.url).data['sync_token']
+        other = User.objects.create_user(email='sync-other@example.com', password='testpass123')
+        self.client.force_authenticate(user=other)
+        response = self.client.get(self.url, {'updated_since': token})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_expired_token(self):
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() - timedelta(days=60)):
+            token = self.client.get(self.url).data['sync_token']
+        response = self.client.get(self.url, {'updated_since': token})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+    
+    def test_user_deletion_leaves_no_tombstones(self):
+        self.user.delete()
+        self.assertFalse(ClientTombstone.objects.exists())
+
+
+class ClientExtendedDataTests(APITestCase):
+    """Test extended standardized attributes."""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='extended@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.record = Client.objects.create(
+            user=self.user, first_name='Tai Man', last_name='Chan',
+            date_of_birth=date(1990, 1, 15), gender='M', marital_status='single',
+            id_number='X1234567', nationality='Hong Kong', phone_number='+85291234567',
+            address_line1='1 Nathan Road', city='Hong Kong', state='Hong Kong',
+            postal_code='999077', country='Hong Kong',
+            extended_data={'fullNameChinese': '陳大文', 'birthplace': 'Hong Kong'}
+        )
+        self.url = reverse('client-extended-data', args=[self.record.id])
+    
+    def test_patch_sets_and_removes_keys(self):
+        response = self.client.patch(self.url, {'DOB_D': '15', 'birthplace': None}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['extended_data'], {'fullNameChinese': '陳大文', 'DOB_D': '15'})
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.extended_data, {'fullNameChinese': '陳大文', 'DOB_D': '15'})
+    
+    def test_patch_rejects_unknown_and_column_fields(self):
+        response = self.client.patch(self.url, {'favouriteColour': 'red', 'firstName': 'Tai'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('favouriteColour', response.data)
+        self.assertIn('firstName', response.data)
+    
+    @skipUnless(connection.vendor == 'postgresql', 'extended_data containment is PostgreSQL only')
+    def test_filter_by_extended_data(self):
+        url = reverse('client-list')
+        response = self.client.get(url, {'extended': 'fullNameChinese:陳大文'})
+        self.assertEqual(len(response.data['results']), 1)
+        response = self.client.get(url, {'has_extended': 'DOB_D'})
+        self.assertEqual(len(response.data['results']), 0)
+        response = self.client.get(url, {'has_extended': 'notAField'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_serializer_validates_extended_data(self):
+        serializer = ClientSerializer(self.record, data={'extended_data': {'birthplace': ['x']}}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('extended_data', serializer.errors)
@@ -1,27 +1,43 @@
 from django.shortcuts import render
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, filters, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from .models import Client
-from .serializers import ClientSerializer, ClientListSerializer
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from datetime import datetime
+from .models import Client, ClientImport
+from .serializers import ClientSerializer, ClientListSerializer, ClientImportSerializer
 from .permissions import IsClientOwner
+from .filters import ClientSearchFilter
+from .search import search_clients
+from .exports import ClientExporter
+from .imports import ClientImportService, SYNC_MAX_BYTES, detect_format
+from . import sync
+from .extended import extended_field_names, filter_extended_data, patch_extended_data, validate_extended_data
+from ..utils.pagination import OptInKeysetPagination
+from ..utils.conditional import ConditionalGetMixin
 
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing clients.
     
     Provides CRUD operations for client management with:
     - Filtering by various fields
     - Search functionality across name, ID number, and contact info
-    - Pagination
+    - Pagination (keyset pagination with ?pagination=cursor)
     - Export functionality
+    - Bulk CSV/JSON Lines import
+    - Conditional GET on list (ETag) and detail (ETag / Last-Modified)
+    - Delta-sync change feed
+    - Extended standardized attributes (JSONB) with per-key patching
     """
     
     permission_classes = [IsAuthenticated, IsClientOwner]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = OptInKeysetPagination
+    filter_backends = [DjangoFilterBackend, ClientSearchFilter, filters.OrderingFilter]
     filterset_fields = ['is_active', 'nationality', 'country', 'city']
     search_fields = ['first_name', 'last_name', 'id_number', 'email', 'phone_number']
     ordering_fields = ['created_at', 'first_name', 'last_name', 'id_number']
@@ -37,44 +53,153 @@ class ClientViewSet(viewsets.ModelViewSet):
             return ClientListSerializer
         return ClientSerializer
     
+    def get_throttles(self):
+        """Limit exports separately; each one reads the user's whole client list."""
+        if self.action == 'export':
+            self.throttle_scope = 'export'
+        return super().get_throttles()
+    
     def perform_create(self, serializer):
         """Set the user when creating a new client."""
         serializer.save(user=self.request.user)
     
     @action(detail=False, methods=['get'])
     def export(self, request):
-        """Export client data in CSV format."""
-        import csv
-        from django.http import HttpResponse
-        from datetime import datetime
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="clients_{datetime.now().strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        # Write header
-        writer.writerow([
-            'ID', 'Full Name', 'ID Number', 'Email', 'Phone',
-            'Address', 'City', 'Country', 'Created Date'
-        ])
-        
-        # Write data
-        clients = self.get_queryset()
-        for client in clients:
-            writer.writerow([
-                client.id,
-                client.full_name,
-                client.id_number,
-                client.email,
-                client.phone_number,
-                client.full_address,
-                client.city,
-                client.country,
-                client.created_at.strftime('%Y-%m-%d')
-            ])
+        """Stream client data as CSV or JSON Lines.
+        
+        Query parameters:
+        - file_format: 'csv' (default) or 'jsonl'
+        - columns: comma-separated column keys (see clients.exports.EXPORT_COLUMNS)
+        - gzip: 'true' to compress the stream on the fly
+        """
+        columns = request.query_params.get('columns')
+        try:
+            exporter = ClientExporter(
+                self.get_queryset(),
+                columns=[c.strip() for c in columns.split(',') if c.strip()] if columns else None,
+                export_format=request.query_params.get('file_format', 'csv'),
+                compress=request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes'),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
+        response = StreamingHttpResponse(exporter.stream(), content_type=exporter.content_type)
+        filename = f"clients_{datetime.now().strftime('%Y%m%d')}.{exporter.filename_extension}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
     
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_clients(self, request):
+        """Bulk import clients from an uploaded CSV or JSON Lines file.
+        
+        Small files are imported straight away and the report is returned with
+        201. Larger files (or ``background=true``) are queued and 202 is
+        returned; poll ``imports/<id>/`` for progress and the error report.
+        """
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {'error': 'file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        file_format = request.data.get('file_format') or detect_format(upload.name)
+        if file_format not in dict(ClientImport.FORMAT_CHOICES):
+            return Response(
+                {'error': f'Unsupported file format: {file_format}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        background = str(request.data.get('background', '')).lower() in ('1', 'true', 'yes')
+        if background or upload.size > SYNC_MAX_BYTES:
+            job = ClientImport.objects.create(user=request.user, file_format=file_format, file=upload)
+            transaction.on_commit(lambda: ClientImportService.start_background(job))
+            return Response(ClientImportSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        
+        job = ClientImport.objects.create(user=request.user, file_format=file_format)
+        ClientImportService.run(job, upload)
+        return Response(ClientImportSerializer(job).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get'], url_path=r'imports/(?P<import_id>[^/.]+)')
+    def import_status(self, request, import_id=None):
+        """Get the progress and error report of a bulk import."""
+        try:
+            job = ClientImport.objects.get(pk=import_id, user=request.user)
+        except (ClientImport.DoesNotExist, ValueError, ValidationError):
+            return Response(
+                {'error': 'Import not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(ClientImportSerializer(job).data)
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Return clients created, changed or deleted since a sync token.
+        
+        Query parameters:
+        - updated_since: sync_token from a previous response; omit for a full sync
+        - limit: maximum changed clients per page (default 500)
+        
+        Keep requesting with the returned sync_token while has_more is true.
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', sync.SYNC_PAGE_SIZE)), sync.MAX_SYNC_PAGE_SIZE)
+        except ValueError:
+            limit = sync.SYNC_PAGE_SIZE
+        
+        try:
+            page = sync.get_changes(
+                request.user,
+                token=request.query_params.get('updated_since'),
+                limit=max(limit, 1)
+            )
+        except sync.ExpiredSyncToken as e:
+            return Response({'error': str(e)}, status=status.HTTP_410_GONE)
+        except sync.InvalidSyncToken as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'changed': ClientSerializer(page['changed'], many=True).data,
+            'deleted': page['deleted'],
+            'has_more': page['has_more'],
+            'sync_token': page['sync_token'],
+        })
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Search clients by name, ID number or contact details, best matches first."""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response(
+                {'error': 'q parameter is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = search_clients(
+            self.filter_queryset(self.get_queryset()), text
+        ).order_by('-search_rank', '-created_at')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = ClientListSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = ClientListSerializer(queryset, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['patch'], url_path='extended-data')
+    def extended_data(self, request, pk=None):
+        """Set or remove individual extended_data keys.
+        
+        The body maps standardized field keys to values; null removes a key.
+        Other keys are left untouched.
+        """
+        client = self.get_object()
+        changes = validate_extended_data(request.data, allow_null=True)
+        if changes:
+            patch_extended_data(Client.objects.filter(pk=client.pk), changes)
+            client.refresh_from_db(fields=['extended_data', 'updated_at'])
+        return Response({'extended_data': client.extended_data})
+    
     @action(detail=True, methods=['post'])
     def toggle_active(self, request, pk=None):
         """Toggle client's active status."""
@@ -96,9 +221,18 @@ class ClientViewSet(viewsets.ModelViewSet):
         # Filter by name if provided
         name = self.request.query_params.get('name')
         if name:
-            queryset = queryset.filter(
-                Q(first_name__icontains=name) |
-                Q(last_name__icontains=name)
-            )
+            queryset = search_clients(queryset, name, names_only=True)
+        
+        # Filter by extended attributes: ?extended=<key>:<value> and ?has_extended=<key>
+        allowed = extended_field_names()
+        for condition in self.request.query_params.getlist('extended'):
+            key, _, value = condition.partition(':')
+            if key not in allowed:
+                raise serializers.ValidationError({'extended': [f'Unknown extended field: {key}']})
+            queryset = filter_extended_data(queryset, key, value)
+        for key in self.request.query_params.getlist('has_extended'):
+            if key not in allowed:
+                raise serializers.ValidationError({'has_extended': [f'Unknown extended field: {key}']})
+            queryset = queryset.filter(extended_data__has_key=key)
         
         return queryset
@@ -5,3 +5,7 @@ class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'broker_pdf_filler.dashboard'
     label = 'dashboard'
+
+    def ready(self):
+        """Import signals when app is ready."""
+        import broker_pdf_filler.dashboard.signals
@@ -0,0 +1,100 @@
+"""
+Fragment cache for the dashboard endpoint.
+
+Each fragment (metrics, quick links, user quota) is cached separately under a
+key scoped to what it depends on: metrics are platform-wide and keyed by day,
+quotas by user. Keys embed a version number
+that is bumped on invalidation, so a recompute that started before an
+invalidation can never overwrite the fresh entry. Recomputes are single-flight:
+only the worker that wins ``cache.add`` on the lock key runs the query while the
+others briefly wait for its result.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'dashboard'
+FRAGMENT_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+POLL_INTERVAL = 0.05
+
+
+def _version_key(scope):
+    return f'{KEY_PREFIX}:version:{scope}'
+
+
+def _get_version(scope):
+    return cache.get(_version_key(scope)) or 1
+
+
+def _bump_version(scope):
+    key = _version_key(scope)
+    # add() is a no-op when the counter already exists
+    cache.add(key, 1, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The counter was evicted between add() and incr()
+        cache.set(key, 2, None)
+
+
+def _jittered(timeout):
+    """Spread expiries so workers don't all recompute at the same moment."""
+    return int(timeout * random.uniform(0.9, 1.1))
+
+
+def get_or_compute(key, compute, timeout=FRAGMENT_TIMEOUT):
+    """Return the cached value for ``key``, computing it at most once at a time."""
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, True, LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, _jittered(timeout))
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    # Another worker holds the lock; wait briefly for its result
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return compute()
+
+
+def metrics_key(day):
+    version = _get_version('metrics')
+    return f'{KEY_PREFIX}:metrics:{day.isoformat()}:v{version}'
+
+
+def quick_links_key():
+    version = _get_version('quick_links')
+    return f'{KEY_PREFIX}:quick_links:v{version}'
+
+
+def user_quota_key(user_id, day):
+    version = _get_version(f'user:{user_id}')
+    return f'{KEY_PREFIX}:quota:{user_id}:{day.strftime("%Y-%m")}:v{version}'
+
+
+def invalidate_metrics():
+    """Drop the metrics fragment."""
+    _bump_version('metrics')
+
+
+def invalidate_quick_links():
+    _bump_version('quick_links')
+
+
+def invalidate_user(user_id):
+    """Drop the quota fragment for a single user."""
+    _bump_version(f'user:{user_id}')
@@ -0,0 +1,30 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from broker_pdf_filler.dashboard.services import MetricsRollupService
+
+
+class Command(BaseCommand):
+    help = 'Rolls up daily form generation facts and refreshes the dashboard snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Rebuild from this date (YYYY-MM-DD) instead of the last checkpoint'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options.get('since'):
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['since']}")
+
+        today = timezone.localdate()
+        days = MetricsRollupService.rollup_pending_days(until=today, since=since)
+        self.stdout.write(f'Rolled up {days} day(s) of usage facts')
+
+        MetricsRollupService.refresh_snapshot(today, refresh_clients=True)
+        self.stdout.write(self.style.SUCCESS(f'Refreshed dashboard metrics for {today}'))
@@ -0,0 +1,63 @@
+# Generated by Django 5.1 on 2026-10-19 04:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remove_duplicate_metrics(apps, schema_editor):
+    """Keep only the most recently updated snapshot for each date."""
+    DashboardMetrics = apps.get_model('dashboard', 'DashboardMetrics')
+    seen = set()
+    for metrics in DashboardMetrics.objects.order_by('date', '-last_updated', '-id'):
+        if metrics.date in seen:
+            metrics.delete()
+        else:
+            seen.add(metrics.date)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_add_default_quick_links'),
+        ('users', '0010_alter_brokercompany_options'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_rolled_up', models.DateField()),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(remove_duplicate_metrics, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='dashboardmetrics',
+            name='date',
+            field=models.DateField(default=django.utils.timezone.now, unique=True),
+        ),
+        migrations.CreateModel(
+            name='DailyUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('insurer', models.CharField(blank=True, max_length=50)),
+                ('batches', models.PositiveIntegerField(default=0)),
+                ('forms_completed', models.PositiveIntegerField(default=0)),
+                ('forms_failed', models.PositiveIntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('broker_company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usage_rollups', to='users.brokercompany')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'broker_company'], name='dashboard_d_date_3a38e5_idx'), models.Index(fields=['date', 'insurer'], name='dashboard_d_date_7de2db_idx')],
+                'unique_together': {('date', 'user', 'insurer')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1 on 2026-10-19 04:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_daily_usage_rollup'),
+        ('users', '0010_alter_brokercompany_options'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailyusagerollup',
+            index=models.Index(fields=['user', 'date'], name='dashboard_d_user_id_7f3bfc_idx'),
+        ),
+    ]
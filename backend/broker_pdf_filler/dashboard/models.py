@@ -1,9 +1,10 @@
 from django.db import models
+from django.conf import settings
 from django.utils import timezone
 
 class DashboardMetrics(models.Model):
     """Stores aggregated metrics for quick dashboard access"""
-    date = models.DateField(default=timezone.now, db_index=True)
+    date = models.DateField(default=timezone.now, unique=True)
     total_clients = models.IntegerField(default=0)
     active_clients = models.IntegerField(default=0)
     forms_generated = models.IntegerField(default=0)
@@ -20,6 +21,44 @@ class DashboardMetrics(models.Model):
         """Get the most recent metrics, with cache handling in view layer"""
         return cls.objects.first()
 
+class DailyUsageRollup(models.Model):
+    """Daily form generation facts per broker company, user and insurer"""
+    date = models.DateField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='usage_rollups')
+    broker_company = models.ForeignKey(
+        'users.BrokerCompany',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='usage_rollups'
+    )
+    insurer = models.CharField(max_length=50, blank=True)
+    batches = models.PositiveIntegerField(default=0)
+    forms_completed = models.PositiveIntegerField(default=0)
+    forms_failed = models.PositiveIntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        unique_together = ['date', 'user', 'insurer']
+        indexes = [
+            models.Index(fields=['date', 'broker_company']),
+            models.Index(fields=['date', 'insurer']),
+            models.Index(fields=['user', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.user_id} - {self.insurer or 'No insurer'}: {self.batches}"
+
+class RollupCheckpoint(models.Model):
+    """Last day fully aggregated by the periodic rollup command"""
+    name = models.CharField(max_length=50, unique=True)
+    last_rolled_up = models.DateField()
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_rolled_up}"
+
 class QuickAccessLink(models.Model):
     """Configurable quick access links for dashboard"""
     title = models.CharField(max_length=100)
@@ -10,4 +10,25 @@ class DashboardMetricsSerializer(serializers.ModelSerializer):
 class QuickAccessLinkSerializer(serializers.ModelSerializer):
     class Meta:
         model = QuickAccessLink
-        fields = ['id', 'title', 'url', 'icon', 'order'] 
\ No newline at end of file
+        fields = ['id', 'title', 'url', 'icon', 'order'] 
+
+class UsageTimeSeriesQuerySerializer(serializers.Serializer):
+    """Validates the query parameters of the usage time-series endpoint"""
+    INTERVAL_CHOICES = ['auto', 'day', 'week', 'month']
+    GROUP_BY_CHOICES = ['insurer', 'user', 'broker_company']
+    MAX_RANGE_DAYS = 366 * 5
+
+    start = serializers.DateField()
+    end = serializers.DateField()
+    interval = serializers.ChoiceField(choices=INTERVAL_CHOICES, default='auto')
+    group_by = serializers.ChoiceField(choices=GROUP_BY_CHOICES, required=False)
+    company = serializers.UUIDField(required=False)
+    user = serializers.UUIDField(required=False)
+    insurer = serializers.CharField(required=False, max_length=50)
+
+    def validate(self, data):
+        if data['start'] > data['end']:
+            raise serializers.ValidationError({'start': 'start must not be after end.'})
+        if (data['end'] - data['start']).days > self.MAX_RANGE_DAYS:
+            raise serializers.ValidationError({'end': 'Date range may not exceed five years.'})
+        return data
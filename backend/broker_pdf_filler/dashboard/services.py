@@ -0,0 +1,229 @@
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, Optional
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum, F
+from django.db.models.functions import TruncWeek, TruncMonth
+from django.utils import timezone
+
+from .models import DashboardMetrics, DailyUsageRollup, RollupCheckpoint
+from ..users.models import User
+from ..pdf_forms.models import FormGenerationBatch
+from ..clients.models import Client
+
+# Number of days covered by the dashboard snapshot window
+METRICS_WINDOW_DAYS = 30
+ROLLUP_CHECKPOINT = 'daily_usage'
+
+# Longest range (in days) served at each granularity when interval is 'auto'
+AUTO_INTERVAL_LIMITS = [(92, 'day'), (731, 'week')]
+GROUP_BY_FIELDS = {
+    'insurer': 'insurer',
+    'user': 'user_id',
+    'broker_company': 'broker_company_id',
+}
+
+
+class MetricsRollupService:
+    """Service class for maintaining pre-aggregated dashboard metrics."""
+
+    @staticmethod
+    def record_batch(batch: FormGenerationBatch):
+        """Add a finished batch to today's rollup row and refresh the snapshot."""
+        day = timezone.localdate(batch.created_at)
+        forms = batch.forms.aggregate(
+            completed=Count('id', filter=Q(status='completed')),
+            failed=Count('id', filter=Q(status='failed')),
+        )
+
+        with transaction.atomic():
+            rollup, _ = DailyUsageRollup.objects.select_for_update().get_or_create(
+                date=day,
+                user_id=batch.user_id,
+                insurer=batch.insurer,
+                defaults={'broker_company_id': batch.user.broker_company_id}
+            )
+            DailyUsageRollup.objects.filter(pk=rollup.pk).update(
+                batches=F('batches') + 1,
+                forms_completed=F('forms_completed') + forms['completed'],
+                forms_failed=F('forms_failed') + forms['failed'],
+            )
+
+        MetricsRollupService.refresh_snapshot(timezone.localdate())
+
+    @staticmethod
+    def rollup_day(day) -> int:
+        """Rebuild the rollup rows for a single day from the source tables."""
+        facts = FormGenerationBatch.objects.filter(
+            created_at__gte=_start_of_day(day),
+            created_at__lt=_start_of_day(day + timedelta(days=1)),
+        ).exclude(
+            status='processing'
+        ).values(
+            'user_id', 'user__broker_company_id', 'insurer'
+        ).annotate(
+            batches=Count('id', distinct=True),
+            forms_completed=Count('batch_forms', filter=Q(batch_forms__status='completed')),
+            forms_failed=Count('batch_forms', filter=Q(batch_forms__status='failed')),
+        ).order_by()
+
+        rows = [
+            DailyUsageRollup(
+                date=day,
+                user_id=fact['user_id'],
+                broker_company_id=fact['user__broker_company_id'],
+                insurer=fact['insurer'],
+                batches=fact['batches'],
+                forms_completed=fact['forms_completed'],
+                forms_failed=fact['forms_failed'],
+            )
+            for fact in facts
+        ]
+
+        with transaction.atomic():
+            DailyUsageRollup.objects.filter(date=day).delete()
+            DailyUsageRollup.objects.bulk_create(rows)
+        return len(rows)
+
+    @staticmethod
+    def rollup_pending_days(until=None, since=None) -> int:
+        """Roll up every day after the checkpoint, finishing with ``until``."""
+        until = until or timezone.localdate()
+        checkpoint = RollupCheckpoint.objects.filter(name=ROLLUP_CHECKPOINT).first()
+
+        if since is None:
+            if checkpoint:
+                since = checkpoint.last_rolled_up + timedelta(days=1)
+            else:
+                first_batch = FormGenerationBatch.objects.order_by('created_at').first()
+                since = timezone.localdate(first_batch.created_at) if first_batch else until
+
+        days = 0
+        day = since
+        while day <= until:
+            MetricsRollupService.rollup_day(day)
+            days += 1
+            day += timedelta(days=1)
+
+        # Today is still accumulating, so only closed days advance the checkpoint
+        closed_through = min(until, timezone.localdate() - timedelta(days=1))
+        if not checkpoint or closed_through > checkpoint.last_rolled_up:
+            RollupCheckpoint.objects.update_or_create(
+                name=ROLLUP_CHECKPOINT,
+                defaults={'last_rolled_up': closed_through}
+            )
+        return days
+
+    @staticmethod
+    def refresh_snapshot(day=None, refresh_clients: bool = False) -> DashboardMetrics:
+        """Rebuild the dashboard snapshot for ``day`` from the rollup rows.
+
+        Client gauges are expensive table-wide counts, so they are only
+        recomputed when requested (by the periodic command) or when no earlier
+        snapshot exists to carry them forward from.
+        """
+        day = day or timezone.localdate()
+        window = DailyUsageRollup.objects.filter(
+            date__gte=day - timedelta(days=METRICS_WINDOW_DAYS),
+            date__lte=day,
+        )
+        forms_generated = window.aggregate(total=Sum('batches'))['total'] or 0
+        metrics_by_type = {
+            item['insurer']: item['count']
+            for item in window.values('insurer').annotate(count=Sum('batches')).order_by()
+        }
+
+        total_quota = User.objects.aggregate(total=Sum('monthly_form_quota'))['total'] or 0
+        quota_usage = (forms_generated / total_quota * 100) if total_quota > 0 else 0
+
+        defaults = {
+            'forms_generated': forms_generated,
+            'quota_usage': quota_usage,
+            'metrics_by_type': metrics_by_type,
+        }
+
+        previous = DashboardMetrics.objects.filter(date__lte=day).first()
+        if refresh_clients or previous is None:
+            defaults.update(MetricsRollupService._client_gauges(day))
+        else:
+            defaults.update({
+                'total_clients': previous.total_clients,
+                'active_clients': previous.active_clients,
+            })
+
+        metrics, _ = DashboardMetrics.objects.update_or_create(date=day, defaults=defaults)
+        return metrics
+
+    @staticmethod
+    def get_snapshot(day=None) -> Optional[DashboardMetrics]:
+        """Return the snapshot for ``day``, building it on first access."""
+        day = day or timezone.localdate()
+        metrics = DashboardMetrics.objects.filter(date=day).first()
+        if metrics is None:
+            metrics = MetricsRollupService.refresh_snapshot(day)
+        return metrics
+
+    @staticmethod
+    def usage_series(rollups, start, end, interval='auto', group_by=None) -> Dict[str, Any]:
+        """Bucket rollup rows between ``start`` and ``end`` into a time series.
+
+        Long ranges are downsampled to weekly or monthly buckets in the
+        database so the response size depends on the bucket count only.
+        """
+        if interval == 'auto':
+            span = (end - start).days
+            interval = next((name for limit, name in AUTO_INTERVAL_LIMITS if span <= limit), 'month')
+
+        bucket = {
+            'day': F('date'),
+            'week': TruncWeek('date'),
+            'month': TruncMonth('date'),
+        }[interval]
+        group_field = GROUP_BY_FIELDS.get(group_by)
+        values = ['bucket', group_field] if group_field else ['bucket']
+
+        rows = rollups.filter(
+            date__gte=start,
+            date__lte=end,
+        ).annotate(
+            bucket=bucket
+        ).values(*values).annotate(
+            batches=Sum('batches'),
+            forms_completed=Sum('forms_completed'),
+            forms_failed=Sum('forms_failed'),
+        ).order_by('bucket')
+
+        series = {}
+        for row in rows:
+            key = str(row[group_field]) if group_field else 'total'
+            series.setdefault(key, []).append({
+                'date': row['bucket'],
+                'batches': row['batches'],
+                'forms_completed': row['forms_completed'],
+                'forms_failed': row['forms_failed'],
+            })
+
+        return {
+            'start': start,
+            'end': end,
+            'interval': interval,
+            'group_by': group_by,
+            'series': [{'key': key, 'points': points} for key, points in series.items()],
+        }
+
+    @staticmethod
+    def _client_gauges(day):
+        """Count total clients and clients with batches inside the window."""
+        window_start = day - timedelta(days=METRICS_WINDOW_DAYS)
+        return {
+            'total_clients': Client.objects.count(),
+            'active_clients': FormGenerationBatch.objects.filter(
+                created_at__gte=_start_of_day(window_start),
+                created_at__lt=_start_of_day(day + timedelta(days=1)),
+            ).values('client_id').distinct().count(),
+        }
+
+
+def _start_of_day(day):
+    """Return the aware datetime at midnight of ``day`` so range filters can use indexes."""
+    return timezone.make_aware(datetime.combine(day, time.min))
@@ -0,0 +1,47 @@
+"""
+Signal handlers for the dashboard app.
+"""
+import logging
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import cache as dashboard_cache
+from .models import QuickAccessLink
+from .services import MetricsRollupService
+from ..pdf_forms.models import FormGenerationBatch
+from ..pdf_forms.signals import batch_finished
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(batch_finished)
+def record_finished_batch(sender, batch, **kwargs):
+    """Fold a finished batch into the daily usage rollup."""
+    try:
+        MetricsRollupService.record_batch(batch)
+    except Exception as e:
+        # Metrics must never fail form generation; the periodic rollup repairs gaps
+        logger.error(f"Error recording batch {batch.id} in rollup: {str(e)}", exc_info=True)
+    dashboard_cache.invalidate_metrics()
+    dashboard_cache.invalidate_user(batch.user_id)
+
+
+@receiver(post_save, sender=FormGenerationBatch)
+def invalidate_quota_on_new_batch(sender, instance, created, **kwargs):
+    """A new batch counts against the user's quota straight away."""
+    if created:
+        dashboard_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_quota_on_user_change(sender, instance, **kwargs):
+    """Quota limits live on the user record."""
+    dashboard_cache.invalidate_user(instance.id)
+
+
+@receiver(post_save, sender=QuickAccessLink)
+@receiver(post_delete, sender=QuickAccessLink)
+def invalidate_quick_links(sender, **kwargs):
+    dashboard_cache.invalidate_quick_links()
@@ -3,12 +3,18 @@ from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.utils import timezone
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from datetime import timedelta, date
+from unittest import mock
 
-from ..users.models import User
+from ..users.models import BrokerCompany, User
 from ..clients.models import Client
-from ..pdf_forms.models import FormGenerationBatch
-from .models import DashboardMetrics, QuickAccessLink
+from ..pdf_forms.models import FormGenerationBatch, GeneratedForm
+from ..pdf_forms.services import FormGenerationService
+from .models import DashboardMetrics, QuickAccessLink, DailyUsageRollup, RollupCheckpoint
+from .services import MetricsRollupService
 
 class DashboardMetricsModelTests(TestCase):
     def test_get_latest_metrics(self):
@@ -32,8 +38,91 @@ class DashboardMetricsModelTests(TestCase):
         result = DashboardMetrics.get_latest_metrics()
         self.assertEqual(result, latest_metrics)
 
+class MetricsRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='rollup@example.com',
+            password='testpass123',
+            first_name='Rollup',
+            last_name='User'
+        )
+        self.test_client = Client.objects.create(
+            user=self.user,
+            first_name='Test',
+            last_name='Client',
+            date_of_birth=date(1990, 1, 1),
+            gender='M',
+            marital_status='single',
+            id_number='ROLLUP123',
+            nationality='Test Country',
+            phone_number='1234567890',
+            address_line1='123 Test St',
+            city='Test City',
+            state='Test State',
+            postal_code='12345',
+            country='Test Country'
+        )
+
+    def _finish_batch(self, insurer, form_statuses):
+        batch = FormGenerationBatch.objects.create(
+            user=self.user,
+            client=self.test_client,
+            insurer=insurer
+        )
+        for form_status in form_statuses:
+            GeneratedForm.objects.create(
+                user=self.user,
+                client=self.test_client,
+                batch=batch,
+                status=form_status
+            )
+        FormGenerationService.update_batch_status(batch)
+        return batch
+
+    def test_finished_batch_updates_rollup_and_snapshot(self):
+        self._finish_batch('Chubb', ['completed', 'failed'])
+        self._finish_batch('Chubb', ['completed'])
+        self._finish_batch('BOC Life', ['completed'])
+
+        rollup = DailyUsageRollup.objects.get(user=self.user, insurer='Chubb')
+        self.assertEqual(rollup.batches, 2)
+        self.assertEqual(rollup.forms_completed, 2)
+        self.assertEqual(rollup.forms_failed, 1)
+
+        metrics = DashboardMetrics.objects.get(date=timezone.localdate())
+        self.assertEqual(metrics.forms_generated, 3)
+        self.assertEqual(metrics.metrics_by_type, {'Chubb': 2, 'BOC Life': 1})
+        self.assertEqual(DashboardMetrics.objects.count(), 1)
+
+    def test_status_update_is_recorded_once(self):
+        batch = self._finish_batch('Chubb', ['completed'])
+        FormGenerationService.update_batch_status(batch)
+
+        self.assertEqual(DailyUsageRollup.objects.get(insurer='Chubb').batches, 1)
+
+    def test_rollup_day_rebuilds_from_source(self):
+        self._finish_batch('Chubb', ['completed'])
+        DailyUsageRollup.objects.all().delete()
+
+        MetricsRollupService.rollup_pending_days()
+
+        rollup = DailyUsageRollup.objects.get(insurer='Chubb')
+        self.assertEqual(rollup.batches, 1)
+        self.assertEqual(rollup.forms_completed, 1)
+        checkpoint = RollupCheckpoint.objects.get()
+        self.assertEqual(checkpoint.last_rolled_up, timezone.localdate() - timedelta(days=1))
+
+    def test_snapshot_refreshes_client_gauges(self):
+        self._finish_batch('Chubb', ['completed'])
+
+        metrics = MetricsRollupService.refresh_snapshot(refresh_clients=True)
+        self.assertEqual(metrics.total_clients, 1)
+        self.assertEqual(metrics.active_clients, 1)
+
 class DashboardAPITests(APITestCase):
     def setUp(self):
+        cache.clear()
+
         # Create test user
         self.user = User.objects.create_user(
             email='test@example.com',
@@ -148,3 +237,158 @@ class DashboardAPITests(APITestCase):
         url = reverse('dashboard-metrics')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class DashboardCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='cache@example.com',
+            password='testpass123',
+            monthly_form_quota=50
+        )
+        self.other_user = User.objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+            monthly_form_quota=80
+        )
+        self.test_client = Client.objects.create(
+            user=self.user,
+            first_name='Cache',
+            last_name='Client',
+            date_of_birth=date(1990, 1, 1),
+            gender='F',
+            marital_status='single',
+            id_number='CACHE123',
+            nationality='Test Country',
+            phone_number='1234567890',
+            address_line1='123 Test St',
+            city='Test City',
+            state='Test State',
+            postal_code='12345',
+            country='Test Country'
+        )
+        self.url = reverse('dashboard-metrics')
+
+    def _get(self, user):
+        self.client.force_authenticate(user=user)
+        return self.client.get(self.url).json()
+
+    def test_quota_is_cached_per_user(self):
+        self.assertEqual(self._get(self.user)['user_quota']['total'], 50)
+        self.assertEqual(self._get(self.other_user)['user_quota']['total'], 80)
+
+    def test_metrics_are_shared_across_companies(self):
+        self.user.broker_company = BrokerCompany.objects.create(name='Broker A')
+        self.user.save()
+        self.other_user.broker_company = BrokerCompany.objects.create(name='Broker B')
+        self.other_user.save()
+
+        with mock.patch.object(
+            MetricsRollupService, 'get_snapshot', wraps=MetricsRollupService.get_snapshot
+        ) as get_snapshot:
+            first = self._get(self.user)['metrics']
+            second = self._get(self.other_user)['metrics']
+        self.assertEqual(first, second)
+        get_snapshot.assert_called_once()
+
+    def test_cached_fragments_skip_queries(self):
+        self._get(self.user)
+        self.client.force_authenticate(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+
+        # Only the activity middleware's insert should reach the database
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('SELECT')])
+
+    def test_finished_batch_invalidates_metrics_and_quota(self):
+        data = self._get(self.user)
+        self.assertEqual(data['user_quota']['used'], 0)
+        self.assertEqual(data['metrics']['forms_generated'], 0)
+
+        batch = FormGenerationBatch.objects.create(
+            user=self.user,
+            client=self.test_client,
+            insurer='Chubb'
+        )
+        FormGenerationService.update_batch_status(batch)
+
+        data = self._get(self.user)
+        self.assertEqual(data['user_quota']['used'], 1)
+        self.assertEqual(data['metrics']['forms_generated'], 1)
+
+    def test_quota_change_invalidates_quota(self):
+        self._get(self.user)
+        self.user.monthly_form_quota = 20
+        self.user.save()
+
+        self.assertEqual(self._get(self.user)['user_quota']['total'], 20)
+
+    def test_quick_link_change_invalidates_links(self):
+        QuickAccessLink.objects.all().update(is_active=False)
+        self.assertEqual(self._get(self.user)['quick_links'], [])
+
+        QuickAccessLink.objects.create(title='Export', url='/clients/export', icon='download')
+
+        self.assertEqual(len(self._get(self.user)['quick_links']), 1)
+
+
+class UsageTimeSeriesTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='usage-admin@example.com',
+            password='testpass123',
+            first_name='Usage',
+            last_name='Admin'
+        )
+        self.user = User.objects.create_user(email='usage@example.com', password='testpass123')
+        self.other_user = User.objects.create_user(email='usage-other@example.com', password='testpass123')
+        self.start = date(2025, 1, 6)  # a Monday
+        for offset in range(14):
+            DailyUsageRollup.objects.create(
+                date=self.start + timedelta(days=offset),
+                user=self.user,
+                insurer='Chubb',
+                batches=1,
+                forms_completed=2
+            )
+        DailyUsageRollup.objects.create(
+            date=self.start,
+            user=self.other_user,
+            insurer='BOC Life',
+            batches=5,
+            forms_completed=5
+        )
+        self.url = reverse('dashboard-usage')
+
+    def test_daily_buckets(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url, {
+            'start': '2025-01-06', 'end': '2025-01-08', 'interval': 'day'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        points = response.data['series'][0]['points']
+        self.assertEqual([p['batches'] for p in points], [6, 1, 1])
+
+    def test_long_range_is_downsampled(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url, {
+            'start': '2025-01-01', 'end': '2025-12-31', 'group_by': 'insurer'
+        })
+        self.assertEqual(response.data['interval'], 'week')
+        series = {s['key']: s['points'] for s in response.data['series']}
+        self.assertEqual([p['batches'] for p in series['Chubb']], [7, 7])
+        self.assertEqual(series['Chubb'][0]['forms_completed'], 14)
+        self.assertEqual([p['batches'] for p in series['BOC Life']], [5])
+
+    def test_standard_user_sees_only_own_usage(self):
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.get(self.url, {
+            'start': '2025-01-01', 'end': '2025-01-31', 'user': str(self.user.id)
+        })
+        self.assertEqual(response.data['series'], [])
+
+    def test_invalid_range(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url, {'start': '2025-02-01', 'end': '2025-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
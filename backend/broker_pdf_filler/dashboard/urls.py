@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DashboardViewSet, QuickAccessLinkViewSet
+from .views import DashboardViewSet, QuickAccessLinkViewSet, UsageTimeSeriesView
 
 router = DefaultRouter()
 router.register(r'quick-links', QuickAccessLinkViewSet, basename='quick-links')
 
 urlpatterns = [
     path('metrics/', DashboardViewSet.as_view(), name='dashboard-metrics'),
+    path('usage/', UsageTimeSeriesView.as_view(), name='dashboard-usage'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
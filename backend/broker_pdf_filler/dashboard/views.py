@@ -1,42 +1,49 @@
 from rest_framework.viewsets import ReadOnlyModelViewSet
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.db.models import Count, Sum
 from django.utils import timezone
-from datetime import timedelta
 import logging
 
-from .models import DashboardMetrics, QuickAccessLink
-from .serializers import DashboardMetricsSerializer, QuickAccessLinkSerializer
-from ..users.models import User
+from . import cache as dashboard_cache
+from .models import QuickAccessLink, DailyUsageRollup
+from .serializers import (
+    DashboardMetricsSerializer, QuickAccessLinkSerializer, UsageTimeSeriesQuerySerializer
+)
+from .services import MetricsRollupService
 from ..pdf_forms.models import FormGenerationBatch
-from ..clients.models import Client
 
 logger = logging.getLogger(__name__)
 
 class DashboardViewSet(APIView):
     permission_classes = [IsAuthenticated]
     
-    @method_decorator(cache_page(60))  # Cache for 1 minute
     def get(self, request):
         try:
-            # Get or calculate latest metrics
-            metrics = DashboardMetrics.get_latest_metrics()
-            if not metrics or metrics.date != timezone.now().date():
-                metrics = self._calculate_metrics()
+            user = request.user
+            today = timezone.localdate()
             
-            # Get quick access links
-            quick_links = QuickAccessLink.objects.filter(is_active=True)
-            
-            # Get user quota
-            user_quota = self._get_user_quota(request.user)
+            # Each fragment is cached on its own and invalidated by signals;
+            # the metrics snapshot is platform-wide, so every user shares it
+            metrics = dashboard_cache.get_or_compute(
+                dashboard_cache.metrics_key(today),
+                lambda: DashboardMetricsSerializer(MetricsRollupService.get_snapshot(today)).data
+            )
+            quick_links = dashboard_cache.get_or_compute(
+                dashboard_cache.quick_links_key(),
+                lambda: QuickAccessLinkSerializer(
+                    QuickAccessLink.objects.filter(is_active=True), many=True
+                ).data
+            )
+            user_quota = dashboard_cache.get_or_compute(
+                dashboard_cache.user_quota_key(user.id, today),
+                lambda: self._get_user_quota(user)
+            )
             
             return Response({
-                'metrics': DashboardMetricsSerializer(metrics).data,
-                'quick_links': QuickAccessLinkSerializer(quick_links, many=True).data,
+                'metrics': metrics,
+                'quick_links': quick_links,
                 'user_quota': user_quota
             })
         except Exception as e:
@@ -58,62 +65,6 @@ class DashboardViewSet(APIView):
                 }
             })
     
-    def _calculate_metrics(self):
-        try:
-            today = timezone.now().date()
-            thirty_days_ago = today - timedelta(days=30)
-            
-            # Calculate metrics
-            total_clients = Client.objects.count()
-            active_clients = Client.objects.filter(
-                formgenerationbatch__created_at__gte=thirty_days_ago
-            ).distinct().count()
-            
-            forms_generated = FormGenerationBatch.objects.filter(
-                created_at__gte=thirty_days_ago
-            ).count()
-            
-            # Calculate quota usage
-            total_quota = User.objects.aggregate(
-                total=Sum('monthly_form_quota')
-            )['total'] or 0
-            used_quota = FormGenerationBatch.objects.filter(
-                created_at__gte=thirty_days_ago
-            ).count()
-            quota_usage = (used_quota / total_quota * 100) if total_quota > 0 else 0
-            
-            # Get metrics by form type
-            metrics_by_type = FormGenerationBatch.objects.filter(
-                created_at__gte=thirty_days_ago
-            ).values('insurer').annotate(
-                count=Count('id')
-            )
-            
-            # Create new metrics record
-            metrics = DashboardMetrics.objects.create(
-                date=today,
-                total_clients=total_clients,
-                active_clients=active_clients,
-                forms_generated=forms_generated,
-                quota_usage=quota_usage,
-                metrics_by_type={
-                    item['insurer']: item['count'] 
-                    for item in metrics_by_type
-                }
-            )
-            return metrics
-        except Exception as e:
-            logger.error(f"Error calculating metrics: {str(e)}", exc_info=True)
-            # Return a default metrics object
-            return DashboardMetrics.objects.create(
-                date=timezone.now().date(),
-                total_clients=0,
-                active_clients=0,
-                forms_generated=0,
-                quota_usage=0,
-                metrics_by_type={}
-            )
-    
     def _get_user_quota(self, user):
         try:
             today = timezone.now().date()
@@ -137,6 +88,40 @@ class DashboardViewSet(APIView):
                 'remaining': user.monthly_form_quota
             }
 
+class UsageTimeSeriesView(APIView):
+    """Form generation usage over time, served from the daily rollup table."""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        serializer = UsageTimeSeriesQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+        
+        rollups = self._get_scoped_rollups(request.user)
+        if params.get('company'):
+            rollups = rollups.filter(broker_company_id=params['company'])
+        if params.get('user'):
+            rollups = rollups.filter(user_id=params['user'])
+        if params.get('insurer'):
+            rollups = rollups.filter(insurer=params['insurer'])
+        
+        return Response(MetricsRollupService.usage_series(
+            rollups,
+            start=params['start'],
+            end=params['end'],
+            interval=params['interval'],
+            group_by=params.get('group_by'),
+        ))
+    
+    def _get_scoped_rollups(self, user):
+        """Limit rollups to what the user may see, mirroring UserViewSet scoping."""
+        if user.is_superuser:
+            return DailyUsageRollup.objects.all()
+        elif user.role == 'admin':
+            return DailyUsageRollup.objects.filter(broker_company_id=user.broker_company_id)
+        return DailyUsageRollup.objects.filter(user=user)
+
 class QuickAccessLinkViewSet(ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = QuickAccessLink.objects.filter(is_active=True)
@@ -1,3 +1,30 @@
 from django.contrib import admin
+from .models import ExtractionCacheEntry, ExtractionSession
 
-# Register your models here.
+
+@admin.register(ExtractionCacheEntry)
+class ExtractionCacheEntryAdmin(admin.ModelAdmin):
+    """Admin interface for ExtractionCacheEntry model."""
+    
+    list_display = ('key', 'model', 'fields_version', 'hits', 'created_at', 'last_used_at', 'expires_at')
+    list_filter = ('model', 'fields_version')
+    readonly_fields = ('key', 'model', 'fields_version', 'result', 'created_at', 'last_used_at', 'expires_at', 'hits')
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ExtractionSession)
+class ExtractionSessionAdmin(admin.ModelAdmin):
+    """Admin interface for ExtractionSession model."""
+    
+    list_display = ('id', 'user', 'created_at', 'updated_at', 'expires_at')
+    list_select_related = ('user',)
+    search_fields = ('user__email',)
+    readonly_fields = (
+        'id', 'user', 'field_keys', 'segments', 'fields', 'sources', 'failed_fields',
+        'created_at', 'updated_at', 'expires_at',
+    )
+    
+    def has_add_permission(self, request):
+        return False
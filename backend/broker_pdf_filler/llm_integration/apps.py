@@ -1,6 +1,28 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+def running_management_command():
+    """Whether this process runs a management command other than ``runserver``."""
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if program not in ('manage.py', 'django-admin', 'django-admin.py', '__main__.py'):
+        return False
+    return len(sys.argv) < 2 or sys.argv[1] != 'runserver'
+
+
 class LlmIntegrationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'broker_pdf_filler.llm_integration'
+
+    def ready(self):
+        """Tokenize the field guides up front so the first extraction doesn't pay for it.
+
+        Skipped for management commands (migrate, check, test, ...), which
+        don't extract and shouldn't wait on the tokenizer download.
+        """
+        from django.conf import settings
+        if getattr(settings, 'LLM_PRECOMPILE_PROMPTS', True) and not running_management_command():
+            from .prompts import compiled_guides
+            compiled_guides()
@@ -0,0 +1,83 @@
+"""
+Persistent cache of LLM extraction results.
+
+Extraction is slow and billed per token, and users often resubmit the same
+notes, or notes that differ only in spacing. Results are stored in the
+``ExtractionCacheEntry`` table under a hash of:
+
+- the input text, normalized (Unicode NFKC, so full-width ``：`` matches
+  ``:``; runs of spaces collapsed; blank lines dropped);
+- the standardized field registry version, so edited guides invalidate entries;
+- the requested field keys and the model name.
+
+Entries expire after ``LLM_CACHE_TTL`` seconds. When there are more than
+``LLM_CACHE_MAX_ENTRIES``, the least recently used entries are evicted. The
+eviction query sorts the whole table, so it isn't run on the request path:
+schedule the ``prune_extraction_cache`` command. Expired entries are never
+served in the meantime.
+"""
+import hashlib
+import re
+import unicodedata
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ExtractionCacheEntry
+
+CACHE_TTL = getattr(settings, 'LLM_CACHE_TTL', 7 * 24 * 60 * 60)
+MAX_ENTRIES = getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 10000)
+_SPACES_RE = re.compile(r'[^\S\n]+')
+
+
+def normalize_text(text):
+    """Normalize text so inputs that differ only in form or spacing compare equal."""
+    text = unicodedata.normalize('NFKC', text)
+    lines = (_SPACES_RE.sub(' ', line).strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def cache_key(text, model, fields_version, field_keys):
+    """Return the cache key for extracting ``field_keys`` from ``text``."""
+    parts = [normalize_text(text), model, fields_version, ','.join(sorted(field_keys))]
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
+
+
+def get_cached(key):
+    """Return the cached result for ``key``, or None; counts the hit."""
+    now = timezone.now()
+    result = (
+        ExtractionCacheEntry.objects
+        .filter(key=key, expires_at__gt=now)
+        .values_list('result', flat=True)
+        .first()
+    )
+    if result is not None:
+        ExtractionCacheEntry.objects.filter(key=key).update(last_used_at=now, hits=F('hits') + 1)
+    return result
+
+
+def store(key, model, fields_version, result, ttl=None):
+    """Cache ``result`` under ``key``; see ``evict`` for removing old entries."""
+    now = timezone.now()
+    ExtractionCacheEntry.objects.update_or_create(
+        key=key,
+        defaults={
+            'model': model,
+            'fields_version': fields_version,
+            'result': result,
+            'expires_at': now + timedelta(seconds=ttl or CACHE_TTL),
+            'last_used_at': now,
+        },
+    )
+
+
+def evict(max_entries=None):
+    """Delete expired entries and all but the ``max_entries`` most recently used."""
+    max_entries = MAX_ENTRIES if max_entries is None else max_entries
+    deleted = ExtractionCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+    stale = ExtractionCacheEntry.objects.order_by('-last_used_at', 'key').values('key')[max_entries:]
+    deleted += ExtractionCacheEntry.objects.filter(key__in=stale).delete()[0]
+    return deleted
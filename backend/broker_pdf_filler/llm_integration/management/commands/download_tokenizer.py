@@ -0,0 +1,16 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from broker_pdf_filler.llm_integration.prompts import load_tiktoken_encoder
+
+
+class Command(BaseCommand):
+    help = 'Downloads the tiktoken encoding for LLM_MODEL into TIKTOKEN_CACHE_DIR'
+
+    def handle(self, *args, **options):
+        try:
+            encoder = load_tiktoken_encoder()
+        except Exception as e:
+            raise CommandError(f'Error loading the tokenizer: {str(e)}')
+        cache_dir = os.environ.get('TIKTOKEN_CACHE_DIR', '')
+        self.stdout.write(self.style.SUCCESS(f'Tokenizer {encoder.name} is available in {cache_dir}'))
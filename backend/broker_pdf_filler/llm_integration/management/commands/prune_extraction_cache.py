@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from broker_pdf_filler.llm_integration.cache import MAX_ENTRIES, evict
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired and least recently used LLM extraction cache entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-entries', type=int, default=MAX_ENTRIES,
+                            help=f'Number of most recently used entries to keep (default: {MAX_ENTRIES})')
+
+    def handle(self, *args, **options):
+        deleted = evict(options['max_entries'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} extraction cache entries'))
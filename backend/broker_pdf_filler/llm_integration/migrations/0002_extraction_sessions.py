@@ -0,0 +1,37 @@
+# Generated by Django 5.1 on 2026-10-19 05:50
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('llm_integration', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('field_keys', models.JSONField(default=list)),
+                ('segments', models.JSONField(default=list)),
+                ('fields', models.JSONField(default=dict)),
+                ('sources', models.JSONField(default=dict)),
+                ('failed_fields', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extraction_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'extraction session',
+                'verbose_name_plural': 'extraction sessions',
+                'ordering': ['-updated_at'],
+            },
+        ),
+    ]
@@ -1,3 +1,61 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class ExtractionCacheEntry(models.Model):
+    """Fields extracted by the model for one input, reused for identical requests.
+    
+    Keyed by a hash of the normalized text, field registry version, requested
+    fields and model; see llm_integration.cache.
+    """
+    
+    key = models.CharField(max_length=64, primary_key=True)
+    model = models.CharField(max_length=100)
+    fields_version = models.CharField(max_length=32)
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    hits = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = _('extraction cache entry')
+        verbose_name_plural = _('extraction cache entries')
+        ordering = ['-last_used_at']
+    
+    def __str__(self):
+        return f"{self.key[:12]} ({self.model}, {self.hits} hits)"
+
 
-# Create your models here.
+class ExtractionSession(models.Model):
+    """What an extraction found in a user's notes, kept so edits can be re-extracted in part.
+    
+    The notes themselves aren't stored: ``segments`` holds a hash of each
+    line, and ``sources`` maps each field to the hashes of the lines its
+    value was found on; see llm_integration.sessions.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='extraction_sessions'
+    )
+    field_keys = models.JSONField(default=list)
+    segments = models.JSONField(default=list)
+    fields = models.JSONField(default=dict)
+    sources = models.JSONField(default=dict)
+    failed_fields = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        verbose_name = _('extraction session')
+        verbose_name_plural = _('extraction sessions')
+        ordering = ['-updated_at']
+    
+    def __str__(self):
+        return f"{self.user} ({len(self.fields)} fields)"
@@ -0,0 +1,104 @@
+"""
+Concurrent execution of chunked extraction prompts.
+
+A compiled extraction request may consist of several prompt chunks (see
+``llm_integration.prompts``). Sending them one after the other makes the
+user wait for the sum of the model latencies; ``ExtractionOrchestrator``
+sends them concurrently on an asyncio event loop instead, so the wait is
+roughly that of the slowest chunk:
+
+- at most ``LLM_MAX_CONCURRENCY`` calls are in flight at once;
+- each call is abandoned after ``LLM_TIMEOUT`` seconds;
+- failed or timed-out calls are retried ``LLM_MAX_RETRIES`` times with
+  exponential backoff starting at ``LLM_RETRY_BACKOFF`` seconds.
+
+Providers that block run in a worker thread (see ``LLMProvider.acomplete``),
+which can't be interrupted: an abandoned call keeps its concurrency slot
+until the thread returns (the provider's own request timeout bounds that),
+so retries never push the number of requests in flight past the limit.
+
+A chunk that still fails doesn't fail the others: its outcome is the
+exception, and the caller decides what to do with the fields it covered.
+``run`` returns all outcomes at once; ``stream`` yields each one as soon as
+its chunk is done.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+
+from .prompts import SYSTEM_MESSAGE
+from .providers import LLMError
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = getattr(settings, 'LLM_MAX_CONCURRENCY', 4)
+CALL_TIMEOUT = getattr(settings, 'LLM_TIMEOUT', 30.0)
+MAX_RETRIES = getattr(settings, 'LLM_MAX_RETRIES', 2)
+RETRY_BACKOFF = getattr(settings, 'LLM_RETRY_BACKOFF', 0.5)
+
+
+class ExtractionOrchestrator:
+    """Runs prompt chunks against a provider with bounded parallelism, timeouts and retries."""
+
+    def __init__(self, provider, max_concurrency=None, timeout=None, retries=None, backoff=None):
+        self.provider = provider
+        self.max_concurrency = max_concurrency or MAX_CONCURRENCY
+        self.timeout = timeout or CALL_TIMEOUT
+        self.retries = MAX_RETRIES if retries is None else retries
+        self.backoff = RETRY_BACKOFF if backoff is None else backoff
+
+    async def run(self, chunks, parse):
+        """Send every chunk and return one outcome per chunk, in order.
+
+        An outcome is ``parse(reply, chunk.field_keys)``, or the ``LLMError``
+        raised by the last attempt when all attempts failed.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(*(self._run_chunk(chunk, parse, semaphore) for chunk in chunks))
+
+    async def stream(self, chunks, parse):
+        """Send every chunk and yield ``(chunk, outcome)`` pairs in order of completion.
+
+        Calls still in flight are cancelled when the generator is closed early,
+        e.g. because the client went away.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_chunk(chunk):
+            return chunk, await self._run_chunk(chunk, parse, semaphore)
+
+        tasks = [asyncio.ensure_future(run_chunk(chunk)) for chunk in chunks]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _call(self, chunk, semaphore):
+        await semaphore.acquire()
+        call = asyncio.ensure_future(self.provider.acomplete(SYSTEM_MESSAGE, chunk.prompt))
+        call.add_done_callback(lambda call: _release(call, semaphore))
+        # Only stop waiting on timeout; the slot is freed when the call really ends
+        return await asyncio.wait_for(asyncio.shield(call), self.timeout)
+
+    async def _run_chunk(self, chunk, parse, semaphore):
+        for attempt in range(self.retries + 1):
+            try:
+                reply = await self._call(chunk, semaphore)
+                return parse(reply, chunk.field_keys)
+            except (LLMError, asyncio.TimeoutError) as e:
+                error = e if isinstance(e, LLMError) else LLMError(f"LLM call timed out after {self.timeout}s")
+                if attempt == self.retries:
+                    logger.warning(f"Giving up on {', '.join(chunk.categories)} after {attempt + 1} attempts: {str(error)}")
+                    return error
+                logger.info(f"Retrying {', '.join(chunk.categories)} after attempt {attempt + 1} failed: {str(error)}")
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+
+def _release(call, semaphore):
+    semaphore.release()
+    if not call.cancelled():
+        # Mark the outcome of abandoned calls as retrieved
+        call.exception()
@@ -0,0 +1,217 @@
+"""
+Token-budgeted prompts for field extraction.
+
+Sending every ``llm_guide`` with every request wastes tokens and latency, so
+prompts only carry the guides of the fields being extracted (e.g. the fields
+mapped on the selected form templates), and are kept under
+``LLM_PROMPT_TOKEN_BUDGET`` tokens.
+
+The guide line of every standardized field is rendered and tokenized once per
+registry version, so compiling a prompt only tokenizes the input text. When
+the fields don't fit in one prompt alongside the text, they are split into
+chunks along registry categories: whole categories are packed first-fit into
+as few chunks as the budget allows, and a category too large for one chunk is
+split across several. Chunks are independent and can be sent in parallel.
+
+Token counts come from the ``tiktoken`` encoding for ``LLM_MODEL``. tiktoken
+downloads encodings on first use and keeps them in ``TIKTOKEN_CACHE_DIR``;
+``manage.py download_tokenizer`` fetches them ahead of time (e.g. when
+building an image), so servers without network access can load them. Where
+the encoding can't be loaded, counts are estimated from the text instead: one
+token per CJK character and per four other characters. Loading is retried
+every ``TOKENIZER_RETRY_INTERVAL`` seconds, so a transient failure doesn't pin
+the estimate for the life of the process.
+"""
+import logging
+import os
+import re
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+from ..utils.standardized_fields import get_standardized_fields, registry_version
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_MESSAGE = (
+    "You extract structured information about insurance clients from unstructured text. "
+    "Extract only the requested fields. If a field is not found in the text, use null. "
+    "Reply with a single JSON object keyed by the exact field names given, and nothing else."
+)
+FIELDS_HEADER = 'Fields to extract:\n'
+TEXT_HEADER = '\n\nText:\n'
+# Chat formatting tokens added per request (message framing and reply priming)
+MESSAGE_OVERHEAD = 8
+TOKEN_BUDGET = getattr(settings, 'LLM_PROMPT_TOKEN_BUDGET', 3000)
+TOKENIZER_RETRY_INTERVAL = 5 * 60
+
+_CJK_RE = re.compile(r'[\u3000-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+
+class PromptBudgetExceeded(ValueError):
+    """The input text alone doesn't fit in the token budget."""
+
+
+class EstimatingEncoder:
+    """Stand-in for a tiktoken encoding that estimates token counts."""
+    name = 'estimate'
+
+    def count(self, text):
+        cjk = len(_CJK_RE.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+
+class TiktokenEncoder:
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.name = encoding.name
+
+    def count(self, text):
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+_estimating_encoder = EstimatingEncoder()
+_next_load_attempt = 0
+
+
+@lru_cache(maxsize=1)
+def load_tiktoken_encoder():
+    """Return the tiktoken encoding for the configured model; raises when it can't be loaded.
+
+    Only successful loads are cached.
+    """
+    tokenizer_cache_dir = getattr(settings, 'TIKTOKEN_CACHE_DIR', '')
+    if tokenizer_cache_dir:
+        os.environ.setdefault('TIKTOKEN_CACHE_DIR', tokenizer_cache_dir)
+    import tiktoken
+    try:
+        encoding = tiktoken.encoding_for_model(getattr(settings, 'LLM_MODEL', 'gpt-4o-mini'))
+    except KeyError:
+        encoding = tiktoken.get_encoding(getattr(settings, 'LLM_TOKENIZER_ENCODING', 'cl100k_base'))
+    return TiktokenEncoder(encoding)
+
+
+def get_encoder():
+    """Return the token counter for the configured model, or the estimator while it can't be loaded."""
+    global _next_load_attempt
+    if load_tiktoken_encoder.cache_info().currsize == 0 and time.monotonic() < _next_load_attempt:
+        return _estimating_encoder
+    try:
+        return load_tiktoken_encoder()
+    except Exception as e:
+        _next_load_attempt = time.monotonic() + TOKENIZER_RETRY_INTERVAL
+        model = getattr(settings, 'LLM_MODEL', 'gpt-4o-mini')
+        logger.warning(f"Error loading the tokenizer for {model}, estimating token counts: {str(e)}")
+        return _estimating_encoder
+
+
+def count_tokens(text):
+    return get_encoder().count(text)
+
+
+def render_guide(key, definition):
+    """Return the prompt line describing one field."""
+    required = 'required' if definition.get('required') else 'optional'
+    line = f"- {key} ({definition.get('display_name', key)}, {required})"
+    if definition.get('llm_guide'):
+        line += f": {definition['llm_guide']}"
+    return line
+
+
+@lru_cache(maxsize=4)
+def _compiled_guides(version, encoder):
+    guides = {}
+    for key, definition in get_standardized_fields().items():
+        line = render_guide(key, definition)
+        guides[key] = (definition.get('category') or 'Other', line, encoder.count(line + '\n'))
+    return guides
+
+
+def compiled_guides():
+    """Return ``{field key: (category, guide line, token count)}`` for the current registry."""
+    # Keyed by encoder too, so estimated counts are redone once tiktoken loads
+    return _compiled_guides(registry_version(), get_encoder())
+
+
+class PromptChunk:
+    """One prompt of a compiled extraction request."""
+
+    def __init__(self, field_keys, categories, prompt, estimated_tokens):
+        self.field_keys = field_keys
+        self.categories = categories
+        self.prompt = prompt
+        self.estimated_tokens = estimated_tokens
+
+    def __repr__(self):
+        return f"<PromptChunk {self.categories} {len(self.field_keys)} fields, ~{self.estimated_tokens} tokens>"
+
+
+def base_tokens(text):
+    """Return the tokens every prompt for ``text`` costs before any field guide."""
+    return (
+        MESSAGE_OVERHEAD + count_tokens(SYSTEM_MESSAGE)
+        + count_tokens(FIELDS_HEADER) + count_tokens(TEXT_HEADER) + count_tokens(text)
+    )
+
+
+def compile_prompts(text, field_keys=None, budget=None):
+    """Split the extraction of ``field_keys`` from ``text`` into prompts under ``budget`` tokens.
+
+    Returns a list of ``PromptChunk``; raises ``PromptBudgetExceeded`` when the
+    text leaves no room for any field guide.
+    """
+    guides = compiled_guides()
+    budget = budget or TOKEN_BUDGET
+    field_keys = [key for key in (field_keys or guides) if key in guides]
+    base = base_tokens(text)
+    available = budget - base
+    largest = max((guides[key][2] for key in field_keys), default=0)
+    if available < largest:
+        raise PromptBudgetExceeded(
+            f"Text needs {base} of the {budget} token budget, leaving no room for field guides"
+        )
+
+    # Group by category, keeping registry order within and across categories
+    categories = {}
+    for key in field_keys:
+        categories.setdefault(guides[key][0], []).append(key)
+
+    if sum(guides[key][2] for key in field_keys) <= available:
+        groups = [(list(categories), field_keys)]
+    else:
+        groups = _pack(categories, guides, available)
+
+    chunks = []
+    for chunk_categories, keys in groups:
+        prompt = FIELDS_HEADER + '\n'.join(guides[key][1] for key in keys) + TEXT_HEADER + text
+        tokens = base + sum(guides[key][2] for key in keys)
+        chunks.append(PromptChunk(keys, chunk_categories, prompt, tokens))
+    return chunks
+
+
+def _pack(categories, guides, available):
+    """Pack whole categories first-fit into chunks; split categories that don't fit alone."""
+    pieces = []
+    for category, keys in categories.items():
+        piece, size = [], 0
+        for key in keys:
+            if piece and size + guides[key][2] > available:
+                pieces.append((category, piece, size))
+                piece, size = [], 0
+            piece.append(key)
+            size += guides[key][2]
+        pieces.append((category, piece, size))
+
+    chunks = []
+    for category, keys, size in pieces:
+        for chunk in chunks:
+            if chunk[2] + size <= available:
+                if category not in chunk[0]:
+                    chunk[0].append(category)
+                chunk[1].extend(keys)
+                chunk[2] += size
+                break
+        else:
+            chunks.append([[category], list(keys), size])
+    return [(chunk_categories, keys) for chunk_categories, keys, _ in chunks]
@@ -0,0 +1,154 @@
+"""
+LLM providers used by the extraction service.
+
+A provider sends a system message and a prompt to a model and returns the
+text of its reply. ``get_provider()`` returns the one selected by
+``LLM_PROVIDER``:
+
+- ``'openai'``: an OpenAI-compatible chat completions API at ``LLM_API_BASE``
+  (OpenAI, an Azure OpenAI v1 endpoint or a local gateway);
+- ``'stub'``: answers locally without network access, for development and tests;
+- the dotted path of an ``LLMProvider`` subclass.
+
+The default is ``'openai'``, which needs ``LLM_API_KEY``: a deployment that
+wasn't configured fails loudly instead of serving made-up extraction results.
+"""
+import asyncio
+import json
+import re
+import threading
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+class LLMError(Exception):
+    """The model could not be reached or did not return a usable reply."""
+
+
+class LLMProvider:
+    """Base class for providers; subclasses implement ``complete``."""
+    name = 'base'
+
+    def __init__(self, model):
+        self.model = model
+
+    def complete(self, system, prompt):
+        """Return the model's reply to ``prompt`` as text; raises ``LLMError``."""
+        raise NotImplementedError
+
+    async def acomplete(self, system, prompt):
+        """Async ``complete``; by default runs the blocking call in a worker thread."""
+        return await asyncio.to_thread(self.complete, system, prompt)
+
+
+class OpenAIProvider(LLMProvider):
+    """Chat completions over HTTP, asking the model for a JSON object."""
+    name = 'openai'
+
+    def __init__(self, model, api_base, api_key='', timeout=30.0):
+        super().__init__(model)
+        self.url = f"{api_base.rstrip('/')}/chat/completions"
+        self.api_key = api_key
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        # requests sessions aren't thread-safe; keep one connection pool per thread
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def complete(self, system, prompt):
+        body = {
+            'model': self.model,
+            'messages': [
+                {'role': 'system', 'content': system},
+                {'role': 'user', 'content': prompt},
+            ],
+            'temperature': 0,
+            'response_format': {'type': 'json_object'},
+        }
+        headers = {'Authorization': f'Bearer {self.api_key}'} if self.api_key else {}
+        try:
+            response = self.session.post(self.url, json=body, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()['choices'][0]['message']['content']
+        except requests.RequestException as e:
+            raise LLMError(f"LLM request failed: {str(e)}") from e
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise LLMError(f"Unexpected LLM response: {str(e)}") from e
+
+
+class StubProvider(LLMProvider):
+    """Local provider that answers from ``Label: value`` lines in the text.
+
+    Labels are matched against the requested fields' keys and display names,
+    which is enough for development against simple inputs. Tests can pass
+    ``reply``, a callable taking ``(system, prompt)``, to control the answer,
+    and ``record_calls=True`` to have every call recorded in ``calls``.
+    """
+    name = 'stub'
+
+    _FIELD_RE = re.compile(r'^- (\S+) \(([^,]+),', re.MULTILINE)
+    _LINE_RE = re.compile(r'^\W*([^:：\n]+?)\s*[:：]\s*(.+?)\s*$', re.MULTILINE)
+
+    def __init__(self, model='stub', reply=None, record_calls=False):
+        super().__init__(model)
+        self.reply = reply
+        self.record_calls = record_calls
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def complete(self, system, prompt):
+        if self.record_calls:
+            with self._lock:
+                self.calls.append((system, prompt))
+        if self.reply is not None:
+            return self.reply(system, prompt)
+
+        fields, _, text = prompt.partition('\nText:\n')
+        labels = {}
+        for key, display_name in self._FIELD_RE.findall(fields):
+            labels[key.lower()] = key
+            labels[display_name.strip().lower()] = key
+        values = {}
+        for label, value in self._LINE_RE.findall(text):
+            key = labels.get(label.strip().lower())
+            if key and key not in values:
+                values[key] = value
+        return json.dumps(values, ensure_ascii=False)
+
+
+def build_provider(name=None):
+    """Create the provider named by ``name`` (default: ``LLM_PROVIDER``)."""
+    name = name or getattr(settings, 'LLM_PROVIDER', 'openai')
+    model = getattr(settings, 'LLM_MODEL', 'gpt-4o-mini')
+    if name == 'stub':
+        return StubProvider()
+    if name == 'openai':
+        api_base = getattr(settings, 'LLM_API_BASE', 'https://api.openai.com/v1')
+        api_key = getattr(settings, 'LLM_API_KEY', '')
+        if not api_key and api_base.startswith('https://api.openai.com/'):
+            raise ImproperlyConfigured("LLM_API_KEY is required for the OpenAI API; set LLM_PROVIDER='stub' for local development")
+        return OpenAIProvider(
+            model,
+            api_base=api_base,
+            api_key=api_key,
+            timeout=getattr(settings, 'LLM_TIMEOUT', 30.0),
+        )
+    try:
+        provider_class = import_string(name)
+    except ImportError as e:
+        raise ImproperlyConfigured(f"Unknown LLM_PROVIDER: {name!r}") from e
+    return provider_class(model)
+
+
+@lru_cache(maxsize=1)
+def get_provider():
+    return build_provider()
@@ -0,0 +1,27 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+def format_event(event, data):
+    """Encode one Server-Sent Event with a JSON payload."""
+    payload = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n".encode('utf-8')
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Renders a regular response for an event stream client as a single event.
+
+    Errors become an ``error`` event and other responses a ``complete``
+    event, so clients reading ``text/event-stream`` can handle them like the
+    end of a stream.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        event = 'error' if response is not None and response.status_code >= 400 else 'complete'
+        return format_event(event, data)
@@ -0,0 +1,112 @@
+"""
+Rule-based extraction of fields with rigid formats.
+
+Some standardized fields can be read from client notes with regular
+expressions, which takes microseconds and costs no tokens. They are
+extracted here before the model is asked for anything, and only the fields
+left unresolved are sent to it. Only high-confidence values are taken:
+
+- a value on a line labelled with one of the field's ``LABELS`` (e.g.
+  ``Tel: 9123 4567``) that passes the field's type check (see
+  ``llm_integration.validation``); a field labelled twice with different
+  values is left to the model;
+- an HKID number anywhere in the text whose check digit is correct;
+- an email address, when the text contains exactly one.
+
+A date of birth also resolves ``DOB_D``, ``DOB_M`` and ``DOB_Y``.
+"""
+import re
+
+from .validation import CHECKS, field_type
+
+LABELS = {
+    'idNumber': (
+        'hkid', 'hkid no', 'hkid no.', 'hkid number', 'id no', 'id no.', 'id number',
+        'identity card number', '身份證', '身份證號碼',
+    ),
+    'email': ('email', 'e-mail', 'email address', '電郵', '電郵地址'),
+    'phoneNumber': (
+        'phone', 'phone no', 'phone number', 'tel', 'tel no', 'mobile', 'mobile no', 'mobile number',
+        'contact number', '電話', '手機', '手提電話', '聯絡電話',
+    ),
+    'officePhoneNumber': (
+        'office tel', 'office phone', 'office phone number', 'work phone', 'business phone',
+        '辦公室電話', '公司電話',
+    ),
+    'dateOfBirth': ('dob', 'd.o.b.', 'date of birth', 'birth date', 'birthday', '出生日期'),
+    'fullNameChinese': ('中文姓名', '中文名', '中文名字', '中文身份證姓名'),
+}
+FIELD_LABELS = {label: key for key, labels in LABELS.items() for label in labels}
+
+_LINE_RE = re.compile(r'^\W*([^:：\n]+?)\s*[:：]\s*(.+?)\s*$', re.MULTILINE)
+_HKID_RE = re.compile(r'(?<![A-Za-z0-9])([A-Z]{1,2})\s?(\d{6})\s?(?:\(\s?([0-9A])\s?\)|([0-9A]))(?![A-Za-z0-9])')
+_EMAIL_RE = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+_CHINESE_NAME_RE = re.compile(r'^[\u3400-\u9fff]{2,6}$')
+
+
+def hkid_check_digit(prefix, digits):
+    """Return the check digit of an HKID number (``'A'`` stands for 10)."""
+    values = [36] * (2 - len(prefix)) + [ord(char) - ord('A') + 10 for char in prefix] + [int(d) for d in digits]
+    total = sum(value * weight for value, weight in zip(values, range(9, 1, -1)))
+    check = (11 - total % 11) % 11
+    return 'A' if check == 10 else str(check)
+
+
+def parse_hkid(value):
+    """Return ``value`` as a normalized HKID number (``A123456(3)``), or None if it isn't one."""
+    match = _HKID_RE.fullmatch(value.strip().upper())
+    if not match:
+        return None
+    prefix, digits, check = match.group(1), match.group(2), match.group(3) or match.group(4)
+    if hkid_check_digit(prefix, digits) != check:
+        return None
+    return f'{prefix}{digits}({check})'
+
+
+def _check(key, value):
+    """Return ``value`` normalized for field ``key``, or None when it doesn't have the field's format."""
+    if key == 'idNumber':
+        return parse_hkid(value)
+    if key == 'fullNameChinese':
+        value = re.sub(r'\s', '', value)
+        return value if _CHINESE_NAME_RE.match(value) else None
+    check = CHECKS.get(field_type(key))
+    try:
+        return check(value) if check else None
+    except ValueError:
+        return None
+
+
+def extract_by_rules(text, field_keys=None):
+    """Return the values of ``field_keys`` (default: all) that rules resolve in ``text``, in that order."""
+    found, conflicts = {}, set()
+    for label, value in _LINE_RE.findall(text):
+        key = FIELD_LABELS.get(label.strip().lower())
+        if key is None or key in conflicts:
+            continue
+        value = _check(key, value)
+        if value is None:
+            continue
+        if found.setdefault(key, value) != value:
+            conflicts.add(key)
+    for key in conflicts:
+        del found[key]
+
+    if 'idNumber' not in found and 'idNumber' not in conflicts:
+        numbers = {
+            number for number in (parse_hkid(match.group()) for match in _HKID_RE.finditer(text)) if number
+        }
+        if len(numbers) == 1:
+            found['idNumber'] = numbers.pop()
+    if 'email' not in found and 'email' not in conflicts:
+        emails = {email.lower() for email in _EMAIL_RE.findall(text)}
+        if len(emails) == 1:
+            found['email'] = _EMAIL_RE.search(text).group()
+
+    if 'dateOfBirth' in found:
+        year, month, day = found['dateOfBirth'].split('-')
+        found.update({'DOB_D': str(int(day)), 'DOB_M': str(int(month)), 'DOB_Y': year})
+
+    if field_keys is not None:
+        found = {key: found[key] for key in field_keys if key in found}
+    return found
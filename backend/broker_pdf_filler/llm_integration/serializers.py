@@ -0,0 +1,24 @@
+from rest_framework import serializers
+
+from ..utils.standardized_fields import get_standardized_fields
+
+
+class ExtractionRequestSerializer(serializers.Serializer):
+    """Free text to extract from, and optionally which standardized fields to extract.
+    
+    Fields can be listed directly or taken from the mappings of the form
+    templates that will be filled; ``dry_run`` only reports the token estimate.
+    Passing the ``session_id`` of a previous extraction of the same notes
+    re-extracts only the fields an edit may have changed.
+    """
+    text = serializers.CharField(max_length=20000, trim_whitespace=False)
+    fields = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False)
+    template_ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    dry_run = serializers.BooleanField(default=False)
+    session_id = serializers.UUIDField(required=False)
+    
+    def validate_fields(self, value):
+        unknown = sorted(set(value) - set(get_standardized_fields()))
+        if unknown:
+            raise serializers.ValidationError(f"Unknown standardized fields: {', '.join(unknown)}")
+        return list(dict.fromkeys(value))
@@ -0,0 +1,303 @@
+"""
+Extraction of structured client data from free text.
+
+The text is sent to the configured LLM provider together with the
+``llm_guide`` of each requested standardized field, and the model replies
+with a JSON object of field values. Prompts are compiled under a token
+budget (see ``llm_integration.prompts``), possibly as several chunks, and
+each chunk's result is cached (see ``llm_integration.cache``), so
+resubmitting the same notes costs neither a model call nor the wait for one.
+Fields with rigid formats are read with rules first (see
+``llm_integration.rules``) and only the rest are sent to the model. Values are
+type-checked (see ``llm_integration.validation``) before they are returned.
+When notes are edited and extracted again in the same session, only the
+fields the edit may have changed are re-extracted (see
+``llm_integration.sessions``).
+"""
+import json
+import logging
+from contextlib import aclosing
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+
+from ..pdf_forms.models import FormFieldMapping
+from ..utils.standardized_fields import get_standardized_fields, registry_version
+from . import cache as extraction_cache
+from . import sessions
+from .orchestrator import ExtractionOrchestrator
+from .prompts import base_tokens, compile_prompts, compiled_guides
+from .providers import LLMError, get_provider
+from .rules import extract_by_rules
+from .validation import validate_fields
+
+RULES_ENABLED = getattr(settings, 'LLM_RULE_EXTRACTION', True)
+
+logger = logging.getLogger(__name__)
+
+
+def fields_for_templates(template_ids):
+    """Return the standardized fields mapped on the given form templates, in registry order."""
+    mapped = set(
+        FormFieldMapping.objects
+        .filter(template_id__in=template_ids, system_field_name__isnull=False)
+        .values_list('system_field_name', flat=True)
+    )
+    return [key for key in get_standardized_fields() if key in mapped]
+
+
+def parse_reply(reply, field_keys):
+    """Parse the model's JSON reply into ``{field key: value}`` for the requested fields.
+
+    Unknown keys and empty values are dropped; values are returned as strings.
+    """
+    content = reply.strip()
+    if content.startswith('```'):
+        # Some models wrap JSON in a Markdown code fence despite instructions
+        content = content.strip('`').partition('\n')[2]
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise LLMError(f"LLM reply is not valid JSON: {str(e)}") from e
+    if not isinstance(data, dict):
+        raise LLMError('LLM reply is not a JSON object')
+
+    wanted = set(field_keys)
+    values = {}
+    for key, value in data.items():
+        if key not in wanted or value is None or isinstance(value, (dict, list)):
+            continue
+        value = str(value).strip()
+        if value:
+            values[key] = value
+    return values
+
+
+class ExtractionService:
+    """Extracts standardized field values from free text with an LLM provider."""
+
+    def __init__(self, provider=None, orchestrator=None):
+        self.provider = provider or get_provider()
+        self.orchestrator = orchestrator or ExtractionOrchestrator(self.provider)
+
+    def plan(self, text, field_keys=None, budget=None):
+        """Resolve what rules can and compile prompts for the rest.
+
+        Returns ``(field keys, rule values, prompt chunks, saved tokens)``, where
+        ``saved tokens`` estimates the prompt tokens the rules saved.
+        """
+        field_keys = list(field_keys) if field_keys else list(get_standardized_fields())
+        rule_values = extract_by_rules(text, field_keys) if RULES_ENABLED else {}
+        llm_keys = [key for key in field_keys if key not in rule_values]
+        chunks = compile_prompts(text, llm_keys, budget) if llm_keys else []
+
+        guides = compiled_guides()
+        saved_tokens = sum(guides[key][2] for key in rule_values if key in guides)
+        if rule_values and not chunks:
+            saved_tokens += base_tokens(text)
+        if rule_values:
+            logger.info(f"Rules resolved {len(rule_values)} fields, saving ~{saved_tokens} prompt tokens")
+        return field_keys, rule_values, chunks, saved_tokens
+
+    def estimate(self, text, field_keys=None, budget=None):
+        """Return the prompt chunks and estimated token count, without calling the model."""
+        _, rule_values, chunks, saved_tokens = self.plan(text, field_keys, budget)
+        return {
+            'estimated_tokens': sum(chunk.estimated_tokens for chunk in chunks),
+            'rule_fields': list(rule_values),
+            'saved_tokens': saved_tokens,
+            'chunks': [
+                {
+                    'categories': chunk.categories,
+                    'fields': chunk.field_keys,
+                    'estimated_tokens': chunk.estimated_tokens,
+                }
+                for chunk in chunks
+            ],
+        }
+
+    def _lookup(self, text, version, chunks):
+        """Return the cached values of ``chunks`` and ``(cache key, chunk)`` for the others."""
+        cached, pending = [], []
+        for chunk in chunks:
+            key = extraction_cache.cache_key(text, self.provider.model, version, chunk.field_keys)
+            chunk_values = extraction_cache.get_cached(key)
+            if chunk_values is None:
+                pending.append((key, chunk))
+            else:
+                cached.append(chunk_values)
+        return cached, pending
+
+    def extract(self, text, field_keys=None, budget=None):
+        """Extract ``field_keys`` (default: every standardized field) from ``text``.
+
+        Returns ``{'fields': {...}, 'missing_required': [...], 'invalid': {...},
+        'failed_fields': [...], 'rule_fields': [...], 'cached': bool,
+        'estimated_tokens': int, 'saved_tokens': int, 'chunks': int}``, where
+        ``invalid`` maps fields whose value failed type validation to the
+        reason, ``failed_fields`` lists the fields of chunks whose model call
+        failed, ``rule_fields`` lists the fields resolved by rules (see
+        ``llm_integration.rules``) without asking the model, ``cached`` means no
+        model call was needed, ``estimated_tokens`` counts the prompts actually
+        sent and ``saved_tokens`` those the rules saved. Chunks are sent
+        concurrently (see ``llm_integration.orchestrator``). Raises ``LLMError``
+        when every model call fails and ``PromptBudgetExceeded`` when the text
+        is too long for the budget.
+        """
+        fields = get_standardized_fields()
+        version = registry_version()
+        field_keys, rule_values, chunks, saved_tokens = self.plan(text, field_keys, budget)
+
+        values = dict(rule_values)
+        cached, pending = self._lookup(text, version, chunks)
+        for chunk_values in cached:
+            values.update(chunk_values)
+
+        failed_fields = []
+        if pending:
+            logger.info(
+                f"Extracting {len(pending)} of {len(chunks)} chunks with {self.provider.model}, "
+                f"~{sum(chunk.estimated_tokens for _, chunk in pending)} prompt tokens"
+            )
+            outcomes = async_to_sync(self.orchestrator.run)([chunk for _, chunk in pending], parse_reply)
+            errors = [outcome for outcome in outcomes if isinstance(outcome, LLMError)]
+            if len(errors) == len(pending):
+                raise errors[0]
+            for (key, chunk), outcome in zip(pending, outcomes):
+                if isinstance(outcome, LLMError):
+                    failed_fields.extend(chunk.field_keys)
+                    continue
+                extraction_cache.store(key, self.provider.model, version, outcome)
+                values.update(outcome)
+
+        values, invalid = validate_fields(values)
+        missing_required = [
+            key for key in field_keys
+            if fields.get(key, {}).get('required') and key not in values
+        ]
+        return {
+            'fields': values,
+            'missing_required': missing_required,
+            'invalid': invalid,
+            'failed_fields': failed_fields,
+            'rule_fields': list(rule_values),
+            'cached': not pending,
+            'estimated_tokens': sum(chunk.estimated_tokens for _, chunk in pending),
+            'saved_tokens': saved_tokens,
+            'chunks': len(chunks),
+        }
+
+    def extract_in_session(self, user, text, field_keys=None, session=None, budget=None):
+        """Extract like ``extract``, re-extracting only what an edit may have changed.
+
+        Without ``session`` a new one is started for ``user``. With one, the
+        text is diffed against it and only the affected fields are extracted
+        again (see ``llm_integration.sessions``); the other values are taken
+        from the session. The result also has ``session_id`` and
+        ``reextracted_fields``.
+        """
+        fields = get_standardized_fields()
+        field_keys = list(field_keys) if field_keys else list(fields)
+        segments = sessions.split_segments(text)
+        if session is None:
+            session = sessions.start_session(user)
+            affected = field_keys
+        else:
+            affected = sessions.fields_to_reextract(session, segments, field_keys)
+
+        if affected:
+            result = self.extract(text, affected, budget)
+        else:
+            result = {
+                'fields': {}, 'invalid': {}, 'failed_fields': [], 'rule_fields': [],
+                'cached': True, 'estimated_tokens': 0, 'saved_tokens': 0, 'chunks': 0,
+            }
+        logger.info(f"Re-extracting {len(affected)} of {len(field_keys)} fields in session {session.pk}")
+
+        kept = {key: value for key, value in session.fields.items() if key in field_keys and key not in affected}
+        extracted = {key: value for key, value in result['fields'].items() if key in affected}
+        values = {key: kept.get(key, extracted.get(key)) for key in field_keys if key in kept or key in extracted}
+        sessions.record(session, segments, field_keys, values, result['failed_fields'])
+
+        result.update({
+            'session_id': session.pk,
+            'fields': values,
+            'missing_required': [
+                key for key in field_keys
+                if fields.get(key, {}).get('required') and key not in values
+            ],
+            'reextracted_fields': affected,
+        })
+        return result
+
+    def stream(self, text, field_keys=None, budget=None):
+        """Extract like ``extract``, reporting fields as soon as they are resolved.
+
+        Prompts are compiled straight away, so ``PromptBudgetExceeded`` is
+        raised here; the model is only called while the returned async
+        iterator is consumed. It yields ``(event, data)`` pairs:
+
+        - ``('fields', {'source': ..., 'fields': {...}, 'invalid': {...}})``
+          once for the rule-based fields, and once per cached or extracted
+          chunk, where ``source`` is ``'rules'``, ``'cache'`` or ``'model'``
+          and only fields not reported before are included;
+        - ``('error', {'fields': [...], 'error': ...})`` for a chunk whose
+          model call failed;
+        - finally ``('complete', {...})`` with the same summary as ``extract``,
+          without the field values.
+        """
+        return self._stream(text, *self.plan(text, field_keys, budget))
+
+    async def _stream(self, text, field_keys, rule_values, chunks, saved_tokens):
+        fields = get_standardized_fields()
+        version = registry_version()
+        values, invalid, failed_fields = {}, {}, []
+
+        def resolved(source, chunk_values):
+            valid, chunk_invalid = validate_fields(chunk_values)
+            new = {key: value for key, value in valid.items() if key not in values}
+            values.update(new)
+            invalid.update(chunk_invalid)
+            return 'fields', {'source': source, 'fields': new, 'invalid': chunk_invalid}
+
+        if rule_values:
+            yield resolved('rules', rule_values)
+
+        cached, pending = await sync_to_async(self._lookup)(text, version, chunks)
+        for chunk_values in cached:
+            yield resolved('cache', chunk_values)
+
+        if pending:
+            logger.info(
+                f"Streaming {len(pending)} of {len(chunks)} chunks with {self.provider.model}, "
+                f"~{sum(chunk.estimated_tokens for _, chunk in pending)} prompt tokens"
+            )
+            keys = {id(chunk): key for key, chunk in pending}
+            outcomes = self.orchestrator.stream([chunk for _, chunk in pending], parse_reply)
+            async with aclosing(outcomes):
+                async for chunk, outcome in outcomes:
+                    if isinstance(outcome, LLMError):
+                        failed_fields.extend(chunk.field_keys)
+                        yield 'error', {
+                            'fields': chunk.field_keys,
+                            'error': 'Extraction failed for these fields, please enter them manually.',
+                        }
+                        continue
+                    await sync_to_async(extraction_cache.store)(
+                        keys[id(chunk)], self.provider.model, version, outcome
+                    )
+                    yield resolved('model', outcome)
+
+        yield 'complete', {
+            'missing_required': [
+                key for key in field_keys
+                if fields.get(key, {}).get('required') and key not in values
+            ],
+            'invalid': {key: reason for key, reason in invalid.items() if key not in values},
+            'failed_fields': failed_fields,
+            'rule_fields': list(rule_values),
+            'cached': not pending,
+            'estimated_tokens': sum(chunk.estimated_tokens for _, chunk in pending),
+            'saved_tokens': saved_tokens,
+            'chunks': len(chunks),
+        }
@@ -0,0 +1,148 @@
+"""
+Partial re-extraction of edited notes.
+
+When an agent corrects one line of pasted notes and extracts again, most
+fields can't have changed. An ``ExtractionSession`` records which lines
+(segments) of the text each field's value was found on. Edited text is
+diffed against that record by segment, and only these fields are
+re-extracted:
+
+- fields found on a segment that was changed or removed;
+- fields whose value couldn't be traced to a segment (inferred values,
+  short values such as ``M``), whenever anything changed;
+- fields missing from the last result, or whose extraction failed, when
+  segments were added;
+- fields whose display name or label appears on an added segment;
+- fields that weren't requested before.
+
+All other values are taken from the session. A value is traced to a segment
+when its letters and digits appear in it, ignoring case, spacing and
+punctuation. Dates are traced by parsing the dates in each segment, and the
+``DOB_D``/``DOB_M``/``DOB_Y`` parts follow the date of birth.
+
+Sessions expire after ``LLM_SESSION_TTL`` seconds.
+"""
+import hashlib
+import re
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..utils.standardized_fields import get_standardized_fields
+from .cache import normalize_text
+from .models import ExtractionSession
+from .rules import LABELS
+from .validation import field_type, parse_date
+
+SESSION_TTL = getattr(settings, 'LLM_SESSION_TTL', 24 * 60 * 60)
+DOB_PARTS = ('DOB_D', 'DOB_M', 'DOB_Y')
+# Values shorter than this (once compacted) match too many lines to be traced
+MIN_TRACEABLE_LENGTH = 3
+
+_PUNCTUATION_RE = re.compile(r'[\W_]+')
+_DATE_RE = re.compile(
+    r'\d{4}\s*[-/.年]\s*\d{1,2}\s*[-/.月]\s*\d{1,2}\s*日?'
+    r'|\d{1,2}[-/.]\d{1,2}[-/.]\d{4}'
+    r'|\d{1,2}(?:st|nd|rd|th)?\s+[a-z]+\.?,?\s+\d{4}'
+    r'|[a-z]+\.?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}'
+)
+
+
+def compact(text):
+    return _PUNCTUATION_RE.sub('', text.casefold())
+
+
+def split_segments(text):
+    """Return ``(hash, segment text)`` for each non-blank line of ``text``."""
+    return [
+        (hashlib.sha256(line.encode()).hexdigest()[:16], line)
+        for line in normalize_text(text).split('\n') if line
+    ]
+
+
+def trace_sources(values, segments):
+    """Return ``{field key: [hashes of the segments its value was found on]}``.
+
+    An empty list means the value couldn't be traced to any segment.
+    """
+    compacted = [(digest, compact(line)) for digest, line in segments]
+    dates = None
+    sources = {}
+    for key, value in values.items():
+        if key in DOB_PARTS:
+            continue
+        if field_type(key) == 'date':
+            if dates is None:
+                dates = [
+                    (digest, {parsed for parsed in map(parse_date, _DATE_RE.findall(line.casefold())) if parsed})
+                    for digest, line in segments
+                ]
+            sources[key] = [digest for digest, found in dates if any(d.isoformat() == value for d in found)]
+            continue
+        needle = compact(value)
+        if len(needle) < MIN_TRACEABLE_LENGTH:
+            sources[key] = []
+            continue
+        sources[key] = [digest for digest, line in compacted if needle in line]
+    for key in DOB_PARTS:
+        if key in values:
+            sources[key] = sources.get('dateOfBirth', [])
+    return {key: list(dict.fromkeys(digests)) for key, digests in sources.items()}
+
+
+def mentioned_fields(lines):
+    """Return the fields whose display name or rule label appears on one of ``lines``."""
+    labels = {}
+    for key, definition in get_standardized_fields().items():
+        labels.setdefault(compact(definition.get('display_name', key)), set()).add(key)
+    for key, key_labels in LABELS.items():
+        for label in key_labels:
+            labels.setdefault(compact(label), set()).add(key)
+    labels.pop('', None)
+
+    mentioned = set()
+    for line in map(compact, lines):
+        for label, keys in labels.items():
+            if label in line:
+                mentioned |= keys
+    return mentioned
+
+
+def fields_to_reextract(session, segments, field_keys):
+    """Return the fields of ``field_keys`` that must be extracted again from ``segments``."""
+    old, new = Counter(session.segments), Counter(digest for digest, _ in segments)
+    removed, added = old - new, new - old
+    if not removed and not added:
+        affected = set(session.failed_fields)
+    else:
+        affected = {
+            key for key, digests in session.sources.items()
+            if not digests or any(digest in removed for digest in digests)
+        }
+        if added:
+            affected |= {key for key in session.field_keys if key not in session.fields}
+            affected |= mentioned_fields(line for digest, line in segments if digest in added)
+        affected |= set(session.failed_fields)
+    affected |= set(field_keys) - set(session.field_keys)
+    return [key for key in field_keys if key in affected]
+
+
+def start_session(user):
+    """Create an empty session for ``user`` and delete expired ones."""
+    now = timezone.now()
+    ExtractionSession.objects.filter(expires_at__lte=now).delete()
+    return ExtractionSession(user=user, expires_at=now + timedelta(seconds=SESSION_TTL))
+
+
+def record(session, segments, field_keys, values, failed_fields):
+    """Save what was extracted from ``segments`` to ``session``."""
+    session.field_keys = list(field_keys)
+    session.segments = [digest for digest, _ in segments]
+    session.fields = values
+    session.sources = trace_sources(values, segments)
+    session.failed_fields = list(failed_fields)
+    session.expires_at = timezone.now() + timedelta(seconds=SESSION_TTL)
+    session.save()
+    return session
@@ -1,3 +1,663 @@
+import json
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ..pdf_forms.models import FormFieldMapping, FormTemplate
+from . import cache as extraction_cache
+from . import prompts
+from .apps import running_management_command
+from .models import ExtractionCacheEntry, ExtractionSession
+from .orchestrator import ExtractionOrchestrator
+from .prompts import (
+    EstimatingEncoder, PromptBudgetExceeded, compile_prompts, compiled_guides, count_tokens
+)
+from .providers import LLMError, OpenAIProvider, StubProvider, build_provider
+from .rules import extract_by_rules, hkid_check_digit, parse_hkid
+from .services import ExtractionService, parse_reply
+from .validation import validate_fields
+
+User = get_user_model()
+
+SAMPLE_TEXT = """Full Name: Chan Tai Man
+Email：chan.tai.man@example.com
+Occupation: Engineer
+"""
+
+
+class ExtractionServiceTests(TestCase):
+    """Tests for the LLM extraction service and its response cache."""
+
+    def setUp(self):
+        self.provider = StubProvider(record_calls=True)
+        self.service = ExtractionService(provider=self.provider)
+
+    def test_stub_extracts_labelled_fields(self):
+        result = self.service.extract(SAMPLE_TEXT, ['fullName', 'email', 'occupation', 'gender'])
+        self.assertEqual(result['fields'], {
+            'fullName': 'Chan Tai Man',
+            'email': 'chan.tai.man@example.com',
+            'occupation': 'Engineer',
+        })
+        self.assertIn('gender', result['missing_required'])
+        self.assertFalse(result['cached'])
+
+        system, prompt = self.provider.calls[0]
+        self.assertIn('- fullName (Full Name, required):', prompt)
+        self.assertNotIn('dateOfBirth', prompt)
+
+    def test_repeated_and_reformatted_text_hits_cache(self):
+        fields = ['fullName', 'email']
+        self.service.extract(SAMPLE_TEXT, fields)
+
+        reformatted = '\n\n  Full   Name: Chan Tai Man  \nEmail:chan.tai.man@example.com\nOccupation: Engineer'
+        result = self.service.extract(reformatted, fields)
+        self.assertTrue(result['cached'])
+        self.assertEqual(result['fields']['fullName'], 'Chan Tai Man')
+        self.assertEqual(len(self.provider.calls), 1)
+        self.assertEqual(ExtractionCacheEntry.objects.get().hits, 1)
+
+        # A different field set or model is a separate entry
+        self.service.extract(SAMPLE_TEXT, ['fullName', 'occupation'])
+        ExtractionService(provider=StubProvider(model='other')).extract(SAMPLE_TEXT, fields)
+        self.assertEqual(ExtractionCacheEntry.objects.count(), 3)
+
+    def test_expired_entries_are_not_used(self):
+        self.service.extract(SAMPLE_TEXT, ['fullName'])
+        ExtractionCacheEntry.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        result = self.service.extract(SAMPLE_TEXT, ['fullName'])
+        self.assertFalse(result['cached'])
+        self.assertEqual(len(self.provider.calls), 2)
+
+    def test_least_recently_used_entries_evicted(self):
+        now = timezone.now()
+        for index in range(5):
+            ExtractionCacheEntry.objects.create(
+                key=f'key-{index}', model='stub', fields_version='v1',
+                expires_at=now + timedelta(days=1), last_used_at=now - timedelta(minutes=index)
+            )
+        ExtractionCacheEntry.objects.create(
+            key='expired', model='stub', fields_version='v1',
+            expires_at=now - timedelta(seconds=1), last_used_at=now
+        )
+
+        out = StringIO()
+        call_command('prune_extraction_cache', '--max-entries', '3', stdout=out)
+        self.assertIn('Deleted 3 extraction cache entries', out.getvalue())
+        self.assertEqual(
+            sorted(ExtractionCacheEntry.objects.values_list('key', flat=True)),
+            ['key-0', 'key-1', 'key-2']
+        )
+
+    def test_provider_must_be_chosen_explicitly(self):
+        with self.settings(LLM_PROVIDER='openai', LLM_API_KEY='', LLM_API_BASE='https://api.openai.com/v1'):
+            with self.assertRaises(ImproperlyConfigured):
+                build_provider()
+        with self.settings(LLM_API_KEY='', LLM_API_BASE='http://localhost:8080/v1'):
+            self.assertIsInstance(build_provider('openai'), OpenAIProvider)
+        provider = build_provider('stub')
+        provider.complete('system', 'prompt')
+        self.assertEqual(provider.calls, [])
+
+    def test_parse_reply(self):
+        reply = '```json\n{"fullName": " Chan Tai Man ", "email": null, "gender": "", "other": "x"}\n```'
+        self.assertEqual(parse_reply(reply, ['fullName', 'email', 'gender']), {'fullName': 'Chan Tai Man'})
+        with self.assertRaises(LLMError):
+            parse_reply('not json', ['fullName'])
+        with self.assertRaises(LLMError):
+            parse_reply('[]', ['fullName'])
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Chat completions endpoint answering like ``StubProvider``, with injectable latency and failures."""
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        system, prompt = (message['content'] for message in body['messages'])
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = server.failures > 0 or (server.fail_when and server.fail_when in prompt)
+            server.failures -= 1
+        time.sleep(server.latency)
+        with server.lock:
+            server.in_flight -= 1
+
+        if fail:
+            self.send_response(500)
+            self.end_headers()
+            return
+        content = StubProvider().complete(system, prompt)
+        payload = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': content}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ExtractionOrchestratorTests(TestCase):
+    """Tests for concurrent chunk extraction against a local fake LLM server."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeLLMHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = self.server.in_flight = self.server.max_in_flight = 0
+        self.server.latency = 0
+        self.server.failures = 0
+        self.server.fail_when = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.provider = OpenAIProvider('fake', api_base=f'http://127.0.0.1:{self.server.server_port}/v1')
+
+    def chunks(self):
+        guides = compiled_guides()
+        field_keys = [key for key in guides if guides[key][0] in ('Personal Information', 'Contact Information')]
+        single = compile_prompts(SAMPLE_TEXT, field_keys)[0]
+        chunks = compile_prompts(SAMPLE_TEXT, field_keys, budget=single.estimated_tokens // 2)
+        self.assertGreaterEqual(len(chunks), 3)
+        return chunks
+
+    def test_chunks_sent_concurrently_within_limit(self):
+        chunks = self.chunks()
+        self.server.latency = 0.3
+        orchestrator = ExtractionOrchestrator(self.provider, max_concurrency=2, backoff=0.01)
+
+        started = time.monotonic()
+        outcomes = async_to_sync(orchestrator.run)(chunks, parse_reply)
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.3 * len(chunks) - 0.2)
+        self.assertEqual(self.server.max_in_flight, 2)
+        values = {}
+        for outcome in outcomes:
+            values.update(outcome)
+        self.assertEqual(values['fullName'], 'Chan Tai Man')
+        self.assertEqual(values['email'], 'chan.tai.man@example.com')
+
+    def test_failed_and_timed_out_calls_retried(self):
+        chunk = self.chunks()[0]
+        self.server.failures = 1
+        orchestrator = ExtractionOrchestrator(self.provider, retries=1, backoff=0.01)
+        self.assertIsInstance(async_to_sync(orchestrator.run)([chunk], parse_reply)[0], dict)
+        self.assertEqual(self.server.requests, 2)
+
+        self.server.latency = 0.3
+        orchestrator = ExtractionOrchestrator(self.provider, timeout=0.05, retries=1, backoff=0.01)
+        with self.assertLogs('broker_pdf_filler.llm_integration.orchestrator', 'WARNING'):
+            outcome = async_to_sync(orchestrator.run)([chunk], parse_reply)[0]
+        self.assertIsInstance(outcome, LLMError)
+        self.assertIn('timed out', str(outcome))
+        self.assertEqual(self.server.requests, 4)
+
+    def test_timed_out_calls_hold_their_slot(self):
+        chunk = self.chunks()[0]
+        self.server.latency = 0.2
+        orchestrator = ExtractionOrchestrator(
+            self.provider, max_concurrency=1, timeout=0.05, retries=2, backoff=0.01
+        )
+        with self.assertLogs('broker_pdf_filler.llm_integration.orchestrator', 'WARNING'):
+            outcome = async_to_sync(orchestrator.run)([chunk], parse_reply)[0]
+        self.assertIsInstance(outcome, LLMError)
+        self.assertEqual(self.server.max_in_flight, 1)
+
+    def test_failed_chunk_reported_and_others_returned(self):
+        self.server.fail_when = '- occupation '
+        service = ExtractionService(
+            provider=self.provider, orchestrator=ExtractionOrchestrator(self.provider, retries=1, backoff=0.01)
+        )
+        budget = compile_prompts(SAMPLE_TEXT, ['fullName', 'occupation'])[0].estimated_tokens - 1
+        with self.assertLogs('broker_pdf_filler.llm_integration.orchestrator', 'WARNING'):
+            result = service.extract(SAMPLE_TEXT, ['fullName', 'occupation'], budget=budget)
+
+        self.assertEqual(result['fields'], {'fullName': 'Chan Tai Man'})
+        self.assertEqual(result['failed_fields'], ['occupation'])
+        self.assertEqual(result['chunks'], 2)
+        # Only the successful chunk is cached
+        self.assertEqual(ExtractionCacheEntry.objects.count(), 1)
+
+
+class FieldValidationTests(TestCase):
+    """Tests for type validation of extracted values."""
+
+    def test_values_normalized_and_invalid_reported(self):
+        values, invalid = validate_fields({
+            'fullName': 'Chan Tai Man',
+            'dateOfBirth': '12/05/1980',
+            'email': 'not an email',
+            'phoneNumber': '+852 9123 4567',
+            'officePhoneNumber': '12345',
+            'numberOfDependents': '2 children',
+            'monthlyIncome': 'unknown',
+        })
+        self.assertEqual(values, {
+            'fullName': 'Chan Tai Man',
+            'dateOfBirth': '1980-05-12',
+            'DOB_D': '12',
+            'DOB_M': '5',
+            'DOB_Y': '1980',
+            'phoneNumber': '+852 9123 4567',
+            'numberOfDependents': '2',
+        })
+        self.assertEqual(set(invalid), {'email', 'officePhoneNumber', 'monthlyIncome'})
+
+    def test_dates(self):
+        for text in ('1980-05-12', '1980年5月12日', '12 May 1980', 'May 12, 1980', '12.05.1980'):
+            self.assertEqual(validate_fields({'dateOfBirth': text})[0]['dateOfBirth'], '1980-05-12', text)
+        for text in ('31/02/1980', 'yesterday', '01/01/2999'):
+            self.assertIn('dateOfBirth', validate_fields({'dateOfBirth': text})[1], text)
+
+    def test_date_parts_checked(self):
+        values, invalid = validate_fields({'DOB_D': '32', 'DOB_M': 'Mar', 'DOB_Y': '1850'})
+        self.assertEqual(values, {'DOB_M': '3'})
+        self.assertEqual(set(invalid), {'DOB_D', 'DOB_Y'})
+
+    def test_service_drops_invalid_values(self):
+        provider = StubProvider(reply=lambda system, prompt: '{"fullName": "Chan Tai Man", "email": "n/a"}')
+        text = 'Full Name: Chan Tai Man\nEmail: n/a\n'
+        result = ExtractionService(provider=provider).extract(text, ['fullName', 'email'])
+        self.assertEqual(result['fields'], {'fullName': 'Chan Tai Man'})
+        self.assertEqual(list(result['invalid']), ['email'])
+
+
+class RuleExtractionTests(TestCase):
+    """Tests for rule-based extraction ahead of the model."""
+
+    NOTES = """Client meeting 3 Mar
+中文姓名: 陳大文
+HKID A123456(3)
+DOB: 12/05/1980
+Mobile: +852 9123 4567
+Office Tel: 2345 6789
+Contact him at chan.tai.man@example.com
+Occupation: Engineer
+"""
+
+    def test_fixed_format_fields_resolved(self):
+        self.assertEqual(extract_by_rules(self.NOTES), {
+            'fullNameChinese': '陳大文',
+            'idNumber': 'A123456(3)',
+            'dateOfBirth': '1980-05-12',
+            'DOB_D': '12',
+            'DOB_M': '5',
+            'DOB_Y': '1980',
+            'phoneNumber': '+852 9123 4567',
+            'officePhoneNumber': '2345 6789',
+            'email': 'chan.tai.man@example.com',
+        })
+        self.assertEqual(extract_by_rules(self.NOTES, ['email', 'occupation']), {'email': 'chan.tai.man@example.com'})
+
+    def test_low_confidence_values_left_to_model(self):
+        text = (
+            "HKID: A123456(4)\n"              # wrong check digit
+            "Tel: 9123 4567\nTel: 9876 5432\n"  # conflicting labels
+            "DOB: sometime in 1980\n"
+            "a@example.com or b@example.com\n"
+        )
+        self.assertEqual(extract_by_rules(text), {})
+
+    def test_hkid_check_digit(self):
+        self.assertEqual(hkid_check_digit('A', '123456'), '3')
+        self.assertEqual(hkid_check_digit('AB', '987654'), '3')
+        self.assertEqual(parse_hkid('ab 987654 (3)'), 'AB987654(3)')
+        self.assertIsNone(parse_hkid('AB9876544'))
+        self.assertIsNone(parse_hkid('A12345(3)'))
+
+    def test_only_unresolved_fields_sent_to_model(self):
+        provider = StubProvider(record_calls=True)
+        keys = ['fullNameChinese', 'idNumber', 'dateOfBirth', 'email', 'occupation']
+        result = ExtractionService(provider=provider).extract(self.NOTES, keys)
+
+        self.assertEqual(result['fields']['occupation'], 'Engineer')
+        self.assertEqual(result['fields']['idNumber'], 'A123456(3)')
+        self.assertEqual(result['rule_fields'], ['fullNameChinese', 'idNumber', 'dateOfBirth', 'email'])
+        guides = compiled_guides()
+        self.assertEqual(result['saved_tokens'], sum(guides[key][2] for key in result['rule_fields']))
+        system, prompt = provider.calls[0]
+        self.assertIn('- occupation ', prompt)
+        self.assertNotIn('- idNumber ', prompt)
+
+        # Nothing left for the model: no call, and the whole prompt is saved
+        result = ExtractionService(provider=provider).extract(self.NOTES, ['idNumber', 'email'])
+        self.assertEqual(len(provider.calls), 1)
+        self.assertTrue(result['cached'])
+        self.assertEqual(result['estimated_tokens'], 0)
+        self.assertGreater(result['saved_tokens'], count_tokens(self.NOTES))
+
+
+class PromptCompilerTests(TestCase):
+    """Tests for the token-budgeted prompt compiler."""
+
+    def test_guides_compiled_once(self):
+        guides = compiled_guides()
+        self.assertIs(guides, compiled_guides())
+        category, line, tokens = guides['fullNameChinese']
+        self.assertEqual(category, 'Personal Information')
+        self.assertTrue(line.startswith('- fullNameChinese (Full Name (Chinese), required): '))
+        self.assertEqual(tokens, count_tokens(line + '\n'))
+
+    def test_only_requested_fields_in_one_prompt(self):
+        chunks = compile_prompts(SAMPLE_TEXT, ['email', 'fullName'])
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0].field_keys, ['email', 'fullName'])
+        self.assertNotIn('- occupation ', chunks[0].prompt)
+        self.assertTrue(chunks[0].prompt.endswith(SAMPLE_TEXT))
+
+        everything = compile_prompts(SAMPLE_TEXT)[0]
+        self.assertGreater(everything.estimated_tokens, chunks[0].estimated_tokens)
+
+    def test_split_by_category_under_budget(self):
+        guides = compiled_guides()
+        field_keys = [key for key in guides if guides[key][0] in ('Personal Information', 'Contact Information')]
+        single = compile_prompts(SAMPLE_TEXT, field_keys)[0]
+        personal = sum(tokens for category, _, tokens in guides.values() if category == 'Personal Information')
+        budget = single.estimated_tokens - personal // 2
+
+        chunks = compile_prompts(SAMPLE_TEXT, field_keys, budget=budget)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sorted(key for chunk in chunks for key in chunk.field_keys), sorted(field_keys))
+        for chunk in chunks:
+            self.assertLessEqual(chunk.estimated_tokens, budget)
+            self.assertEqual(
+                {guides[key][0] for key in chunk.field_keys}, set(chunk.categories)
+            )
+
+    def test_text_too_long_for_budget(self):
+        with self.assertRaises(PromptBudgetExceeded):
+            compile_prompts(SAMPLE_TEXT * 50, ['fullName'], budget=200)
+
+    def test_estimating_encoder_counts_cjk_characters(self):
+        encoder = EstimatingEncoder()
+        self.assertEqual(encoder.count('陳大文'), 3)
+        self.assertEqual(encoder.count('abcdefgh'), 2)
+
+    def test_tokenizer_load_retried_after_failure(self):
+        class Encoding:
+            name = 'words'
+
+            def encode(self, text, disallowed_special=()):
+                return text.split()
+
+        prompts.load_tiktoken_encoder.cache_clear()
+        self.addCleanup(prompts.load_tiktoken_encoder.cache_clear)
+        with mock.patch.object(prompts, '_next_load_attempt', 0), \
+                mock.patch('tiktoken.encoding_for_model') as encoding_for_model:
+            encoding_for_model.side_effect = ValueError('offline')
+            with self.assertLogs('broker_pdf_filler.llm_integration.prompts', 'WARNING'):
+                self.assertIsInstance(prompts.get_encoder(), EstimatingEncoder)
+
+            encoding_for_model.side_effect = None
+            encoding_for_model.return_value = Encoding()
+            self.assertIsInstance(prompts.get_encoder(), EstimatingEncoder)  # Not before the retry interval
+            later = time.monotonic() + prompts.TOKENIZER_RETRY_INTERVAL + 1
+            with mock.patch('time.monotonic', return_value=later):
+                self.assertEqual(prompts.get_encoder().name, 'words')
+            self.assertEqual(count_tokens('Chan Tai Man'), 3)
+            guides = compiled_guides()
+            self.assertEqual(guides['fullName'][2], len(guides['fullName'][1].split()))
+
+    def test_guides_not_precompiled_for_management_commands(self):
+        for argv, expected in (
+            (['manage.py', 'migrate'], True),
+            (['manage.py', 'test'], True),
+            (['manage.py', 'runserver'], False),
+            (['/venv/bin/gunicorn', 'broker_pdf_filler.wsgi'], False),
+        ):
+            with mock.patch('sys.argv', argv):
+                self.assertEqual(running_management_command(), expected)
+
+
+class ExtractionAPITests(TestCase):
+    """Tests for the extraction endpoint."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='llm@example.com', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('llm_integration:extract')
+        patcher = mock.patch('broker_pdf_filler.llm_integration.services.get_provider', return_value=StubProvider())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_extract(self):
+        response = self.client.post(self.url, {'text': SAMPLE_TEXT, 'fields': ['fullName']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['fields'], {'fullName': 'Chan Tai Man'})
+
+    def test_unknown_field_rejected(self):
+        response = self.client.post(self.url, {'text': SAMPLE_TEXT, 'fields': ['nope']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_provider_failure_falls_back_to_manual_entry(self):
+        def fail(system, prompt):
+            raise LLMError('down')
+
+        provider = StubProvider(reply=fail)
+        with mock.patch('broker_pdf_filler.llm_integration.services.get_provider', return_value=provider), \
+                mock.patch('broker_pdf_filler.llm_integration.orchestrator.RETRY_BACKOFF', 0), \
+                self.assertLogs('broker_pdf_filler.llm_integration.orchestrator', 'WARNING'), \
+                self.assertLogs('broker_pdf_filler.llm_integration.views', 'ERROR'):
+            response = self.client.post(self.url, {'text': SAMPLE_TEXT}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+
+    def test_dry_run_reports_estimate_for_template_fields(self):
+        template = FormTemplate.objects.create(
+            name='Application', file_name='application.pdf', category='chubb', template_file='x.pdf'
+        )
+        FormFieldMapping.objects.create(template=template, pdf_field_name='name', system_field_name='fullName')
+        FormFieldMapping.objects.create(template=template, pdf_field_name='mail', system_field_name='email')
+        FormFieldMapping.objects.create(template=template, pdf_field_name='note', system_field_name=None)
+
+        data = {'text': SAMPLE_TEXT, 'template_ids': [str(template.id)], 'dry_run': True}
+        with mock.patch.object(StubProvider, 'complete') as complete:
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        complete.assert_not_called()
+        self.assertEqual(response.data['chunks'][0]['fields'], ['fullName'])
+        self.assertEqual(response.data['rule_fields'], ['email'])
+        self.assertGreater(response.data['estimated_tokens'], count_tokens(SAMPLE_TEXT))
+
+
+class ExtractionSessionTests(TestCase):
+    """Tests for re-extracting only what an edit of the notes changed."""
+
+    NOTES = """Full Name: Chan Tai Man
+Occupation: Engineer
+Monthly Income: HK$50,000
+Gender: M
+"""
+    FIELDS = ['fullName', 'gender', 'email', 'occupation', 'monthlyIncome']
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='session@example.com', password='password123')
+        self.provider = StubProvider(record_calls=True)
+        self.service = ExtractionService(provider=self.provider)
+        result = self.service.extract_in_session(self.user, self.NOTES, self.FIELDS)
+        self.session = ExtractionSession.objects.get(pk=result['session_id'])
+
+    def reextract(self, text):
+        return self.service.extract_in_session(self.user, text, self.FIELDS, self.session)
+
+    def prompted_fields(self):
+        system, prompt = self.provider.calls[-1]
+        return [key for key in self.FIELDS if f'- {key} ' in prompt]
+
+    def test_session_records_field_sources(self):
+        self.assertEqual(self.session.fields, {
+            'fullName': 'Chan Tai Man', 'gender': 'M', 'occupation': 'Engineer', 'monthlyIncome': 'HK$50,000',
+        })
+        self.assertEqual(len(self.session.segments), 4)
+        self.assertEqual(self.session.sources['fullName'], [self.session.segments[0]])
+        self.assertEqual(self.session.sources['monthlyIncome'], [self.session.segments[2]])
+        # Too short to trace to a line
+        self.assertEqual(self.session.sources['gender'], [])
+
+    def test_only_fields_from_edited_lines_reextracted(self):
+        result = self.reextract(self.NOTES.replace('Engineer', 'Teacher'))
+
+        # The edited line's field, plus untraceable and missing ones
+        self.assertEqual(result['reextracted_fields'], ['gender', 'email', 'occupation'])
+        self.assertEqual(self.prompted_fields(), ['gender', 'email', 'occupation'])
+        self.assertEqual(result['fields'], {
+            'fullName': 'Chan Tai Man', 'gender': 'M', 'occupation': 'Teacher', 'monthlyIncome': 'HK$50,000',
+        })
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.fields['occupation'], 'Teacher')
+
+    def test_unchanged_text_needs_no_model_call(self):
+        calls = len(self.provider.calls)
+        result = self.reextract('  Full   Name: Chan Tai Man\n\n' + self.NOTES.split('\n', 1)[1])
+        self.assertEqual(result['reextracted_fields'], [])
+        self.assertTrue(result['cached'])
+        self.assertEqual(len(self.provider.calls), calls)
+        self.assertEqual(result['fields']['fullName'], 'Chan Tai Man')
+
+    def test_added_and_removed_lines(self):
+        result = self.reextract(self.NOTES + 'Email: chan.tai.man@example.com\n')
+        self.assertEqual(result['reextracted_fields'], ['gender', 'email'])
+        self.assertEqual(result['fields']['email'], 'chan.tai.man@example.com')
+
+        # The email line is gone as well
+        result = self.reextract(self.NOTES.replace('Full Name: Chan Tai Man\n', ''))
+        self.assertEqual(result['reextracted_fields'], ['fullName', 'gender', 'email'])
+        self.assertEqual(result['fields'], {'gender': 'M', 'occupation': 'Engineer', 'monthlyIncome': 'HK$50,000'})
+        self.assertIn('fullName', result['missing_required'])
+
+    def test_session_api(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        url = reverse('llm_integration:extract')
+        patcher = mock.patch('broker_pdf_filler.llm_integration.services.get_provider', return_value=self.provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        response = client.post(url, {'text': self.NOTES, 'fields': self.FIELDS}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        session_id = response.data['session_id']
+
+        data = {'text': self.NOTES.replace('Engineer', 'Teacher'), 'fields': self.FIELDS, 'session_id': str(session_id)}
+        response = client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['fields']['occupation'], 'Teacher')
+        self.assertNotIn('fullName', response.data['reextracted_fields'])
+
+        other = User.objects.create_user(email='other-session@example.com', password='password123')
+        client.force_authenticate(user=other)
+        response = client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def parse_events(body):
+    """Split a Server-Sent Events body into ``(event, data)`` pairs."""
+    events = []
+    for block in body.decode('utf-8').strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+class ExtractionStreamTests(TestCase):
+    """Tests for streaming extraction results as Server-Sent Events."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='stream@example.com', password='password123')
+        token = RefreshToken.for_user(self.user).access_token
+        self.headers = {'Authorization': f'Bearer {token}', 'Accept': 'text/event-stream'}
+        self.url = reverse('llm_integration:extract-stream')
+        patcher = mock.patch('broker_pdf_filler.llm_integration.services.get_provider', return_value=StubProvider())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, data, headers=None):
+        return self.async_client.post(
+            self.url, data, content_type='application/json', headers=self.headers if headers is None else headers
+        )
+
+    async def collect(self, response):
+        return parse_events(b''.join([chunk async for chunk in response.streaming_content]))
+
+    async def test_rule_fields_streamed_before_model_fields(self):
+        text = SAMPLE_TEXT + 'HKID: A123456(3)\n'
+        data = {'text': text, 'fields': ['fullName', 'idNumber', 'email', 'gender']}
+        response = await self.post(data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        events = await self.collect(response)
+        self.assertEqual([event for event, _ in events], ['fields', 'fields', 'complete'])
+        self.assertEqual(events[0][1]['source'], 'rules')
+        self.assertEqual(events[0][1]['fields'], {'idNumber': 'A123456(3)', 'email': 'chan.tai.man@example.com'})
+        self.assertEqual(events[1][1]['source'], 'model')
+        self.assertEqual(events[1][1]['fields'], {'fullName': 'Chan Tai Man'})
+        summary = events[2][1]
+        self.assertEqual(summary['missing_required'], ['gender'])
+        self.assertEqual(summary['rule_fields'], ['idNumber', 'email'])
+        self.assertFalse(summary['cached'])
+
+        # The same request again is answered from the cache
+        response = await self.post(data)
+        events = await self.collect(response)
+        self.assertEqual(events[1][1]['source'], 'cache')
+        self.assertTrue(events[-1][1]['cached'])
+
+    async def test_chunks_streamed_as_they_complete(self):
+        def reply(system, prompt):
+            # The Personal Information chunk answers last
+            if '- fullName ' in prompt:
+                time.sleep(0.3)
+            return StubProvider().complete(system, prompt)
+
+        def fail(system, prompt):
+            if '- monthlyIncome ' in prompt:
+                raise LLMError('down')
+            return reply(system, prompt)
+
+        field_keys = ['fullName', 'occupation', 'monthlyIncome']
+        # One field per chunk
+        budget = max(compile_prompts(SAMPLE_TEXT, [key])[0].estimated_tokens for key in field_keys)
+        provider = StubProvider(reply=fail)
+        service = ExtractionService(
+            provider=provider, orchestrator=ExtractionOrchestrator(provider, retries=0)
+        )
+        events = await sync_to_async(service.stream)(SAMPLE_TEXT, field_keys, budget)
+        with self.assertLogs('broker_pdf_filler.llm_integration.orchestrator', 'WARNING'):
+            events = [event async for event in events]
+
+        first = dict(events[:2])
+        self.assertEqual(first['error']['fields'], ['monthlyIncome'])
+        self.assertEqual(first['fields']['fields'], {'occupation': 'Engineer'})
+        self.assertEqual(events[2], ('fields', {'source': 'model', 'fields': {'fullName': 'Chan Tai Man'}, 'invalid': {}}))
+        self.assertEqual(events[3][0], 'complete')
+        self.assertEqual(events[3][1]['failed_fields'], ['monthlyIncome'])
+        self.assertEqual(events[3][1]['chunks'], 3)
+
+    async def test_invalid_request_rendered_as_error_event(self):
+        response = await self.post({'text': 'x', 'fields': ['nope']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        [(event, data)] = parse_events(response.content)
+        self.assertEqual(event, 'error')
+        self.assertIn('fields', data)
 
-# Create your tests here.
+        response = await self.post({'text': 'x'}, headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
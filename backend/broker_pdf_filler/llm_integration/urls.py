@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import ExtractionStreamView, ExtractionView
+
+app_name = 'llm_integration'
+
+urlpatterns = [
+    path('extract/', ExtractionView.as_view(), name='extract'),
+    path('extract/stream/', ExtractionStreamView.as_view(), name='extract-stream'),
+]
@@ -0,0 +1,164 @@
+"""
+Type validation of extracted field values.
+
+The model's output is checked against each standardized field's type
+before it is shown to the user. A field's type comes from the ``type``
+attribute of its registry entry when present, otherwise from
+``FIELD_TYPES``; untyped fields are free text. Values that don't parse are
+dropped and reported, so the user is asked for them instead of being shown
+something wrong. Dates are normalized to ``YYYY-MM-DD`` (numeric dates are
+read day first, as written in Hong Kong), and the ``DOB_D``/``DOB_M``/
+``DOB_Y`` parts are filled in from the date of birth when the model
+didn't return them.
+"""
+import re
+from datetime import date
+
+from django.utils import timezone
+
+from ..utils.standardized_fields import get_standardized_fields
+
+FIELD_TYPES = {
+    'dateOfBirth': 'date',
+    'DOB_D': 'day',
+    'DOB_M': 'month',
+    'DOB_Y': 'year',
+    'email': 'email',
+    'phoneNumber': 'phone',
+    'officePhoneNumber': 'phone',
+    'trPhoneNumber': 'phone',
+    'numberOfDependents': 'integer',
+    'retirementAge': 'integer',
+    'monthlyIncome': 'amount',
+    'monthlyExpenses': 'amount',
+    'netLiquidAssets': 'amount',
+}
+
+MONTHS = {
+    name: number
+    for number, names in enumerate([
+        ('jan', 'january'), ('feb', 'february'), ('mar', 'march'), ('apr', 'april'),
+        ('may',), ('jun', 'june'), ('jul', 'july'), ('aug', 'august'),
+        ('sep', 'sept', 'september'), ('oct', 'october'), ('nov', 'november'), ('dec', 'december'),
+    ], start=1)
+    for name in names
+}
+
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+_PHONE_RE = re.compile(r'^\+?[\d\s\-()]+$')
+_INTEGER_RE = re.compile(r'\d+')
+_ISO_DATE_RE = re.compile(r'^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})$')
+_NUMERIC_DATE_RE = re.compile(r'^(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})$')
+_CHINESE_DATE_RE = re.compile(r'^(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日?$')
+_WORD_DATE_RE = re.compile(r'^(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]+)\.?,?\s+(\d{4})$')
+_WORD_DATE_US_RE = re.compile(r'^([a-z]+)\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})$')
+
+
+def parse_date(value):
+    """Parse a date as written in client notes; returns a ``date`` or None."""
+    text = value.strip().lower()
+    for pattern, order in (
+        (_ISO_DATE_RE, 'ymd'),
+        (_CHINESE_DATE_RE, 'ymd'),
+        (_NUMERIC_DATE_RE, 'dmy'),
+        (_WORD_DATE_RE, 'dmy'),
+        (_WORD_DATE_US_RE, 'mdy'),
+    ):
+        match = pattern.match(text)
+        if not match:
+            continue
+        parts = dict(zip(order, match.groups()))
+        month = parts['m']
+        month = MONTHS.get(month) if not month.isdigit() else int(month)
+        try:
+            return date(int(parts['y']), month, int(parts['d'])) if month else None
+        except ValueError:
+            return None
+    return None
+
+
+def _check_date(value):
+    parsed = parse_date(value)
+    if parsed is None or parsed > timezone.localdate():
+        raise ValueError('Not a valid date.')
+    return parsed.isoformat()
+
+
+def _check_range(value, low, high, names=None):
+    text = value.strip().lower()
+    number = names.get(text) if names and not text.isdigit() else None
+    if number is None:
+        if not text.isdigit():
+            raise ValueError('Not a number.')
+        number = int(text)
+    if not low <= number <= high:
+        raise ValueError(f'Must be between {low} and {high}.')
+    return str(number)
+
+
+def _check_email(value):
+    if not _EMAIL_RE.match(value):
+        raise ValueError('Not a valid email address.')
+    return value
+
+
+def _check_phone(value):
+    if not _PHONE_RE.match(value) or len(re.sub(r'\D', '', value)) < 8:
+        raise ValueError('Not a valid phone number.')
+    return value
+
+
+def _check_integer(value):
+    match = _INTEGER_RE.search(value.replace(',', ''))
+    if not match:
+        raise ValueError('Not a number.')
+    return match.group()
+
+
+def _check_amount(value):
+    if not any(char.isdigit() for char in value):
+        raise ValueError('Not an amount.')
+    return value
+
+
+CHECKS = {
+    'date': _check_date,
+    'day': lambda value: _check_range(value, 1, 31),
+    'month': lambda value: _check_range(value, 1, 12, MONTHS),
+    'year': lambda value: _check_range(value, 1900, timezone.localdate().year),
+    'email': _check_email,
+    'phone': _check_phone,
+    'integer': _check_integer,
+    'amount': _check_amount,
+}
+
+
+def field_type(key, definition=None):
+    definition = definition if definition is not None else get_standardized_fields().get(key, {})
+    return definition.get('type') or FIELD_TYPES.get(key, 'text')
+
+
+def validate_fields(values):
+    """Check extracted values against their field types.
+
+    Returns ``(valid values, {field key: error message})``.
+    """
+    fields = get_standardized_fields()
+    valid, invalid = {}, {}
+    for key, value in values.items():
+        check = CHECKS.get(field_type(key, fields.get(key, {})))
+        if check is None:
+            valid[key] = value
+            continue
+        try:
+            valid[key] = check(value)
+        except ValueError as e:
+            invalid[key] = str(e)
+
+    if 'dateOfBirth' in valid:
+        born = date.fromisoformat(valid['dateOfBirth'])
+        for key, part in (('DOB_D', born.day), ('DOB_M', born.month), ('DOB_Y', born.year)):
+            if key not in valid:
+                valid[key] = str(part)
+                invalid.pop(key, None)
+    return valid, invalid
@@ -1,3 +1,97 @@
-from django.shortcuts import render
+import logging
+from contextlib import aclosing
 
-# Create your views here.
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import ExtractionSession
+from .prompts import PromptBudgetExceeded
+from .providers import LLMError
+from .renderers import EventStreamRenderer, format_event
+from .serializers import ExtractionRequestSerializer
+from .services import ExtractionService, fields_for_templates
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionView(APIView):
+    """Extract standardized client fields from free text."""
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'llm_extraction'
+    
+    def post(self, request):
+        serializer = ExtractionRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        params = serializer.validated_data
+        field_keys = list(params.get('fields', []))
+        if params.get('template_ids'):
+            field_keys += [
+                key for key in fields_for_templates(params['template_ids']) if key not in field_keys
+            ]
+        
+        service = ExtractionService()
+        try:
+            if params['dry_run']:
+                return Response(service.estimate(params['text'], field_keys))
+            return self.extract(service, params, field_keys)
+        except PromptBudgetExceeded as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except LLMError as e:
+            logger.error(f"Error extracting client data: {str(e)}")
+            return Response(
+                {'error': 'Extraction service is unavailable, please enter the details manually.'},
+                status=status.HTTP_502_BAD_GATEWAY
+            )
+    
+    def extract(self, service, params, field_keys):
+        session = None
+        if params.get('session_id'):
+            session = ExtractionSession.objects.filter(
+                pk=params['session_id'], user=self.request.user, expires_at__gt=timezone.now()
+            ).first()
+            if session is None:
+                return Response(
+                    {'error': 'Extraction session not found or expired.'}, status=status.HTTP_404_NOT_FOUND
+                )
+        return Response(service.extract_in_session(self.request.user, params['text'], field_keys, session))
+
+
+class ExtractionStreamView(ExtractionView):
+    """Extract standardized client fields from free text, streamed as Server-Sent Events.
+    
+    Takes the same parameters as ``ExtractionView``. Fields are sent in
+    ``fields`` events as rules, the cache or each prompt chunk resolve them,
+    failed chunks in ``error`` events, and the stream ends with a ``complete``
+    event carrying the summary (see ``ExtractionService.stream``).
+    
+    The stream is an async iterator: served over ASGI it runs on the event
+    loop and doesn't hold a worker thread while waiting for the model.
+    """
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+    
+    def extract(self, service, params, field_keys):
+        if params.get('session_id'):
+            return Response(
+                {'error': 'Sessions are not supported for streamed extraction.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        response = StreamingHttpResponse(
+            event_stream(service.stream(params['text'], field_keys)), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+async def event_stream(events):
+    async with aclosing(events):
+        async for event, data in events:
+            yield format_event(event, data)
@@ -0,0 +1,24 @@
+# Generated by Django 5.1 on 2026-10-19 04:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0003_keyset_pagination_indexes'),
+        ('pdf_forms', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='formgenerationbatch',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='pdf_forms_f_user_id_49a626_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generatedform',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='pdf_forms_g_user_id_f522e2_idx'),
+        ),
+    ]
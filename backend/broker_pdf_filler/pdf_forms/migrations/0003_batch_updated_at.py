@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-19 04:58
+
+from django.db import migrations, models
+
+
+def copy_created_at(apps, schema_editor):
+    """Existing batches were last modified no earlier than they were created."""
+    FormGenerationBatch = apps.get_model('pdf_forms', 'FormGenerationBatch')
+    FormGenerationBatch.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdf_forms', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formgenerationbatch',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
@@ -76,6 +76,9 @@ class GeneratedForm(models.Model):
         verbose_name = _('generated form')
         verbose_name_plural = _('generated forms')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id']),
+        ]
     
     def __str__(self):
         template_name = self.template.name if self.template else 'Unknown'
@@ -112,11 +115,15 @@ class FormGenerationBatch(models.Model):
     download_count = models.PositiveIntegerField(default=0)
     insurer = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = _('form generation batch')
         verbose_name_plural = _('form generation batches')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id']),
+        ]
     
     def __str__(self):
         return f"Batch {self.id} - {self.client} - {self.created_at.strftime('%Y-%m-%d')}"
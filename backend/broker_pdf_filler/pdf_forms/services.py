@@ -1,6 +1,5 @@
 import os
 import tempfile
-import json
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 from PyPDFForm.core.filler import Filler
@@ -9,14 +8,11 @@ from django.conf import settings
 from django.core.files import File
 from django.utils import timezone
 from .models import FormTemplate, FormFieldMapping, GeneratedForm, FormGenerationBatch
+from .signals import batch_finished
+from ..utils.standardized_fields import get_standardized_fields
 
 # Load standardized fields
-STANDARDIZED_FIELDS_PATH = os.path.join(settings.BASE_DIR, 'requirement', 'references', 'standardized_fields.json')
-try:
-    with open(STANDARDIZED_FIELDS_PATH, 'r') as f:
-        STANDARDIZED_FIELDS = json.load(f)
-except (FileNotFoundError, json.JSONDecodeError):
-    STANDARDIZED_FIELDS = {}
+STANDARDIZED_FIELDS = get_standardized_fields()
 
 class PDFFormFiller:
     """Service class for handling PDF form filling operations."""
@@ -168,6 +164,7 @@ class FormGenerationService:
     @staticmethod
     def update_batch_status(batch: FormGenerationBatch):
         """Update the batch status based on its forms."""
+        previous_status = batch.status
         forms = batch.forms.all()
         total_forms = forms.count()
         completed_forms = forms.filter(status='completed').count()
@@ -181,6 +178,9 @@ class FormGenerationService:
             batch.status = 'partial'
         
         batch.save()
+        
+        if previous_status == 'processing' and batch.status != 'processing':
+            batch_finished.send(sender=FormGenerationBatch, batch=batch)
     
     @staticmethod
     def cleanup_expired_forms():
@@ -0,0 +1,7 @@
+"""
+Signals sent by the pdf_forms app.
+"""
+from django.dispatch import Signal
+
+# Sent once a batch leaves the 'processing' state. Receivers get ``batch``.
+batch_finished = Signal()
@@ -371,3 +371,39 @@ startxref
         form.form_file.delete()
         if batch.zip_file:
             batch.zip_file.delete()
+    
+    def test_batch_list_conditional_get(self):
+        batch = FormGenerationBatch.objects.create(
+            user=self.user,
+            client=self.test_client
+        )
+        url = reverse('batch-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        # A form added to the batch changes the nested representation
+        GeneratedForm.objects.create(
+            user=self.user,
+            client=self.test_client,
+            template=self.template,
+            batch=batch
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_template_conditional_get_tracks_field_mappings(self):
+        url = reverse('formtemplate-detail', args=[self.template.id])
+        etag = self.client.get(url)['ETag']
+        
+        self.client.post(
+            reverse('formtemplate-update-field-mappings', args=[self.template.id]),
+            {'mappings': [{'pdf_field_name': 'name', 'system_field_name': 'client.name'}]},
+            format='json'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['field_mappings']), 1)
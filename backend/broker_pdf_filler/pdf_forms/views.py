@@ -9,20 +9,32 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.core.files import File
 from django.utils import timezone
+from django.db.models import Count, Max
 from .models import FormTemplate, FormFieldMapping, GeneratedForm, FormGenerationBatch
 from .serializers import (
     FormTemplateSerializer, FormFieldMappingSerializer,
     GeneratedFormSerializer, FormGenerationBatchSerializer
 )
 from .services import FormGenerationService
+from ..utils.pagination import OptInKeysetPagination
+from ..utils.conditional import ConditionalGetMixin
+from ..clients.models import Client
+from ..clients.extended import extract_extended_data, patch_extended_data
 
 # Create your views here.
 
-class FormTemplateViewSet(viewsets.ModelViewSet):
+class FormTemplateViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing PDF form templates."""
     queryset = FormTemplate.objects.all()
     serializer_class = FormTemplateSerializer
     permission_classes = [IsAuthenticated]
+    # Field mappings are nested in the representation
+    conditional_aggregates = {
+        'modified': Max('updated_at'),
+        'mappings_modified': Max('field_mappings__updated_at'),
+        'count': Count('pk', distinct=True),
+        'mappings': Count('field_mappings', distinct=True),
+    }
     
     def get_queryset(self):
         """Filter templates by category if provided."""
@@ -51,16 +63,29 @@ class FormTemplateViewSet(viewsets.ModelViewSet):
         
         return Response({'status': 'field mappings updated'})
 
-class FormGenerationBatchViewSet(viewsets.ModelViewSet):
+class FormGenerationBatchViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing form generation batches."""
     queryset = FormGenerationBatch.objects.all()
     serializer_class = FormGenerationBatchSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptInKeysetPagination
+    # Form status changes are saved through the batch (update_batch_status)
+    conditional_aggregates = {
+        'modified': Max('updated_at'),
+        'count': Count('pk', distinct=True),
+        'forms': Count('batch_forms', distinct=True),
+    }
     
     def get_queryset(self):
         """Filter batches by user."""
         return FormGenerationBatch.objects.filter(user=self.request.user)
     
+    def get_throttles(self):
+        """Limit batch creation separately; it occupies the generation workers."""
+        if self.action == 'create':
+            self.throttle_scope = 'batch_create'
+        return super().get_throttles()
+    
     def create(self, request, *args, **kwargs):
         """Create a new form generation batch."""
         client_id = request.data.get('client_id')
@@ -88,6 +113,13 @@ class FormGenerationBatchViewSet(viewsets.ModelViewSet):
                 insurer=insurer
             )
             
+            # Persist standardized fields that have no Client column
+            extended_data = extract_extended_data(request.data.get('client_data', {}))
+            if extended_data:
+                patch_extended_data(
+                    Client.objects.filter(pk=client_id, user=request.user), extended_data
+                )
+            
             # Generate forms
             for template_id in template_ids:
                 template = FormTemplate.objects.get(id=template_id)
@@ -150,6 +182,7 @@ class GeneratedFormViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = GeneratedForm.objects.all()
     serializer_class = GeneratedFormSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptInKeysetPagination
     
     def get_queryset(self):
         """Filter forms by user."""
@@ -43,10 +43,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'drf_yasg',
     'corsheaders',
     
@@ -106,6 +108,31 @@ DATABASES = {
 }
 
 
+# Cache
+# Defaults to a per-process local memory cache; set CACHE_URL to a Redis URL
+# so cached dashboard fragments and locks are shared between workers.
+CACHE_URL = os.getenv('CACHE_URL', '')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Dashboard fragment cache lifetime in seconds
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '300'))
+
+# Lifetime in seconds of the cached user principal used by JWT authentication
+AUTH_PRINCIPAL_CACHE_TIMEOUT = int(os.getenv('AUTH_PRINCIPAL_CACHE_TIMEOUT', '300'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -133,7 +160,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'broker_pdf_filler.authentication.backends.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
@@ -147,8 +174,27 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'EXCEPTION_HANDLER': 'broker_pdf_filler.utils.exception_handlers.custom_exception_handler',
+    # Sliding-window throttles (see utils.throttling); scoped rates apply to views
+    # that set throttle_scope and are counted per user, or per IP when anonymous
+    'DEFAULT_THROTTLE_CLASSES': [
+        'broker_pdf_filler.utils.throttling.AnonSlidingRateThrottle',
+        'broker_pdf_filler.utils.throttling.UserSlidingRateThrottle',
+        'broker_pdf_filler.utils.throttling.ScopedSlidingRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': os.getenv('THROTTLE_RATE_ANON', '300/m'),
+        'user': os.getenv('THROTTLE_RATE_USER', '1200/m'),
+        'login': os.getenv('THROTTLE_RATE_LOGIN', '10/m'),
+        'batch_create': os.getenv('THROTTLE_RATE_BATCH_CREATE', '30/m'),
+        'export': os.getenv('THROTTLE_RATE_EXPORT', '10/h'),
+        'llm_extraction': os.getenv('THROTTLE_RATE_LLM_EXTRACTION', '20/m'),
+    },
 }
 
+# Throttle counters: a Redis URL shares them between workers; otherwise they are
+# kept in process memory
+THROTTLE_STORE_URL = os.getenv('THROTTLE_STORE_URL', CACHE_URL)
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
@@ -162,8 +208,15 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    'TOKEN_REFRESH_SERIALIZER': 'broker_pdf_filler.authentication.serializers.RevocationAwareTokenRefreshSerializer',
 }
 
+# Revoked refresh tokens are cached until they expire, and the blacklist table
+# is checked on a cache miss. Setting this to True trusts a miss as "not
+# revoked": only safe while the cache holds every revocation (nothing flushed or
+# evicted, and `prune_tokens --warm-cache` run after deploys).
+JWT_REVOCATION_CACHE_AUTHORITATIVE = os.getenv('JWT_REVOCATION_CACHE_AUTHORITATIVE', 'False') == 'True'
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
 CORS_ALLOW_CREDENTIALS = True
@@ -219,12 +272,86 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Standardized client field registry shared by form filling, client records and LLM extraction
+STANDARDIZED_FIELDS_PATH = os.getenv(
+    'STANDARDIZED_FIELDS_PATH',
+    str(BASE_DIR.parent / 'requirement' / 'references' / 'standardized_fields.json')
+)
+
+# LLM client data extraction. LLM_PROVIDER is 'openai' (any OpenAI-compatible
+# chat completions API at LLM_API_BASE), 'stub' (local, no network) or the
+# dotted path of an llm_integration.providers.LLMProvider subclass. The stub
+# returns made-up results, so it must be chosen explicitly.
+LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'openai')
+LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4o-mini')
+LLM_API_BASE = os.getenv('LLM_API_BASE', 'https://api.openai.com/v1')
+LLM_API_KEY = os.getenv('LLM_API_KEY', '')
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '30'))
+
+# Concurrent extraction calls: maximum calls in flight per request, retries of
+# a failed or timed-out call, and the first retry delay in seconds (doubled
+# on each further retry)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+LLM_RETRY_BACKOFF = float(os.getenv('LLM_RETRY_BACKOFF', '0.5'))
+
+# Extraction prompts: token budget per prompt (fields are split into chunks to
+# fit), tokenizer for models tiktoken doesn't know, and whether field guides
+# are tokenized at startup
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv('LLM_PROMPT_TOKEN_BUDGET', '3000'))
+LLM_TOKENIZER_ENCODING = os.getenv('LLM_TOKENIZER_ENCODING', 'cl100k_base')
+LLM_PRECOMPILE_PROMPTS = os.getenv('LLM_PRECOMPILE_PROMPTS', 'True') == 'True'
+# Where tiktoken keeps downloaded encodings; fill it with `manage.py download_tokenizer`
+TIKTOKEN_CACHE_DIR = os.getenv('TIKTOKEN_CACHE_DIR', str(BASE_DIR / '.tiktoken'))
+
+# Read fields with rigid formats (HKID, phone, email, date of birth, Chinese
+# name) with rules and only ask the model for the rest
+LLM_RULE_EXTRACTION = os.getenv('LLM_RULE_EXTRACTION', 'True') == 'True'
+
+# Cached extraction results: lifetime in seconds and maximum number of entries
+# (enforced by the prune_extraction_cache command, run it periodically)
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 60 * 60)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '10000'))
+
+# Extraction sessions, used to re-extract only what an edit changed: lifetime
+# in seconds
+LLM_SESSION_TTL = int(os.getenv('LLM_SESSION_TTL', str(24 * 60 * 60)))
+
 # PDF Form settings
 PDF_STORAGE_PATH = os.getenv('PDF_STORAGE_PATH', 'media/pdf_forms')
 PDF_FORM_RETENTION_DAYS = int(os.getenv('PDF_FORM_RETENTION_DAYS', '45'))
 MAX_DAILY_FORM_SETS = int(os.getenv('MAX_DAILY_FORM_SETS', '10'))
 MAX_MONTHLY_FORM_SETS = int(os.getenv('MAX_MONTHLY_FORM_SETS', '300'))
 
+# Client imports larger than this (in bytes) are processed in the background
+CLIENT_IMPORT_SYNC_MAX_BYTES = int(os.getenv('CLIENT_IMPORT_SYNC_MAX_BYTES', str(1024 * 1024)))
+
+# Request activity logging: rows are queued and written in batches by a background thread
+ACTIVITY_BUFFER_ENABLED = os.getenv('ACTIVITY_BUFFER_ENABLED', 'True') == 'True'
+ACTIVITY_BUFFER_MAX_SIZE = int(os.getenv('ACTIVITY_BUFFER_MAX_SIZE', '10000'))
+ACTIVITY_FLUSH_SIZE = int(os.getenv('ACTIVITY_FLUSH_SIZE', '500'))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', '2.0'))
+
+# Which requests are recorded as activity (see users.activity_policy). The first
+# matching rule wins; URL names in ACTIVITY_ALWAYS_RECORD are always recorded.
+# Names of namespaced routes include the namespace (authentication:login).
+ACTIVITY_DEFAULT_SAMPLE_RATE = float(os.getenv('ACTIVITY_DEFAULT_SAMPLE_RATE', '1.0'))
+ACTIVITY_ALWAYS_RECORD = [
+    'authentication:login', 'authentication:logout', 'authentication:password_*',
+    'user-change-password', 'user-reset-password-*', 'user-verify-email', 'user-register',
+    'client-export', 'client-import-clients', 'batch-download-forms', 'form-download',
+]
+ACTIVITY_TRACKING_RULES = [
+    # Token refreshes, profile and quota checks are polled by the frontend
+    {'views': ['authentication:token_refresh', 'user-me', 'user-quota-usage', 'batch-quota-info'], 'record': False},
+    {'views': ['dashboard-*'], 'methods': ['GET'], 'sample_rate': float(os.getenv('ACTIVITY_DASHBOARD_SAMPLE_RATE', '0.05'))},
+    # Batch and import status polls
+    {'views': ['batch-detail', 'client-import-status'], 'methods': ['GET'], 'sample_rate': float(os.getenv('ACTIVITY_POLL_SAMPLE_RATE', '0.1'))},
+]
+
+# Deleted-client tombstones (and delta-sync tokens) are kept this many days
+CLIENT_SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('CLIENT_SYNC_TOMBSTONE_RETENTION_DAYS', '30'))
+
 # PDF Form Settings
 PDF_FORM_DAILY_QUOTA = 10
 PDF_FORM_MONTHLY_QUOTA = 100
@@ -242,6 +369,18 @@ EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+# Seconds before a stalled SMTP connection or command is abandoned
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', '30'))
+
+# Transactional email outbox (see users.outbox): emails are queued with the
+# change that triggers them and sent in batches by a background sender
+EMAIL_OUTBOX_BACKGROUND = os.getenv('EMAIL_OUTBOX_BACKGROUND', 'True') == 'True'
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '50'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+EMAIL_OUTBOX_RETRY_DELAY = int(os.getenv('EMAIL_OUTBOX_RETRY_DELAY', '60'))
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '30'))
+# Seconds a sender may spend on a claimed batch before others may take it over
+EMAIL_OUTBOX_LEASE = int(os.getenv('EMAIL_OUTBOX_LEASE', str(15 * 60)))
 
 # Frontend URL for password reset links
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
@@ -39,6 +39,7 @@ urlpatterns = [
     path('api/clients/', include('broker_pdf_filler.clients.urls')),
     path('api/forms/', include('broker_pdf_filler.pdf_forms.urls')),
     path('api/dashboard/', include('broker_pdf_filler.dashboard.urls')),
+    path('api/llm/', include('broker_pdf_filler.llm_integration.urls')),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
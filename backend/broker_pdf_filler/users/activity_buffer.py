@@ -0,0 +1,152 @@
+"""
+Buffered writer for request-level ``UserActivity`` rows.
+
+Activity rows are queued in memory and written by a background thread with
+``bulk_create`` once ``ACTIVITY_FLUSH_SIZE`` rows are waiting or
+``ACTIVITY_FLUSH_INTERVAL`` seconds have passed, so requests no longer pay
+for an INSERT round trip. The queue is bounded: when the database cannot
+keep up, new rows are dropped and counted instead of growing memory without
+limit. Anything still queued is flushed when the process exits.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection
+
+from .models import User, UserActivity
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityBuffer:
+    """Bounded in-process queue of unsaved ``UserActivity`` rows."""
+
+    def __init__(self, max_size=10000, flush_size=500, flush_interval=2.0):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def record(self, activity):
+        """Queue an unsaved ``UserActivity``; returns False if it was dropped."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(activity)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            # Log the first drop and then periodically, not on every request
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"Activity buffer full; {dropped} activity rows dropped so far")
+            return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
+
+    def flush(self):
+        """Write everything currently queued; safe to call from any thread."""
+        with self._flush_lock:
+            while True:
+                batch = self._take(self.flush_size)
+                if not batch:
+                    return
+                self._write(batch)
+
+    def shutdown(self, timeout=5.0):
+        """Stop the worker and flush what is left."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+        connection.close()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='activity-buffer', daemon=True)
+            self._thread.start()
+
+    def _take(self, limit, timeout=None):
+        """Take up to ``limit`` rows, waiting up to ``timeout`` for the first."""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait())
+            while len(batch) < limit:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                # Wait for the batch to fill up, but no longer than the interval
+                deadline = time.monotonic() + self.flush_interval
+                batch = []
+                while len(batch) < self.flush_size and not self._stop.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.extend(self._take(self.flush_size - len(batch), timeout=min(remaining, 0.5)))
+                if batch:
+                    with self._flush_lock:
+                        self._write(batch)
+                    # Flushes are seconds apart; don't hold a connection in between
+                    connection.close()
+        finally:
+            connection.close()
+
+    def _write(self, batch):
+        close_old_connections()
+        try:
+            try:
+                UserActivity.objects.bulk_create(batch)
+            except IntegrityError:
+                # A user was deleted while their rows were queued; keep the rest
+                batch = self._discard_orphans(batch)
+                UserActivity.objects.bulk_create(batch)
+        except Exception as e:
+            with self._lock:
+                self.failed += len(batch)
+            logger.error(f"Error writing {len(batch)} activity rows: {str(e)}", exc_info=True)
+            return
+        with self._lock:
+            self.written += len(batch)
+
+    def _discard_orphans(self, batch):
+        user_ids = {activity.user_id for activity in batch}
+        existing = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        kept = [activity for activity in batch if activity.user_id in existing]
+        with self._lock:
+            self.failed += len(batch) - len(kept)
+        return kept
+
+
+activity_buffer = ActivityBuffer(
+    max_size=getattr(settings, 'ACTIVITY_BUFFER_MAX_SIZE', 10000),
+    flush_size=getattr(settings, 'ACTIVITY_FLUSH_SIZE', 500),
+    flush_interval=getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', 2.0),
+)
+atexit.register(activity_buffer.shutdown)
@@ -0,0 +1,149 @@
+"""
+Monthly range partitions for ``UserActivity``.
+
+On PostgreSQL, ``users_useractivity`` is a declaratively partitioned table
+(``PARTITION BY RANGE (timestamp)``) with one partition per calendar month,
+named ``users_useractivity_pYYYYMM``, plus a default partition for rows that
+fall outside every month created so far. Indexes declared on the model are
+created on the parent and inherited by every partition. Retention is handled
+by dropping or detaching whole partitions, which is a metadata change rather
+than a row-by-row DELETE.
+
+On other databases (SQLite in local testing) ``users_useractivity`` is a
+plain table and these helpers do nothing.
+"""
+import re
+from datetime import date, datetime, time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+PARENT_TABLE = 'users_useractivity'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+ARCHIVE_PREFIX = f'{PARENT_TABLE}_archive_'
+_PARTITION_RE = re.compile(rf'^{PARENT_TABLE}_p(\d{{4}})(\d{{2}})$')
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_p{month.year:04d}{month.month:02d}'
+
+
+def month_bound(month):
+    """Month boundary as an aware datetime in the project's time zone."""
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [PARENT_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Return the first day of every month that has a partition, oldest first."""
+    if not is_partitioned():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            [PARENT_TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = []
+    for name in names:
+        match = _PARTITION_RE.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def create_partition(month):
+    """Create the partition for ``month`` if it doesn't exist; returns True if created.
+
+    Rows that already landed in the default partition for that month are
+    moved into the new partition.
+    """
+    month = month_start(month)
+    if not is_partitioned() or month in list_partitions():
+        return False
+
+    name = partition_name(month)
+    start, end = month_bound(month), month_bound(add_months(month, 1))
+    qn = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {qn(DEFAULT_PARTITION)} "
+            f"WHERE timestamp >= %s AND timestamp < %s)",
+            [start, end]
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f"CREATE TABLE {qn(name)} PARTITION OF {qn(PARENT_TABLE)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [start, end]
+            )
+            return True
+
+        # Attaching would fail while the default partition holds rows for
+        # this range, so move them over first.
+        cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(PARENT_TABLE)} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} "
+            f"WHERE timestamp >= %s AND timestamp < %s RETURNING *) "
+            f"INSERT INTO {qn(name)} SELECT * FROM moved",
+            [start, end]
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(PARENT_TABLE)} ATTACH PARTITION {qn(name)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end]
+        )
+    return True
+
+
+def ensure_partitions(months_ahead=3, today=None):
+    """Create partitions from the current month through ``months_ahead`` months ahead."""
+    current = month_start(today or timezone.localdate())
+    return [
+        month for month in (add_months(current, offset) for offset in range(months_ahead + 1))
+        if create_partition(month)
+    ]
+
+
+def expired_partitions(retain_months, today=None):
+    """Return months whose partitions lie entirely before the retention window."""
+    cutoff = add_months(month_start(today or timezone.localdate()), -retain_months)
+    return [month for month in list_partitions() if month < cutoff]
+
+
+def drop_partition(month, archive=False):
+    """Drop a month's partition, or detach and keep it as an archive table."""
+    name = partition_name(month)
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if archive:
+            archive_name = f'{ARCHIVE_PREFIX}{month.year:04d}{month.month:02d}'
+            cursor.execute(f"ALTER TABLE {qn(PARENT_TABLE)} DETACH PARTITION {qn(name)}")
+            cursor.execute(f"ALTER TABLE {qn(name)} RENAME TO {qn(archive_name)}")
+            return archive_name
+        cursor.execute(f"DROP TABLE {qn(name)}")
+        return None
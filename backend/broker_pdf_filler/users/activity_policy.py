@@ -0,0 +1,116 @@
+"""
+Rules deciding which requests ``UserActivityMiddleware`` records.
+
+``ACTIVITY_TRACKING_RULES`` is a list of rules checked in order; the first
+rule matching the request's URL name and method decides. A rule looks like::
+
+    {'views': ['dashboard-*'], 'methods': ['GET'], 'sample_rate': 0.05}
+
+``views`` are shell-style patterns matched against the resolved view name
+(e.g. ``client-list``, ``user-quota-usage``; namespaced routes include the
+namespace, as in ``authentication:login``), ``methods`` is optional, and the
+outcome is either ``'record': True/False`` or a ``sample_rate`` between 0 and
+1. Requests that match no rule use ``ACTIVITY_DEFAULT_SAMPLE_RATE``.
+
+URL names matching ``ACTIVITY_ALWAYS_RECORD`` (logins, password changes,
+exports, ...) are recorded regardless of the rules. Rows recorded at a
+sample rate below 1 carry ``details['sample_rate']``, so counts can be scaled
+back up.
+
+Rules are compiled once, and the outcome per (method, URL name) is memoized,
+so the per-request cost is a dict lookup plus, for sampled routes, a random
+draw.
+"""
+import random
+import re
+import threading
+from fnmatch import translate
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Upper bound on memoized decisions; URL names are a small, fixed set
+_MAX_DECISIONS = 4096
+
+
+def _compile_patterns(patterns):
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{translate(pattern)})' for pattern in patterns))
+
+
+def _compile_rule(rule):
+    if not isinstance(rule, dict) or not rule.get('views'):
+        raise ImproperlyConfigured(f"Activity tracking rule needs a list of 'views': {rule!r}")
+    if 'record' in rule:
+        rate = 1.0 if rule['record'] else 0.0
+    elif 'sample_rate' in rule:
+        rate = float(rule['sample_rate'])
+        if not 0.0 <= rate <= 1.0:
+            raise ImproperlyConfigured(f"Activity sample_rate must be between 0 and 1: {rule!r}")
+    else:
+        raise ImproperlyConfigured(f"Activity tracking rule needs 'record' or 'sample_rate': {rule!r}")
+    methods = frozenset(method.upper() for method in rule['methods']) if rule.get('methods') else None
+    return _compile_patterns(rule['views']), methods, rate
+
+
+class ActivityPolicy:
+    """Compiled activity tracking rules plus recorded/skipped counters."""
+
+    def __init__(self, rules=(), always_record=(), default_sample_rate=1.0, rng=random.random):
+        self._rules = [_compile_rule(rule) for rule in rules]
+        self._always_record = _compile_patterns(always_record)
+        self._default_sample_rate = float(default_sample_rate)
+        self._rng = rng
+        self._decisions = {}
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.skipped = 0
+        self.sampled_out = 0
+
+    def sample_rate(self, method, view_name):
+        """Return the fraction of ``method`` requests to ``view_name`` to record."""
+        key = (method, view_name)
+        rate = self._decisions.get(key)
+        if rate is None:
+            rate = self._match(method, view_name)
+            if len(self._decisions) < _MAX_DECISIONS:
+                self._decisions[key] = rate
+        return rate
+
+    def should_record(self, method, view_name):
+        """Decide whether to record this request; returns the sample rate, or None to skip."""
+        rate = self.sample_rate(method, view_name)
+        if rate >= 1.0:
+            outcome = 'recorded'
+        elif rate <= 0.0:
+            outcome = 'skipped'
+        else:
+            outcome = 'recorded' if self._rng() < rate else 'sampled_out'
+
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+        return rate if outcome == 'recorded' else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'recorded': self.recorded,
+                'skipped': self.skipped,
+                'sampled_out': self.sampled_out,
+            }
+
+    def _match(self, method, view_name):
+        if self._always_record is not None and self._always_record.match(view_name):
+            return 1.0
+        for patterns, methods, rate in self._rules:
+            if (methods is None or method in methods) and patterns.match(view_name):
+                return rate
+        return self._default_sample_rate
+
+
+activity_policy = ActivityPolicy(
+    rules=getattr(settings, 'ACTIVITY_TRACKING_RULES', ()),
+    always_record=getattr(settings, 'ACTIVITY_ALWAYS_RECORD', ()),
+    default_sample_rate=getattr(settings, 'ACTIVITY_DEFAULT_SAMPLE_RATE', 1.0),
+)
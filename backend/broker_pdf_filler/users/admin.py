@@ -2,7 +2,10 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
-from .models import User, UserActivity, UserQuotaUsage, BrokerCompany, InsuranceCompanyAccount
+from .models import (
+    User, UserActivity, UserActivityDailyRollup, UserQuotaUsage, BrokerCompany, InsuranceCompanyAccount,
+    OutboxEmail
+)
 
 
 class InsuranceCompanyAccountInline(admin.TabularInline):
@@ -60,6 +63,7 @@ class UserAdmin(BaseUserAdmin):
     )
     readonly_fields = ('created_at', 'updated_at')
     list_display = ('email', 'first_name', 'last_name', 'role', 'broker_company', 'is_tr', 'is_active', 'is_staff')
+    list_select_related = ('broker_company',)
     list_filter = ('role', 'is_active', 'is_staff', 'is_superuser', 'broker_company', 'created_at')
     search_fields = ('email', 'first_name', 'last_name', 'tr_name', 'tr_license_number')
     ordering = ('email',)
@@ -88,6 +92,23 @@ class UserActivityAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(UserActivityDailyRollup)
+class UserActivityDailyRollupAdmin(admin.ModelAdmin):
+    """Admin interface for UserActivityDailyRollup model."""
+    
+    list_display = ('date', 'user', 'action', 'count')
+    list_filter = ('action', 'date')
+    search_fields = ('user__email',)
+    list_select_related = ('user',)
+    date_hierarchy = 'date'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(UserQuotaUsage)
 class UserQuotaUsageAdmin(admin.ModelAdmin):
     """Admin interface for UserQuotaUsage model."""
@@ -117,3 +138,19 @@ class UserQuotaUsageAdmin(admin.ModelAdmin):
         )
     
     quota_status.short_description = _('Quota Status')
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """Admin interface for OutboxEmail model."""
+    
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject',)
+    readonly_fields = (
+        'id', 'subject', 'body', 'html_body', 'from_email', 'recipients', 'attempts',
+        'last_error', 'created_at', 'sent_at'
+    )
+    
+    def has_add_permission(self, request):
+        return False
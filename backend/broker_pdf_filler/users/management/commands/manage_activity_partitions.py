@@ -0,0 +1,75 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from broker_pdf_filler.users import activity_partitions
+from broker_pdf_filler.users.activity_rollups import ActivityRollupService
+from broker_pdf_filler.users.models import UserActivity
+
+
+class Command(BaseCommand):
+    help = 'Creates upcoming monthly UserActivity partitions and drops or archives expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Create partitions this many months ahead (default: 3)')
+        parser.add_argument('--retain-months', type=int, default=12,
+                            help='Keep raw activity for this many full months before the current one (default: 12)')
+        parser.add_argument('--archive', action='store_true',
+                            help='Detach expired partitions and keep them as archive tables instead of dropping them')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be done')
+
+    def handle(self, *args, **options):
+        if not activity_partitions.is_partitioned():
+            self._purge_plain_table(options)
+            return
+
+        if options['dry_run']:
+            existing = set(activity_partitions.list_partitions())
+            current = activity_partitions.month_start(timezone.localdate())
+            for offset in range(options['months_ahead'] + 1):
+                month = activity_partitions.add_months(current, offset)
+                if month not in existing:
+                    self.stdout.write(f'Would create {activity_partitions.partition_name(month)}')
+        else:
+            for month in activity_partitions.ensure_partitions(options['months_ahead']):
+                self.stdout.write(f'Created {activity_partitions.partition_name(month)}')
+
+        for month in activity_partitions.expired_partitions(options['retain_months']):
+            name = activity_partitions.partition_name(month)
+            if options['dry_run']:
+                self.stdout.write(f"Would {'archive' if options['archive'] else 'drop'} {name}")
+                continue
+
+            # Make sure the month's rollups exist before its raw rows go away
+            month_end = activity_partitions.add_months(month, 1) - timedelta(days=1)
+            ActivityRollupService.rollup_range(month, month_end)
+
+            archived = activity_partitions.drop_partition(month, archive=options['archive'])
+            if archived:
+                self.stdout.write(f'Archived {name} as {archived}')
+            else:
+                self.stdout.write(f'Dropped {name}')
+
+        self.stdout.write(self.style.SUCCESS('Activity partitions are up to date'))
+
+    def _purge_plain_table(self, options):
+        """Fallback for databases without partitioning: roll up, then delete old rows in chunks."""
+        cutoff_month = activity_partitions.add_months(
+            activity_partitions.month_start(timezone.localdate()), -options['retain_months']
+        )
+        expired = UserActivity.objects.filter(timestamp__lt=activity_partitions.month_bound(cutoff_month))
+        if options['dry_run']:
+            self.stdout.write(f'Would delete {expired.count()} activity rows before {cutoff_month}')
+            return
+
+        oldest = expired.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is not None:
+            ActivityRollupService.rollup_range(timezone.localtime(oldest).date(), cutoff_month - timedelta(days=1))
+
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:5000])
+            if not ids:
+                break
+            deleted += UserActivity.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} activity rows before {cutoff_month}'))
@@ -0,0 +1,27 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from broker_pdf_filler.users.activity_rollups import ActivityRollupService
+
+
+class Command(BaseCommand):
+    help = 'Rolls up user activity into daily per-user, per-action counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='First day to roll up (YYYY-MM-DD); defaults to yesterday'
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        since = today - timedelta(days=1)
+        if options.get('since'):
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['since']}")
+
+        days = ActivityRollupService.rollup_range(since, today)
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {days} day(s) of user activity'))
@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from broker_pdf_filler.users.outbox import BATCH_SIZE, drain
+
+
+class Command(BaseCommand):
+    help = 'Sends queued outbox emails that are due, including retries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help=f'Emails sent per SMTP connection (default: {BATCH_SIZE})')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, checking the outbox every --interval seconds')
+        parser.add_argument('--interval', type=float, default=10.0,
+                            help='Seconds between checks with --loop (default: 10)')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain(options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails, {failed} failed'))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
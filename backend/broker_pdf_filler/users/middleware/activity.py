@@ -1,6 +1,13 @@
+import logging
+
+from django.conf import settings
+from django.db import connection
 from django.utils import timezone
-from django.urls import resolve
 from ..models import UserActivity
+from ..activity_buffer import activity_buffer
+from ..activity_policy import activity_policy
+
+logger = logging.getLogger(__name__)
 
 
 class UserActivityMiddleware:
@@ -8,6 +15,8 @@ class UserActivityMiddleware:
     
     def __init__(self, get_response):
         self.get_response = get_response
+        self.buffered = getattr(settings, 'ACTIVITY_BUFFER_ENABLED', True)
+        self.policy = activity_policy
         
     def __call__(self, request):
         # Process request before view is called
@@ -16,24 +25,37 @@ class UserActivityMiddleware:
         # Track user activity after view is called
         if hasattr(request, 'user') and request.user.is_authenticated:
             try:
-                # Get the resolved URL match
-                resolver_match = resolve(request.path)
-                view_name = resolver_match.view_name if resolver_match else 'unknown'
+                # Reuse the match Django computed while routing the request
+                resolver_match = getattr(request, 'resolver_match', None)
+                view_name = resolver_match.view_name if resolver_match else None
                 
-                # Skip tracking for certain views
-                if not view_name.startswith(('admin:', 'static:', 'media:')):
-                    UserActivity.objects.create(
-                        user=request.user,
-                        action=f'{request.method.lower()}_{view_name}',
-                        ip_address=self._get_client_ip(request),
-                        timestamp=timezone.now()
-                    )
-            except Exception:
+                # Skip tracking for unresolved and certain views
+                if view_name and not view_name.startswith(('admin:', 'static:', 'media:')):
+                    sample_rate = self.policy.should_record(request.method, view_name)
+                    if sample_rate is not None:
+                        self._record(UserActivity(
+                            user=request.user,
+                            action=f'{request.method.lower()}_{view_name}',
+                            ip_address=self._get_client_ip(request),
+                            timestamp=timezone.now(),
+                            # Lets sampled counts be scaled back up
+                            details={'sample_rate': sample_rate} if sample_rate < 1.0 else None
+                        ))
+            except Exception as e:
                 # Log error but don't interrupt request processing
-                pass
+                logger.error(f"Error tracking user activity: {str(e)}", exc_info=True)
         
         return response
     
+    def _record(self, activity):
+        """Queue the row for a batched write, or write it now when buffering is off."""
+        # Rows written by the buffer thread use a separate connection, which
+        # can't see data from a transaction still open on this one.
+        if self.buffered and not connection.in_atomic_block:
+            activity_buffer.record(activity)
+        else:
+            activity.save()
+    
     def process_view(self, request, view_func, view_args, view_kwargs):
         """Process the view and log login/logout activities."""
         # Skip tracking for non-authenticated users except for login
@@ -0,0 +1,156 @@
+# Generated by Django 5.1 on 2026-10-19 05:07
+
+from datetime import date, datetime, time
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+TABLE = 'users_useractivity'
+LEGACY_TABLE = 'users_useractivity_legacy'
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bound(month):
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def _swap_table(cursor, create_sql):
+    """Recreate users_useractivity via ``create_sql``, keeping rows, indexes and constraints."""
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('p', 'f')",
+        [TABLE]
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x "
+        "JOIN pg_class i ON i.oid = x.indexrelid "
+        "WHERE x.indrelid = %s::regclass AND NOT x.indisprimary",
+        [TABLE]
+    )
+    indexes = cursor.fetchall()
+
+    # Free the constraint and index names for the new table
+    cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{LEGACY_TABLE}"')
+    for name, _, _ in constraints:
+        cursor.execute(f'ALTER TABLE "{LEGACY_TABLE}" DROP CONSTRAINT "{name}"')
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX "{name}"')
+
+    create_sql(cursor)
+    cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{LEGACY_TABLE}"')
+    cursor.execute(f'DROP TABLE "{LEGACY_TABLE}"')
+
+    for name, contype, definition in constraints:
+        if contype == 'f':
+            cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{name}" {definition}')
+    for name, definition in indexes:
+        cursor.execute(definition)
+
+
+def partition_activity(apps, schema_editor):
+    """Turn users_useractivity into a monthly range-partitioned table (PostgreSQL only)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT min(timestamp) FROM "{TABLE}"')
+        oldest = cursor.fetchone()[0]
+
+        def create(cursor):
+            cursor.execute(
+                f'CREATE TABLE "{TABLE}" (LIKE "{LEGACY_TABLE}" INCLUDING DEFAULTS) '
+                f'PARTITION BY RANGE (timestamp)'
+            )
+            # The partition key must be part of the primary key
+            cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey" PRIMARY KEY (id, timestamp)')
+            cursor.execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT')
+
+            today = timezone.localdate()
+            month = date(today.year, today.month, 1)
+            if oldest is not None:
+                oldest_local = timezone.localtime(oldest)
+                month = min(month, date(oldest_local.year, oldest_local.month, 1))
+            last = _add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+            while month <= last:
+                cursor.execute(
+                    f'CREATE TABLE "{TABLE}_p{month.year:04d}{month.month:02d}" PARTITION OF "{TABLE}" '
+                    f'FOR VALUES FROM (%s) TO (%s)',
+                    [_bound(month), _bound(_add_months(month, 1))]
+                )
+                month = _add_months(month, 1)
+
+        _swap_table(cursor, create)
+
+
+def unpartition_activity(apps, schema_editor):
+    """Turn users_useractivity back into a plain table."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE])
+        if cursor.fetchone() is None:
+            return
+
+        def create(cursor):
+            cursor.execute(f'CREATE TABLE "{TABLE}" (LIKE "{LEGACY_TABLE}" INCLUDING DEFAULTS)')
+            cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_pkey" PRIMARY KEY (id)')
+
+        _swap_table(cursor, create)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_alter_brokercompany_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_activity, unpartition_activity),
+        migrations.CreateModel(
+            name='UserActivityDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('action', models.CharField(max_length=64)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'user activity daily rollup',
+                'verbose_name_plural': 'user activity daily rollups',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', 'timestamp'], name='users_usera_user_id_bd4c6e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['action', 'timestamp'], name='users_usera_action_048900_idx'),
+        ),
+        migrations.AddField(
+            model_name='useractivitydailyrollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitydailyrollup',
+            index=models.Index(fields=['user', 'date'], name='users_usera_user_id_417a6c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitydailyrollup',
+            index=models.Index(fields=['date', 'action'], name='users_usera_date_cda743_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='useractivitydailyrollup',
+            unique_together={('date', 'user', 'action')},
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1 on 2026-10-19 05:26
+
+import django.db.models.deletion
+import django.utils.timezone
+import hashlib
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_pending_tokens(apps, schema_editor):
+    """Carry unexpired plaintext tokens over as digests so emailed links keep working."""
+    User = apps.get_model('users', 'User')
+    OneTimeToken = apps.get_model('users', 'OneTimeToken')
+    now = django.utils.timezone.now()
+    columns = {
+        'email_verification': ('email_verification_token', 'email_verification_token_expiry'),
+        'password_reset': ('reset_password_token', 'reset_password_token_expiry'),
+    }
+    for purpose, (token_field, expiry_field) in columns.items():
+        pending = User.objects.filter(**{
+            f'{token_field}__isnull': False,
+            f'{expiry_field}__gt': now,
+        }).values_list('id', token_field, expiry_field)
+        OneTimeToken.objects.bulk_create(
+            OneTimeToken(
+                user_id=user_id,
+                purpose=purpose,
+                digest=hashlib.sha256(token.encode()).hexdigest(),
+                expires_at=expires_at,
+            )
+            for user_id, token, expires_at in pending.iterator()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_outbox_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OneTimeToken',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('purpose', models.CharField(choices=[('email_verification', 'Email Verification'), ('password_reset', 'Password Reset')], max_length=30)),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='one_time_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'one-time token',
+                'verbose_name_plural': 'one-time tokens',
+                'indexes': [models.Index(fields=['user', 'purpose'], name='users_oneti_user_id_f63cd1_idx')],
+            },
+        ),
+        migrations.RunPython(copy_pending_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='user',
+            name='email_verification_token',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='email_verification_token_expiry',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='reset_password_token',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='reset_password_token_expiry',
+        ),
+    ]
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import connection, models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from datetime import timedelta
+import hashlib
+import secrets
 import uuid
 
 class UserManager(BaseUserManager):
@@ -63,7 +66,7 @@ class BrokerCompany(models.Model):
     @property
     def user_count(self):
         """Get the number of users associated with this company."""
-        return self.user_set.count()
+        return self.users.count()
 
 
 class InsuranceCompanyAccount(models.Model):
@@ -111,8 +114,6 @@ class User(AbstractUser):
     
     # Email verification fields
     email_verified = models.BooleanField(default=False)
-    email_verification_token = models.CharField(max_length=64, null=True, blank=True)
-    email_verification_token_expiry = models.DateTimeField(null=True, blank=True)
     
     # TR-specific fields
     tr_name = models.CharField(_('TR name'), max_length=255, null=True, blank=True)
@@ -121,8 +122,6 @@ class User(AbstractUser):
     
     daily_form_quota = models.PositiveIntegerField(default=10, help_text=_('Maximum number of form sets allowed per day'))
     monthly_form_quota = models.PositiveIntegerField(default=300, help_text=_('Maximum number of form sets allowed per month'))
-    reset_password_token = models.CharField(max_length=64, null=True, blank=True)
-    reset_password_token_expiry = models.DateTimeField(null=True, blank=True)
     last_login_ip = models.GenericIPAddressField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -142,40 +141,12 @@ class User(AbstractUser):
         return bool(self.tr_name and self.tr_license_number and self.tr_phone_number)
     
     def generate_email_verification_token(self):
-        """Generate a new email verification token."""
-        import secrets
-        self.email_verification_token = secrets.token_urlsafe(48)
-        self.email_verification_token_expiry = timezone.now() + timezone.timedelta(hours=24)
-        self.save()
-        return self.email_verification_token
+        """Issue a new email verification token, replacing any earlier one."""
+        return OneTimeToken.objects.issue(self, 'email_verification')
     
     def generate_password_reset_token(self):
-        """Generate a new password reset token."""
-        import secrets
-        self.reset_password_token = secrets.token_urlsafe(48)
-        self.reset_password_token_expiry = timezone.now() + timezone.timedelta(hours=24)
-        self.save()
-        return self.reset_password_token
-    
-    def verify_email_token(self, token):
-        """Verify email verification token."""
-        if (self.email_verification_token == token and 
-            self.email_verification_token_expiry and 
-            self.email_verification_token_expiry > timezone.now()):
-            self.email_verified = True
-            self.email_verification_token = None
-            self.email_verification_token_expiry = None
-            self.save()
-            return True
-        return False
-    
-    def verify_password_reset_token(self, token):
-        """Verify password reset token."""
-        if (self.reset_password_token == token and 
-            self.reset_password_token_expiry and 
-            self.reset_password_token_expiry > timezone.now()):
-            return True
-        return False
+        """Issue a new password reset token, replacing any earlier one."""
+        return OneTimeToken.objects.issue(self, 'password_reset')
 
 
 class UserActivity(models.Model):
@@ -205,6 +176,12 @@ class UserActivity(models.Model):
         verbose_name = _('user activity')
         verbose_name_plural = _('user activities')
         ordering = ['-timestamp']
+        # Monthly range partitioned on PostgreSQL (see users.activity_partitions);
+        # these indexes are created on every partition
+        indexes = [
+            models.Index(fields=['user', 'timestamp']),
+            models.Index(fields=['action', 'timestamp']),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.get_action_display()} - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -232,3 +209,156 @@ class UserQuotaUsage(models.Model):
     
     def has_monthly_quota_available(self):
         return self.monthly_usage < self.user.monthly_form_quota
+
+
+class UserActivityDailyRollup(models.Model):
+    """Per-user, per-action activity counts for one day.
+    
+    Kept after the raw UserActivity partitions for that day are dropped.
+    """
+    
+    date = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_rollups')
+    action = models.CharField(max_length=64)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = _('user activity daily rollup')
+        verbose_name_plural = _('user activity daily rollups')
+        unique_together = ['date', 'user', 'action']
+        indexes = [
+            models.Index(fields=['user', 'date']),
+            models.Index(fields=['date', 'action']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.action} - {self.date}: {self.count}"
+
+
+
+class OutboxEmail(models.Model):
+    """Email queued in the same transaction as the change that triggered it.
+    
+    Delivered by the outbox sender (see users.outbox).
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('sending', _('Sending')),
+        ('sent', _('Sent')),
+        ('failed', _('Failed')),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(null=True, blank=True)
+    from_email = models.CharField(max_length=254, null=True, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # While sending: when the claim lapses and another sender may take the message
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('outbox email')
+        verbose_name_plural = _('outbox emails')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+
+class OneTimeTokenManager(models.Manager):
+    """Issues and consumes single-use tokens; see ``OneTimeToken``."""
+    
+    def issue(self, user, purpose, lifetime=None):
+        """Create a token for ``user`` and return its plaintext, which is not stored."""
+        token = secrets.token_urlsafe(48)
+        lifetime = lifetime or timedelta(hours=OneTimeToken.LIFETIME_HOURS[purpose])
+        self.filter(user=user, purpose=purpose).delete()
+        self.create(
+            user=user,
+            purpose=purpose,
+            digest=OneTimeToken.hash(token),
+            expires_at=timezone.now() + lifetime,
+        )
+        return token
+    
+    def consume(self, token, purpose):
+        """Redeem a token; returns the user id it was issued to, or None.
+        
+        The row is removed by the same statement that finds it, so of two
+        concurrent attempts with the same token only one succeeds.
+        """
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE digest = %s AND purpose = %s AND expires_at > %s '
+                f'RETURNING user_id',
+                [OneTimeToken.hash(token), purpose, timezone.now()],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        # Raw SQL skips field conversion; SQLite returns UUIDs as strings
+        return self.model._meta.get_field('user').target_field.to_python(row[0])
+    
+    def purge_expired(self, chunk_size=5000):
+        """Delete expired tokens in chunks of ``chunk_size``; returns the number deleted."""
+        deleted = 0
+        expired = self.filter(expires_at__lte=timezone.now()).order_by('expires_at')
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            deleted += self.filter(id__in=ids).delete()[0]
+
+
+class OneTimeToken(models.Model):
+    """Single-use email verification or password reset token.
+    
+    Only the SHA-256 digest of the token is stored, under a unique index, so
+    a lookup is an index probe and a leaked table can't be used to redeem
+    tokens. Tokens are consumed with ``OneTimeToken.objects.consume()`` and
+    expired ones are purged by the ``prune_tokens`` command.
+    """
+    
+    PURPOSE_CHOICES = [
+        ('email_verification', _('Email Verification')),
+        ('password_reset', _('Password Reset')),
+    ]
+    LIFETIME_HOURS = {
+        'email_verification': 24,
+        'password_reset': 24,
+    }
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='one_time_tokens')
+    purpose = models.CharField(max_length=30, choices=PURPOSE_CHOICES)
+    digest = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = OneTimeTokenManager()
+    
+    class Meta:
+        verbose_name = _('one-time token')
+        verbose_name_plural = _('one-time tokens')
+        indexes = [
+            models.Index(fields=['user', 'purpose']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_purpose_display()} token for user {self.user_id}"
+    
+    @staticmethod
+    def hash(token):
+        return hashlib.sha256(token.encode()).hexdigest()
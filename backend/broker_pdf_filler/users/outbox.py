@@ -0,0 +1,220 @@
+"""
+Transactional email outbox.
+
+Views call ``queue_email`` instead of ``send_mail``: the message is stored as
+an ``OutboxEmail`` row in the same transaction as the user change that
+triggered it, so it is sent if and only if that change commits, and the
+request never waits on SMTP. Once the transaction commits, a background
+sender thread is woken to deliver due messages in batches over a single
+SMTP connection. Failed deliveries are retried with exponential backoff
+until ``EMAIL_OUTBOX_MAX_ATTEMPTS`` is reached, after which the message is
+marked failed.
+
+A batch is claimed in a short transaction (``SELECT ... FOR UPDATE SKIP
+LOCKED``) that marks its rows ``sending`` with a lease of
+``EMAIL_OUTBOX_LEASE`` seconds, so the sender threads of several web
+processes and the ``send_outbox_emails`` command can run side by side
+without sending a message twice. Messages are then sent outside any
+transaction, and each result is recorded in its own update. If the sender
+dies mid-batch, the claimed messages it didn't get to are picked up again
+once their lease lapses; a sender that runs out of lease hands the rest of
+its batch back. SMTP calls are bounded by ``EMAIL_TIMEOUT``.
+"""
+import logging
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+MAX_ATTEMPTS = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+RETRY_DELAY = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+LEASE_SECONDS = getattr(settings, 'EMAIL_OUTBOX_LEASE', 15 * 60)
+MAX_RETRY_DELAY = 6 * 60 * 60
+
+
+def queue_email(subject, body, recipients, html_body=None, from_email=None):
+    """Store an email for delivery once the current transaction commits."""
+    email = OutboxEmail.objects.create(
+        subject=str(subject),
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+    )
+    if getattr(settings, 'EMAIL_OUTBOX_BACKGROUND', True):
+        transaction.on_commit(outbox_sender.wake)
+    return email
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt: exponential, capped, with jitter."""
+    delay = min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """Claim up to ``batch_size`` due emails for this sender; returns them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pending', next_attempt_at__lte=now)
+                # Claimed by a sender that died before finishing
+                | Q(status='sending', lease_expires_at__lte=now)
+            )
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if ids:
+            OutboxEmail.objects.filter(id__in=ids).update(
+                status='sending', lease_expires_at=now + timedelta(seconds=LEASE_SECONDS)
+            )
+    return list(OutboxEmail.objects.filter(id__in=ids).order_by('next_attempt_at'))
+
+
+def send_pending(batch_size=BATCH_SIZE):
+    """Deliver one batch of due emails; returns ``(sent, failed)`` counts."""
+    batch = claim_batch(batch_size)
+    sent = failed = 0
+    if not batch:
+        return sent, failed
+
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        mail_connection.open()
+    except Exception as e:
+        # Couldn't reach the mail server at all: every message counts one attempt
+        logger.error(f"Error connecting to the mail server: {str(e)}", exc_info=True)
+        now = timezone.now()
+        for email in batch:
+            _record_failure(email, e, now)
+            _save_result(email)
+        return sent, len(batch)
+
+    try:
+        for index, email in enumerate(batch):
+            if timezone.now() >= email.lease_expires_at:
+                # Out of lease: hand the rest back rather than race another sender
+                _release(batch[index:])
+                break
+            message = EmailMultiAlternatives(
+                email.subject, email.body, email.from_email, email.recipients,
+                connection=mail_connection,
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, 'text/html')
+            try:
+                message.send()
+            except Exception as e:
+                logger.warning(f"Error sending outbox email {email.id}: {str(e)}")
+                _record_failure(email, e, timezone.now())
+                failed += 1
+            else:
+                email.status = 'sent'
+                email.attempts += 1
+                email.sent_at = timezone.now()
+                email.last_error = None
+                sent += 1
+            _save_result(email)
+    finally:
+        mail_connection.close()
+    return sent, failed
+
+
+def _save_result(email):
+    email.lease_expires_at = None
+    email.save(update_fields=['status', 'attempts', 'next_attempt_at', 'lease_expires_at', 'last_error', 'sent_at'])
+
+
+def _release(emails):
+    OutboxEmail.objects.filter(id__in=[email.id for email in emails], status='sending').update(
+        status='pending', lease_expires_at=None
+    )
+
+
+def _record_failure(email, error, now):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.status = 'pending'
+        email.next_attempt_at = now + timedelta(seconds=retry_delay(email.attempts))
+
+
+def drain(batch_size=BATCH_SIZE):
+    """Send batches until nothing is due; returns ``(sent, failed)`` totals."""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = send_pending(batch_size)
+        total_sent += sent
+        total_failed += failed
+        # Stop when nothing was due, or when a whole batch failed and the
+        # mail server is probably down; retries wait for their backoff
+        if not sent:
+            return total_sent, total_failed
+
+
+class OutboxSender:
+    """Background thread that drains the outbox when woken and on a timer."""
+
+    def __init__(self, poll_interval=30.0):
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wake(self):
+        """Ask the sender to check the outbox now."""
+        self._ensure_worker()
+        self._wake.set()
+
+    def shutdown(self, timeout=5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                # Woken by a commit, or wake up anyway to pick up due retries
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                if self._stop.is_set():
+                    break
+                close_old_connections()
+                try:
+                    drain()
+                except Exception as e:
+                    logger.error(f"Error draining email outbox: {str(e)}", exc_info=True)
+                finally:
+                    connection.close()
+        finally:
+            connection.close()
+
+
+outbox_sender = OutboxSender(poll_interval=getattr(settings, 'EMAIL_OUTBOX_POLL_INTERVAL', 30.0))
@@ -1,11 +1,12 @@
 from .auth import (
-    UserSerializer, UserRegistrationSerializer, CustomTokenObtainPairSerializer,
+    UserSerializer, UserUsageSerializer, UserRegistrationSerializer, CustomTokenObtainPairSerializer,
     PasswordChangeSerializer, PasswordResetRequestSerializer, PasswordResetConfirmSerializer
 )
 from .company import BrokerCompanySerializer, InsuranceCompanyAccountSerializer
 
 __all__ = [
     'UserSerializer',
+    'UserUsageSerializer',
     'UserRegistrationSerializer',
     'CustomTokenObtainPairSerializer',
     'PasswordChangeSerializer',
@@ -32,11 +32,26 @@ class UserSerializer(serializers.ModelSerializer):
     
     def get_broker_company(self, obj):
         """Return the broker company's ia_reg_code instead of the object."""
-        if obj.broker_company:
+        if obj.broker_company_id:
             return obj.broker_company.ia_reg_code
         return None
 
 
+class UserUsageSerializer(UserSerializer):
+    """User data plus the usage statistics added by ``annotate_usage_stats``."""
+    forms_today = serializers.IntegerField(read_only=True)
+    forms_this_month = serializers.IntegerField(read_only=True)
+    daily_quota_remaining = serializers.IntegerField(read_only=True)
+    monthly_quota_remaining = serializers.IntegerField(read_only=True)
+    last_activity = serializers.DateTimeField(read_only=True)
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + [
+            'forms_today', 'forms_this_month', 'daily_quota_remaining',
+            'monthly_quota_remaining', 'last_activity'
+        ]
+
+
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """Serializer for user registration."""
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
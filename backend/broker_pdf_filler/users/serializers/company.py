@@ -5,7 +5,7 @@ from ..models import BrokerCompany, InsuranceCompanyAccount
 class BrokerCompanySerializer(serializers.ModelSerializer):
     """Serializer for broker companies."""
     id = serializers.UUIDField(read_only=True)
-    user_count = serializers.IntegerField(read_only=True)
+    user_count = serializers.SerializerMethodField()
 
     class Meta:
         model = BrokerCompany
@@ -23,6 +23,11 @@ class BrokerCompanySerializer(serializers.ModelSerializer):
             'user_count'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'user_count']
+    
+    def get_user_count(self, obj):
+        # Listed companies carry a users_total annotation (see BrokerCompanyViewSet)
+        users_total = getattr(obj, 'users_total', None)
+        return obj.user_count if users_total is None else users_total
 
 
 class InsuranceCompanyAccountSerializer(serializers.ModelSerializer):
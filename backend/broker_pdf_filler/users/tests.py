@@ -1,9 +1,32 @@
-from django.test import TestCase
-from django.urls import reverse
+import time
+import unittest
+from datetime import date, datetime, timedelta
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.conf import settings
+from django.urls import resolve, reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
-from .models import BrokerCompany, UserActivity, UserQuotaUsage
+from .models import (
+    BrokerCompany, OneTimeToken, OutboxEmail, UserActivity, UserActivityDailyRollup, UserQuotaUsage
+)
+from .activity_buffer import ActivityBuffer, activity_buffer
+from .activity_policy import ActivityPolicy
+from .activity_rollups import ActivityRollupService
+from .outbox import drain, queue_email, send_pending
+from .usage import annotate_usage_stats
+from ..clients.models import Client
+from ..pdf_forms.models import FormGenerationBatch
+from . import activity_partitions
 
 User = get_user_model()
 
@@ -132,3 +155,487 @@ class UserViewSetTests(TestCase):
         self.assertEqual(response.data['monthly_quota'], 300)
         self.assertTrue(response.data['has_daily_quota'])
         self.assertTrue(response.data['has_monthly_quota'])
+
+
+class UserUsageStatsTests(TestCase):
+    """Tests for the usage statistics on the admin user list."""
+    
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(
+            email='admin@example.com', password='password123', first_name='Admin', last_name='User'
+        )
+        self.user = User.objects.create_user(
+            email='user@example.com', password='password123', daily_form_quota=1
+        )
+        self.test_client = Client.objects.create(
+            user=self.user,
+            first_name='Test',
+            last_name='Client',
+            date_of_birth=date(1990, 1, 1),
+            gender='M',
+            marital_status='single',
+            id_number='USAGE123',
+            nationality='Test Country',
+            phone_number='1234567890',
+            address_line1='123 Test St',
+            city='Test City',
+            state='Test State',
+            postal_code='12345',
+            country='Test Country'
+        )
+    
+    def _batch(self, user, created_at):
+        batch = FormGenerationBatch.objects.create(user=user, client=self.test_client)
+        FormGenerationBatch.objects.filter(pk=batch.pk).update(created_at=created_at)
+    
+    def test_annotated_counts(self):
+        now = timezone.make_aware(datetime(2024, 5, 15, 12, 0))
+        for created_at in (now - timedelta(hours=1), now - timedelta(hours=2),
+                           now - timedelta(days=10), now - timedelta(days=20)):
+            self._batch(self.user, created_at)
+        UserActivity.objects.create(user=self.user, action='login', timestamp=now - timedelta(days=2))
+        UserActivity.objects.create(user=self.user, action='login', timestamp=now - timedelta(minutes=5))
+        
+        user = annotate_usage_stats(User.objects.filter(pk=self.user.pk), now=now).get()
+        self.assertEqual(user.forms_today, 2)
+        self.assertEqual(user.forms_this_month, 3)
+        self.assertEqual(user.daily_quota_remaining, 0)
+        self.assertEqual(user.monthly_quota_remaining, 297)
+        self.assertEqual(user.last_activity, now - timedelta(minutes=5))
+        
+        idle = annotate_usage_stats(User.objects.filter(pk=self.superuser.pk), now=now).get()
+        self.assertEqual((idle.forms_today, idle.forms_this_month), (0, 0))
+        self.assertEqual(idle.daily_quota_remaining, idle.daily_form_quota)
+        self.assertIsNone(idle.last_activity)
+    
+    def test_user_list_query_count_is_constant(self):
+        company = BrokerCompany.objects.create(
+            name='Usage Broker', ia_reg_code='USG123', mpfa_reg_code='USG12345',
+            address='Test Address', phone_number='1234567890',
+            responsible_officer_email='responsible@test.com', contact_email='contact@test.com'
+        )
+        for index in range(30):
+            user = User.objects.create_user(
+                email=f'usage{index}@example.com', password='password123', broker_company=company
+            )
+            self._batch(user, timezone.now())
+            UserActivity.objects.create(user=user, action='login')
+        
+        client = APIClient()
+        client.force_authenticate(user=self.superuser)
+        # The paginator's COUNT, the annotated page, and the activity row for this request
+        with self.assertNumQueries(3):
+            response = client.get(reverse('user-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 20)
+        for row in response.data['results']:
+            if row['email'].startswith('usage'):
+                self.assertEqual(row['broker_company'], 'USG123')
+                self.assertEqual(row['forms_today'], 1)
+                self.assertEqual(row['daily_quota_remaining'], 9)
+                self.assertIsNotNone(row['last_activity'])
+
+
+class BrokerCompanyAPITests(TestCase):
+    """Tests for the broker company endpoints."""
+    
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(email='admin@example.com', password='password123')
+        self.company = BrokerCompany.objects.create(
+            name='Count Broker', ia_reg_code='CNT123', mpfa_reg_code='CNT12345',
+            address='Test Address', phone_number='1234567890',
+            responsible_officer_email='responsible@test.com', contact_email='contact@test.com'
+        )
+        for index in range(2):
+            User.objects.create_user(
+                email=f'member{index}@example.com', password='password123', broker_company=self.company
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.superuser)
+    
+    def test_list_and_retrieve_include_user_count(self):
+        response = self.client.get(reverse('broker-company-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['user_count'], 2)
+        
+        url = reverse('broker-company-detail', args=[self.company.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user_count'], 2)
+    
+    def test_create_and_update(self):
+        url = reverse('broker-company-detail', args=[self.company.pk])
+        response = self.client.patch(url, {'name': 'Renamed Broker'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user_count'], 2)
+        
+        data = {
+            'name': 'New Broker', 'ia_reg_code': 'NEW123', 'mpfa_reg_code': 'NEW12345',
+            'address': 'Test Address', 'phone_number': '1234567890',
+            'responsible_officer_email': 'responsible@test.com', 'contact_email': 'contact@test.com',
+        }
+        response = self.client.post(reverse('broker-company-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['user_count'], 0)
+
+
+class ActivityBufferTests(TransactionTestCase):
+    """Tests for buffered activity logging."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='buffer@example.com',
+            password='password123'
+        )
+    
+    def tearDown(self):
+        # Nothing queued may outlive the test database
+        activity_buffer.shutdown()
+    
+    def _activity(self, action='get_test'):
+        return UserActivity(user=self.user, action=action)
+    
+    def test_background_flush_on_interval(self):
+        buffer = ActivityBuffer(max_size=100, flush_size=50, flush_interval=0.05)
+        for _ in range(3):
+            buffer.record(self._activity())
+        
+        deadline = time.monotonic() + 5
+        while buffer.stats()['written'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        buffer.shutdown()
+        self.assertEqual(UserActivity.objects.filter(action='get_test').count(), 3)
+    
+    def test_drops_when_full_and_flushes_on_shutdown(self):
+        buffer = ActivityBuffer(max_size=2, flush_size=50, flush_interval=60)
+        with self.assertLogs('broker_pdf_filler.users.activity_buffer', 'WARNING'):
+            results = [buffer.record(self._activity()) for _ in range(3)]
+        self.assertEqual(results.count(False), 1)
+        
+        buffer.shutdown()
+        stats = buffer.stats()
+        self.assertEqual(stats['dropped'], 1)
+        self.assertEqual(stats['written'], 2)
+        self.assertEqual(stats['queued'], 0)
+        self.assertEqual(UserActivity.objects.filter(action='get_test').count(), 2)
+    
+    @override_settings(ACTIVITY_BUFFER_ENABLED=True)
+    def test_middleware_queues_request_activity(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        client.get(reverse('user-list'))
+        self.assertFalse(UserActivity.objects.filter(user=self.user, action='get_user-list').exists())
+        activity_buffer.shutdown()
+        self.assertTrue(UserActivity.objects.filter(user=self.user, action='get_user-list').exists())
+
+
+
+class ActivityPolicyTests(TestCase):
+    """Tests for activity tracking rules."""
+    
+    def test_first_matching_rule_wins(self):
+        policy = ActivityPolicy(
+            rules=[
+                {'views': ['user-me'], 'record': False},
+                {'views': ['dashboard-*'], 'methods': ['get'], 'sample_rate': 0.5},
+                {'views': ['*'], 'methods': ['GET'], 'sample_rate': 0.0},
+            ],
+            default_sample_rate=1.0,
+        )
+        self.assertEqual(policy.sample_rate('GET', 'user-me'), 0.0)
+        self.assertEqual(policy.sample_rate('GET', 'dashboard-usage'), 0.5)
+        self.assertEqual(policy.sample_rate('GET', 'client-list'), 0.0)
+        self.assertEqual(policy.sample_rate('POST', 'client-list'), 1.0)
+    
+    def test_always_record_overrides_rules(self):
+        policy = ActivityPolicy(
+            rules=[{'views': ['*'], 'record': False}],
+            always_record=['client-export', 'password_*'],
+        )
+        self.assertEqual(policy.should_record('GET', 'client-export'), 1.0)
+        self.assertEqual(policy.should_record('POST', 'password_change'), 1.0)
+        self.assertIsNone(policy.should_record('GET', 'client-list'))
+        self.assertEqual(policy.stats(), {'recorded': 2, 'skipped': 1, 'sampled_out': 0})
+    
+    def test_configured_rules_match_real_view_names(self):
+        policy = ActivityPolicy(
+            rules=settings.ACTIVITY_TRACKING_RULES,
+            always_record=settings.ACTIVITY_ALWAYS_RECORD,
+            default_sample_rate=0.0,
+        )
+        
+        def rate(method, url_name):
+            return policy.sample_rate(method, resolve(reverse(url_name)).view_name)
+        
+        for url_name in ('authentication:login', 'authentication:logout', 'authentication:password_change',
+                         'authentication:password_reset_request', 'authentication:password_reset_confirm'):
+            self.assertEqual(rate('POST', url_name), 1.0, url_name)
+        self.assertEqual(rate('GET', 'client-export'), 1.0)
+        
+        policy = ActivityPolicy(rules=settings.ACTIVITY_TRACKING_RULES, default_sample_rate=1.0)
+        self.assertEqual(policy.sample_rate('POST', resolve(reverse('authentication:token_refresh')).view_name), 0.0)
+        self.assertEqual(policy.sample_rate('GET', resolve(reverse('user-me')).view_name), 0.0)
+    
+    def test_sampling_counts(self):
+        draws = iter([0.05, 0.5, 0.09, 0.95])
+        policy = ActivityPolicy(
+            rules=[{'views': ['batch-detail'], 'sample_rate': 0.1}],
+            rng=lambda: next(draws),
+        )
+        results = [policy.should_record('GET', 'batch-detail') for _ in range(4)]
+        self.assertEqual(results, [0.1, None, 0.1, None])
+        self.assertEqual(policy.stats(), {'recorded': 2, 'skipped': 0, 'sampled_out': 2})
+    
+    def test_invalid_rule_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ActivityPolicy(rules=[{'views': ['*'], 'sample_rate': 2}])
+        with self.assertRaises(ImproperlyConfigured):
+            ActivityPolicy(rules=[{'methods': ['GET'], 'record': True}])
+    
+    def test_excluded_route_not_recorded(self):
+        user = User.objects.create_user(email='policy@example.com', password='password123')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        client.get(reverse('user-me'))
+        client.get(reverse('user-list'))
+        actions = set(UserActivity.objects.filter(user=user).values_list('action', flat=True))
+        self.assertIn('get_user-list', actions)
+        self.assertNotIn('get_user-me', actions)
+    
+    def test_activity_stats_requires_admin(self):
+        user = User.objects.create_user(email='policy@example.com', password='password123')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        self.assertEqual(client.get(reverse('user-activity-stats')).status_code, status.HTTP_403_FORBIDDEN)
+        
+        user.is_staff = True
+        user.save()
+        response = client.get(reverse('user-activity-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('recorded', response.data['tracking'])
+        self.assertIn('dropped', response.data['buffer'])
+
+
+class ActivityRetentionTests(TestCase):
+    """Tests for activity rollups and monthly partitions."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='retention@example.com',
+            password='password123'
+        )
+    
+    def _log(self, action, when):
+        activity = UserActivity.objects.create(user=self.user, action=action)
+        UserActivity.objects.filter(pk=activity.pk).update(timestamp=when)
+    
+    def test_rollup_day_counts_per_user_and_action(self):
+        day = date(2024, 3, 10)
+        noon = timezone.make_aware(datetime(2024, 3, 10, 12))
+        self._log('login', noon)
+        self._log('login', noon)
+        self._log('export', noon)
+        self._log('login', noon + timedelta(days=1))
+        
+        self.assertEqual(ActivityRollupService.rollup_day(day), 2)
+        counts = dict(
+            UserActivityDailyRollup.objects.filter(date=day).values_list('action', 'count')
+        )
+        self.assertEqual(counts, {'login': 2, 'export': 1})
+        
+        # Re-running replaces the day's rows rather than adding to them
+        ActivityRollupService.rollup_day(day)
+        self.assertEqual(UserActivityDailyRollup.objects.filter(date=day).count(), 2)
+    
+    def test_rollup_keeps_days_without_raw_activity(self):
+        # The raw rows of this day were dropped with their partition
+        old_day = timezone.localdate() - timedelta(days=400)
+        UserActivityDailyRollup.objects.create(date=old_day, user=self.user, action='login', count=5)
+        self._log('export', timezone.now() - timedelta(days=1))
+        
+        call_command('rollup_user_activity', '--since', old_day.isoformat(), stdout=StringIO())
+        self.assertEqual(
+            UserActivityDailyRollup.objects.get(date=old_day, user=self.user, action='login').count, 5
+        )
+        self.assertTrue(UserActivityDailyRollup.objects.filter(action='export', count=1).exists())
+    
+    def test_partition_month_helpers(self):
+        self.assertEqual(activity_partitions.add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(activity_partitions.add_months(date(2024, 1, 1), -1), date(2023, 12, 1))
+        self.assertEqual(
+            activity_partitions.partition_name(date(2024, 3, 1)), 'users_useractivity_p202403'
+        )
+    
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'Partitioning requires PostgreSQL')
+    def test_create_and_drop_partition(self):
+        self.assertTrue(activity_partitions.is_partitioned())
+        month = date(2019, 6, 1)
+        self._log('login', timezone.make_aware(datetime(2019, 6, 15)))
+        
+        # The row sits in the default partition until its month is created
+        self.assertTrue(activity_partitions.create_partition(month))
+        self.assertFalse(activity_partitions.create_partition(month))
+        self.assertIn(month, activity_partitions.list_partitions())
+        self.assertIn(month, activity_partitions.expired_partitions(12))
+        self.assertEqual(UserActivity.objects.filter(action='login').count(), 1)
+        
+        activity_partitions.drop_partition(month)
+        self.assertNotIn(month, activity_partitions.list_partitions())
+        self.assertFalse(UserActivity.objects.filter(action='login').exists())
+    
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'Partitioning requires PostgreSQL')
+    def test_manage_partitions_rolls_up_before_dropping(self):
+        month = date(2019, 6, 1)
+        self._log('login', timezone.make_aware(datetime(2019, 6, 15, 9)))
+        activity_partitions.create_partition(month)
+        
+        out = StringIO()
+        call_command('manage_activity_partitions', retain_months=12, stdout=out)
+        self.assertIn('Dropped users_useractivity_p201906', out.getvalue())
+        self.assertNotIn(month, activity_partitions.list_partitions())
+        self.assertEqual(
+            UserActivityDailyRollup.objects.get(date=date(2019, 6, 15), action='login').count, 1
+        )
+
+
+class EmailOutboxTests(TestCase):
+    """Tests for the transactional email outbox."""
+    
+    def test_queued_emails_sent_in_batches(self):
+        for index in range(3):
+            queue_email(f'Subject {index}', 'Body', [f'user{index}@example.com'], html_body='<p>Body</p>')
+        self.assertEqual(len(mail.outbox), 0)
+        
+        self.assertEqual(send_pending(batch_size=2), (2, 0))
+        self.assertEqual(drain(), (1, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertFalse(OutboxEmail.objects.exclude(status='sent').exists())
+    
+    def test_failed_send_retried_with_backoff(self):
+        email = queue_email('Subject', 'Body', ['user@example.com'])
+        with mock.patch('django.core.mail.EmailMultiAlternatives.send', side_effect=SMTPException('down')), \
+                self.assertLogs('broker_pdf_filler.users.outbox', 'WARNING'):
+            self.assertEqual(send_pending(), (0, 1))
+        
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(send_pending(), (0, 0))  # Not due yet
+        
+        OutboxEmail.objects.filter(pk=email.pk).update(attempts=4, next_attempt_at=timezone.now())
+        with mock.patch('django.core.mail.EmailMultiAlternatives.send', side_effect=SMTPException('down')), \
+                self.assertLogs('broker_pdf_filler.users.outbox', 'WARNING'):
+            send_pending()
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'failed')
+
+    def test_claimed_emails_sent_outside_transaction(self):
+        claimed = queue_email('Claimed', 'Body', ['claimed@example.com'])
+        stale = queue_email('Stale', 'Body', ['stale@example.com'])
+        now = timezone.now()
+        OutboxEmail.objects.filter(pk=claimed.pk).update(
+            status='sending', lease_expires_at=now + timedelta(minutes=5)
+        )
+        OutboxEmail.objects.filter(pk=stale.pk).update(
+            status='sending', lease_expires_at=now - timedelta(seconds=1)
+        )
+
+        depth = len(connection.savepoint_ids)
+
+        def send(message):
+            # The claim is done before any message goes out, not held around it
+            self.assertEqual(OutboxEmail.objects.get(pk=stale.pk).status, 'sending')
+            self.assertEqual(len(connection.savepoint_ids), depth)
+            return 1
+
+        with mock.patch('django.core.mail.EmailMultiAlternatives.send', autospec=True, side_effect=send):
+            self.assertEqual(send_pending(), (1, 0))
+
+        stale.refresh_from_db()
+        claimed.refresh_from_db()
+        self.assertEqual(stale.status, 'sent')
+        self.assertIsNone(stale.lease_expires_at)
+        self.assertEqual(claimed.status, 'sending')
+
+    def test_password_reset_request_queues_email(self):
+        user = User.objects.create_user(email='outbox@example.com', password='password123')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        
+        response = client.post(reverse('user-reset-password-request'), {'email': 'outbox@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        client.force_authenticate(user=None)
+        response = client.post(
+            reverse('authentication:password_reset_request'), {'email': 'outbox@example.com'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.filter(recipients=['outbox@example.com']).count(), 2)
+        drain()
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class OneTimeTokenTests(TestCase):
+    """Tests for hashed single-use verification and reset tokens."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(email='token@example.com', password='password123')
+        self.client = APIClient()
+    
+    def test_only_digest_is_stored(self):
+        token = self.user.generate_email_verification_token()
+        stored = OneTimeToken.objects.get(user=self.user)
+        self.assertNotEqual(stored.digest, token)
+        self.assertEqual(stored.digest, OneTimeToken.hash(token))
+        self.assertEqual(stored.purpose, 'email_verification')
+    
+    def test_token_consumed_once(self):
+        token = self.user.generate_password_reset_token()
+        self.assertIsNone(OneTimeToken.objects.consume(token, 'email_verification'))
+        self.assertEqual(OneTimeToken.objects.consume(token, 'password_reset'), self.user.pk)
+        self.assertIsNone(OneTimeToken.objects.consume(token, 'password_reset'))
+    
+    def test_reissue_and_expiry_invalidate_tokens(self):
+        first = self.user.generate_password_reset_token()
+        second = self.user.generate_password_reset_token()
+        self.assertIsNone(OneTimeToken.objects.consume(first, 'password_reset'))
+        
+        OneTimeToken.objects.filter(user=self.user).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(OneTimeToken.objects.consume(second, 'password_reset'))
+    
+    def test_verify_email_endpoint(self):
+        token = self.user.generate_email_verification_token()
+        url = reverse('user-verify-email')
+        
+        response = self.client.post(url, {'token': token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.email_verified)
+        
+        response = self.client.post(url, {'token': token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_reset_password_confirm_endpoint(self):
+        token = self.user.generate_password_reset_token()
+        data = {'token': token, 'new_password': 'N3w-passw0rd!', 'new_password2': 'N3w-passw0rd!'}
+        self.client.force_authenticate(user=self.user)
+        
+        response = self.client.post(reverse('user-reset-password-confirm'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('N3w-passw0rd!'))
+        self.assertFalse(OneTimeToken.objects.filter(user=self.user).exists())
+    
+    def test_purge_expired_in_chunks(self):
+        expired = timezone.now() - timedelta(hours=1)
+        for index in range(5):
+            user = User.objects.create_user(email=f'expired{index}@example.com', password='password123')
+            user.generate_password_reset_token()
+        OneTimeToken.objects.update(expires_at=expired)
+        self.user.generate_email_verification_token()
+        
+        self.assertEqual(OneTimeToken.objects.purge_expired(chunk_size=2), 5)
+        self.assertEqual(OneTimeToken.objects.count(), 1)
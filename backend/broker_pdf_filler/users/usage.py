@@ -0,0 +1,58 @@
+"""
+Per-user usage statistics for the admin user list.
+
+``annotate_usage_stats`` adds the following to a ``User`` queryset:
+
+- ``forms_today`` / ``forms_this_month``: form sets (batches) generated since
+  the start of the current day / month;
+- ``daily_quota_remaining`` / ``monthly_quota_remaining``: the user's quota
+  minus those counts, never below zero;
+- ``last_activity``: timestamp of the user's most recent activity.
+
+Each statistic is a correlated subquery served by the ``(user, created_at)``
+and ``(user, timestamp)`` indexes, so a page of users is fetched in a single
+query however many forms and activity rows they have.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from ..pdf_forms.models import FormGenerationBatch
+from .models import UserActivity
+
+
+def _batches_since(since):
+    batches = (
+        FormGenerationBatch.objects
+        .filter(user=OuterRef('pk'), created_at__gte=since)
+        .order_by()
+        .values('user')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    return Coalesce(Subquery(batches, output_field=IntegerField()), Value(0))
+
+
+def annotate_usage_stats(queryset, now=None):
+    """Annotate a User queryset with form counts, remaining quota and last activity."""
+    now = timezone.localtime(now)
+    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    start_of_month = start_of_day.replace(day=1)
+    last_activity = (
+        UserActivity.objects
+        .filter(user=OuterRef('pk'))
+        .order_by('-timestamp')
+        .values('timestamp')[:1]
+    )
+    return queryset.annotate(
+        forms_today=_batches_since(start_of_day),
+        forms_this_month=_batches_since(start_of_month),
+        last_activity=Subquery(last_activity),
+    ).annotate(
+        daily_quota_remaining=Greatest(
+            F('daily_form_quota') - F('forms_today'), Value(0), output_field=IntegerField()
+        ),
+        monthly_quota_remaining=Greatest(
+            F('monthly_form_quota') - F('forms_this_month'), Value(0), output_field=IntegerField()
+        ),
+    )
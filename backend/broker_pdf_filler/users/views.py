@@ -6,11 +6,16 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Count, Q
 from django.conf import settings
-from .models import UserActivity, UserQuotaUsage, BrokerCompany, InsuranceCompanyAccount
+from .models import UserActivity, UserQuotaUsage, BrokerCompany, InsuranceCompanyAccount, OneTimeToken
+from .activity_buffer import activity_buffer
+from .activity_policy import activity_policy
+from .outbox import queue_email
+from .usage import annotate_usage_stats
 from .serializers.auth import (
-    UserSerializer, UserRegistrationSerializer, CustomTokenObtainPairSerializer,
+    UserSerializer, UserUsageSerializer, UserRegistrationSerializer, CustomTokenObtainPairSerializer,
     PasswordChangeSerializer, PasswordResetRequestSerializer, PasswordResetConfirmSerializer,
     EmailVerificationSerializer
 )
@@ -22,6 +27,7 @@ User = get_user_model()
 class CustomTokenObtainPairView(TokenObtainPairView):
     """Custom token view that includes user data in response."""
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_scope = 'login'
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -50,17 +56,22 @@ class UserViewSet(viewsets.ModelViewSet):
         else:
             return User.objects.filter(id=user.id).order_by('id')
     
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return UserUsageSerializer
+        return super().get_serializer_class()
+
     def list(self, request, *args, **kwargs):
-        """Override list method to apply filtering."""
-        queryset = self.get_queryset()
+        """Override list method to apply filtering and usage statistics."""
+        queryset = self.get_queryset().select_related('broker_company')
         
         # Apply search filter if provided
         search_query = request.query_params.get('search', '')
         if search_query:
             queryset = queryset.filter(
-                models.Q(email__icontains=search_query) |
-                models.Q(first_name__icontains=search_query) |
-                models.Q(last_name__icontains=search_query)
+                Q(email__icontains=search_query) |
+                Q(first_name__icontains=search_query) |
+                Q(last_name__icontains=search_query)
             )
         
         # Apply role filter if provided
@@ -68,6 +79,9 @@ class UserViewSet(viewsets.ModelViewSet):
         if role_filter:
             queryset = queryset.filter(role=role_filter)
         
+        # Forms generated, remaining quota and last activity, in the same query
+        queryset = annotate_usage_stats(queryset)
+        
         # Get paginated response
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -85,23 +99,24 @@ class UserViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             try:
                 print("Validated data:", serializer.validated_data)
-                user = serializer.save()
-                print("Created user:", user.id)
-                
-                # Generate and send email verification token
-                token = user.generate_email_verification_token()
-                self._send_verification_email(user, token)
-                
-                # Track user creation activity
-                UserActivity.objects.create(
-                    user=user,
-                    action='user_created',
-                    ip_address=self._get_client_ip(request),
-                    details={'created_by': str(request.user.id) if request.user.is_authenticated else None}
-                )
-                
-                # Create initial quota usage record
-                UserQuotaUsage.objects.create(user=user)
+                with transaction.atomic():
+                    user = serializer.save()
+                    print("Created user:", user.id)
+                    
+                    # Generate the email verification token and queue the email
+                    token = user.generate_email_verification_token()
+                    self._queue_verification_email(user, token)
+                    
+                    # Track user creation activity
+                    UserActivity.objects.create(
+                        user=user,
+                        action='user_created',
+                        ip_address=self._get_client_ip(request),
+                        details={'created_by': str(request.user.id) if request.user.is_authenticated else None}
+                    )
+                    
+                    # Create initial quota usage record
+                    UserQuotaUsage.objects.create(user=user)
                 
                 # Use UserSerializer for the response to ensure proper serialization
                 response_serializer = UserSerializer(user)
@@ -129,25 +144,24 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = EmailVerificationSerializer(data=request.data)
         if serializer.is_valid():
             token = serializer.validated_data['token']
-            try:
-                user = User.objects.get(email_verification_token=token)
-                if user.verify_email_token(token):
-                    # Track email verification activity
-                    UserActivity.objects.create(
-                        user=user,
-                        action='email_verified',
-                        ip_address=self._get_client_ip(request)
+            with transaction.atomic():
+                user_id = OneTimeToken.objects.consume(token, 'email_verification')
+                if user_id is None:
+                    return Response(
+                        {'error': 'Invalid or expired token.'},
+                        status=status.HTTP_400_BAD_REQUEST
                     )
-                    return Response({'detail': 'Email verified successfully.'})
-                return Response(
-                    {'error': 'Invalid or expired token.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            except User.DoesNotExist:
-                return Response(
-                    {'error': 'Invalid token.'},
-                    status=status.HTTP_400_BAD_REQUEST
+                user = User.objects.get(pk=user_id)
+                user.email_verified = True
+                user.save(update_fields=['email_verified', 'updated_at'])
+                
+                # Track email verification activity
+                UserActivity.objects.create(
+                    user=user,
+                    action='email_verified',
+                    ip_address=self._get_client_ip(request)
                 )
+            return Response({'detail': 'Email verified successfully.'})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=True, methods=['post'])
@@ -178,15 +192,16 @@ class UserViewSet(viewsets.ModelViewSet):
             email = serializer.validated_data['email']
             try:
                 user = User.objects.get(email=email)
-                token = user.generate_password_reset_token()
-                self._send_password_reset_email(user, token)
-                
-                # Track password reset request activity
-                UserActivity.objects.create(
-                    user=user,
-                    action='password_reset_request',
-                    ip_address=self._get_client_ip(request)
-                )
+                with transaction.atomic():
+                    token = user.generate_password_reset_token()
+                    self._queue_password_reset_email(user, token)
+                    
+                    # Track password reset request activity
+                    UserActivity.objects.create(
+                        user=user,
+                        action='password_reset_request',
+                        ip_address=self._get_client_ip(request)
+                    )
                 
                 return Response({'detail': 'Password reset email sent if account exists.'})
             except User.DoesNotExist:
@@ -202,31 +217,24 @@ class UserViewSet(viewsets.ModelViewSet):
             token = serializer.validated_data['token']
             new_password = serializer.validated_data['new_password']
             
-            try:
-                user = User.objects.get(reset_password_token=token)
-                if user.verify_password_reset_token(token):
-                    user.set_password(new_password)
-                    user.reset_password_token = None
-                    user.reset_password_token_expiry = None
-                    user.save()
-                    
-                    # Track password reset activity
-                    UserActivity.objects.create(
-                        user=user,
-                        action='password_reset',
-                        ip_address=self._get_client_ip(request)
+            with transaction.atomic():
+                user_id = OneTimeToken.objects.consume(token, 'password_reset')
+                if user_id is None:
+                    return Response(
+                        {'error': 'Invalid or expired token.'},
+                        status=status.HTTP_400_BAD_REQUEST
                     )
-                    
-                    return Response({'detail': 'Password reset successful.'})
-                return Response(
-                    {'error': 'Invalid or expired token.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            except User.DoesNotExist:
-                return Response(
-                    {'error': 'Invalid token.'},
-                    status=status.HTTP_400_BAD_REQUEST
+                user = User.objects.get(pk=user_id)
+                user.set_password(new_password)
+                user.save()
+                
+                # Track password reset activity
+                UserActivity.objects.create(
+                    user=user,
+                    action='password_reset',
+                    ip_address=self._get_client_ip(request)
                 )
+            return Response({'detail': 'Password reset successful.'})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['get'])
@@ -254,6 +262,14 @@ class UserViewSet(viewsets.ModelViewSet):
             'has_monthly_quota': quota_usage.has_monthly_quota_available()
         })
     
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def activity_stats(self, request):
+        """Get counters of recorded, skipped and buffered request activity for this process."""
+        return Response({
+            'tracking': activity_policy.stats(),
+            'buffer': activity_buffer.stats(),
+        })
+    
     def _get_client_ip(self, request):
         """Extract client IP address from request."""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -263,26 +279,22 @@ class UserViewSet(viewsets.ModelViewSet):
             ip = request.META.get('REMOTE_ADDR')
         return ip
     
-    def _send_verification_email(self, user, token):
-        """Send email verification link."""
+    def _queue_verification_email(self, user, token):
+        """Queue the email verification link in the outbox."""
         verification_url = f"{settings.FRONTEND_URL}/verify-email?token={token}"
-        send_mail(
+        queue_email(
             'Verify your email address',
             f'Please click the following link to verify your email address: {verification_url}',
-            settings.DEFAULT_FROM_EMAIL,
             [user.email],
-            fail_silently=False,
         )
     
-    def _send_password_reset_email(self, user, token):
-        """Send password reset link."""
+    def _queue_password_reset_email(self, user, token):
+        """Queue the password reset link in the outbox."""
         reset_url = f"{settings.FRONTEND_URL}/reset-password?token={token}"
-        send_mail(
+        queue_email(
             'Reset your password',
             f'Please click the following link to reset your password: {reset_url}',
-            settings.DEFAULT_FROM_EMAIL,
             [user.email],
-            fail_silently=False,
         )
 
 
@@ -295,12 +307,13 @@ class BrokerCompanyViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Filter queryset based on user role."""
         user = self.request.user
+        queryset = BrokerCompany.objects.annotate(users_total=Count('users'))
         if user.is_superuser:
-            return BrokerCompany.objects.all().order_by('name')
+            return queryset.order_by('name')
         elif user.role == 'admin':
-            return BrokerCompany.objects.filter(id=user.broker_company.id).order_by('name')
+            return queryset.filter(id=user.broker_company_id).order_by('name')
         else:
-            return BrokerCompany.objects.filter(id=user.broker_company.id).order_by('name')
+            return queryset.filter(id=user.broker_company_id).order_by('name')
 
 
 class InsuranceCompanyAccountViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,113 @@
+"""
+Conditional GET support for read endpoints.
+
+``ConditionalGetMixin`` derives an ETag and Last-Modified value for ``list``
+and ``retrieve`` from a single aggregate query (max timestamps plus row
+counts) over the same queryset the view would serialize. When the request's
+``If-None-Match`` / ``If-Modified-Since`` headers match, a 304 is returned
+before the page is fetched or any serializer runs.
+
+Deleting a row advances none of the timestamps, so Last-Modified is only sent
+where the timestamps cover every change: ``retrieve`` of a view that counts
+nothing but the object itself. Lists, and details that count related rows,
+rely on the ETag alone.
+
+Keyset-paginated lists (``?pagination=cursor``) get no validators: they exist
+so deep pages stay cheap, and an aggregate over the whole filtered queryset
+on every page would undo that.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, F, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """Adds ETag / Last-Modified validators to a viewset's list and retrieve.
+
+    Views describe what makes their representation change through
+    ``conditional_aggregates``: every ``Max`` is treated as a modification
+    timestamp, and counts catch deletions that leave the maxima unchanged.
+    """
+
+    conditional_aggregates = {
+        'modified': Max('updated_at'),
+        'count': Count('pk'),
+    }
+
+    def list(self, request, *args, **kwargs):
+        wants_keyset = getattr(self.paginator, 'wants_keyset', None)
+        if wants_keyset is not None and wants_keyset(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._conditional_response(request, queryset, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return self._conditional_response(request, queryset, super().retrieve, *args, **kwargs)
+
+    def get_validators(self, queryset):
+        """Return ``(etag, last modified timestamp)`` for ``queryset``, or ``None``."""
+        try:
+            values = queryset.order_by().aggregate(**self.conditional_aggregates)
+        except (ValueError, ValidationError):
+            # Malformed lookup value; let the normal view produce the error
+            return None
+
+        timestamps = [
+            values[name] for name, aggregate in self.conditional_aggregates.items()
+            if isinstance(aggregate, Max) and values[name] is not None
+        ]
+        last_modified = None
+        if timestamps and self.last_modified_is_reliable():
+            last_modified = int(max(timestamps).timestamp())
+
+        # The same data renders differently per user, page, filter and format
+        digest = hashlib.sha1()
+        for part in (
+            self.request.user.pk,
+            self.request.get_full_path(),
+            self.request.META.get('HTTP_ACCEPT', ''),
+            *(values[name] for name in sorted(values)),
+        ):
+            digest.update(repr(part).encode('utf-8'))
+            digest.update(b'\0')
+        etag = 'W/' + quote_etag(digest.hexdigest())
+        return etag, last_modified
+
+    def last_modified_is_reliable(self):
+        """Whether the modification timestamps alone reveal every change.
+
+        Counts only exist to catch deletions, which no timestamp reflects.
+        """
+        if self.action != 'retrieve':
+            return False
+        return all(
+            isinstance(aggregate, Max) or aggregate.get_source_expressions()[0] == F('pk')
+            for aggregate in self.conditional_aggregates.values()
+        )
+
+    def _conditional_response(self, request, queryset, view, *args, **kwargs):
+        validators = self.get_validators(queryset)
+        if validators is None:
+            return view(request, *args, **kwargs)
+        etag, last_modified = validators
+
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Representations are per user; make clients revalidate instead of reusing blindly
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,162 @@
+"""
+List pagination for the API.
+
+``PageNumberPagination`` runs ``COUNT(*)`` on every page and reads deep pages
+with a large ``OFFSET``. Listings that can grow large opt in to keyset
+pagination with ``?pagination=cursor``: pages are fetched with a
+``(created_at, id) < (last created_at, last id)`` predicate served by a
+composite ``(user, created_at, id)`` index, so every page costs the same
+regardless of depth and no count is run. ``?count=estimate`` adds the
+planner's row estimate as ``estimated_count`` instead of an exact count.
+Keyset pages are always newest first, so requests that order the results
+otherwise (``?ordering=``, ranked search results) are rejected in cursor mode
+rather than silently reordered.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """Return the planner's row estimate for ``queryset`` without counting.
+
+    Falls back to an exact count on databases other than PostgreSQL.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+    return queryset.count()
+
+
+class KeysetPagination(BasePagination):
+    """Opaque-cursor pagination ordered by ``(created_at, id)``, newest first."""
+
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+    # Explicit orderings the (created_at, id) keyset reproduces
+    compatible_orderings = ((), ('-created_at',), ('-created_at', '-id'))
+    invalid_ordering_message = 'Cursor pagination only supports the default newest-first ordering.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if tuple(queryset.query.order_by) not in self.compatible_orderings:
+            raise ValidationError({'pagination': [self.invalid_ordering_message]})
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        created_at, pk, reverse = self.decode_cursor(request)
+
+        # Previous pages are read in ascending order and flipped back below
+        if reverse:
+            ordered = queryset.order_by('created_at', 'id')
+        else:
+            ordered = queryset.order_by('-created_at', '-id')
+        if created_at is not None:
+            if reverse:
+                position = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            else:
+                position = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            ordered = ordered.filter(position)
+
+        # One extra row tells us whether there is a further page
+        rows = list(ordered[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, created_at is not None
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+
+        self.estimated_count = None
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.estimated_count = estimate_count(queryset)
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return datetime.fromisoformat(data['c']), data['i'], bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        data = {'c': row.created_at.isoformat(), 'i': str(row.pk)}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last_row is None:
+            return None
+        return self.encode_cursor(self.last_row, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_row is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first_row, reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.estimated_count is not None:
+            payload['estimated_count'] = self.estimated_count
+        payload['results'] = data
+        return Response(payload)
+
+
+class OptInKeysetPagination(PageNumberPagination):
+    """Page-number pagination that switches to keyset pagination on request.
+
+    Clients opt in with ``?pagination=cursor``; the links returned by the
+    keyset paginator keep that parameter, so following them stays in cursor
+    mode.
+    """
+
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def wants_keyset(self, request):
+        return request.query_params.get(self.mode_query_param) == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.wants_keyset(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,37 @@
+"""
+Registry of standardized client fields.
+
+The registry (``settings.STANDARDIZED_FIELDS_PATH``) maps each standardized
+field key, e.g. ``fullNameChinese`` or ``DOB_D``, to its display name,
+category, whether it is required and the guide used for LLM extraction. It is
+read once per process.
+"""
+import hashlib
+import json
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _load():
+    try:
+        with open(settings.STANDARDIZED_FIELDS_PATH, 'rb') as f:
+            raw = f.read()
+        return json.loads(raw), hashlib.sha256(raw).hexdigest()[:16]
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        logger.error(f"Error loading standardized fields from {settings.STANDARDIZED_FIELDS_PATH}: {str(e)}")
+        return {}, 'missing'
+
+
+def get_standardized_fields():
+    """Return ``{field key: definition}`` for every standardized field."""
+    return _load()[0]
+
+
+def registry_version():
+    """Return a short content hash that changes whenever the registry file does."""
+    return _load()[1]
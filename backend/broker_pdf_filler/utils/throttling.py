@@ -0,0 +1,215 @@
+"""
+Sliding-window API throttling.
+
+Throttles estimate the request rate over the last window with the sliding
+window counter method: each key keeps a counter for the current fixed window
+and the previous one, and the previous count is weighted by how much of it
+still overlaps the sliding window::
+
+    estimate = previous * (1 - elapsed_fraction) + current
+
+That avoids the burst at window boundaries that fixed windows allow, while
+needing only two counters per key. Like DRF's ``SimpleRateThrottle``, only
+admitted requests are counted: rejected ones don't extend the block, so a
+client retrying after ``Retry-After`` gets back in. Checking and counting
+happen atomically in one call to the counter store: a locked dict in memory
+(tests, single process) or one Lua script round trip to Redis
+(``THROTTLE_STORE_URL``, shared by all workers).
+
+Rates are written ``<requests>/<period>``, where the period is ``s``, ``m``,
+``h`` or ``d`` (or ``second``, ``minute``, ...), optionally prefixed with a
+count, e.g. ``'5/15m'``. They come from ``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``
+keyed by scope.
+"""
+import re
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import SimpleRateThrottle
+
+KEY_PREFIX = 'throttle'
+_RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([a-z]+)\s*$')
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Return ``(requests, period in seconds)`` for a rate string, or ``(None, None)``."""
+    if rate is None:
+        return None, None
+    match = _RATE_RE.match(str(rate).lower())
+    if not match or match.group(3)[0] not in _PERIODS:
+        raise ImproperlyConfigured(f"Invalid throttle rate: {rate!r}")
+    multiplier = int(match.group(2)) if match.group(2) else 1
+    return int(match.group(1)), multiplier * _PERIODS[match.group(3)[0]]
+
+
+class MemoryCounterStore:
+    """Per-process counters; for tests and single-process deployments."""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._next_prune = 0
+
+    def hit(self, key, window, now, limit, weight):
+        """Count a hit unless ``previous * weight + current + 1`` would exceed ``limit``.
+
+        Returns ``(allowed, current window count, previous window count)``.
+        """
+        slot = int(now // window)
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+            current_key = (key, window, slot)
+            count, _ = self._counters.get(current_key, (0, None))
+            previous = self._counters.get((key, window, slot - 1), (0, None))[0]
+            if previous * weight + count + 1 > limit:
+                return False, count, previous
+            self._counters[current_key] = (count + 1, (slot + 2) * window)
+        return True, count + 1, previous
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+
+    def _prune(self, now):
+        self._counters = {
+            key: value for key, value in self._counters.items() if value[1] > now
+        }
+        self._next_prune = now + 60
+
+
+class RedisCounterStore:
+    """Counters in Redis, shared between workers; one round trip per hit."""
+
+    # Check and count atomically, so concurrent workers can't overshoot the limit
+    HIT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * tonumber(ARGV[2]) + current + 1 > tonumber(ARGV[1]) then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {1, current, previous}
+"""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('THROTTLE_STORE_URL requires the redis package')
+        self._client = redis.Redis.from_url(url)
+        self._hit = self._client.register_script(self.HIT_SCRIPT)
+
+    def hit(self, key, window, now, limit, weight):
+        slot = int(now // window)
+        allowed, current, previous = self._hit(
+            keys=[f'{key}:{window}:{slot}', f'{key}:{window}:{slot - 1}'],
+            args=[limit, repr(weight), 2 * window],
+        )
+        return bool(allowed), int(current), int(previous)
+
+    def clear(self):
+        for key in self._client.scan_iter(f'{KEY_PREFIX}:*'):
+            self._client.delete(key)
+
+
+@lru_cache(maxsize=1)
+def get_counter_store():
+    url = getattr(settings, 'THROTTLE_STORE_URL', '')
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCounterStore(url)
+    return MemoryCounterStore()
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """Base class for sliding-window throttles; subclasses define ``get_cache_key``."""
+
+    def parse_rate(self, rate):
+        return parse_rate(rate)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        elapsed = (now % self.duration) / self.duration
+        allowed, current, previous = get_counter_store().hit(
+            self.key, self.duration, now, self.num_requests, 1 - elapsed
+        )
+        self.current, self.previous, self.elapsed = current, previous, elapsed
+        return allowed
+
+    def wait(self):
+        """Seconds until one more request would be admitted."""
+        remaining = (1 - self.elapsed) * self.duration
+        if self.num_requests < 1:
+            return None
+        if self.current + 1 > self.num_requests:
+            # The current window is full: wait for the next one, where this
+            # window's count weighs previous * (1 - t) until the fraction t
+            # satisfies previous * (1 - t) + 1 <= limit
+            fraction = 1 - (self.num_requests - 1) / self.current
+            return remaining + max(fraction, 0) * self.duration
+        # Solve previous * (1 - t) + current + 1 <= limit for the window fraction t
+        fraction = 1 - (self.num_requests - self.current - 1) / self.previous
+        return max(fraction - self.elapsed, 0) * self.duration
+
+    def timer(self):
+        return time.time()
+
+
+class UserSlidingRateThrottle(SlidingWindowRateThrottle):
+    """Overall rate per authenticated user."""
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return f'{KEY_PREFIX}:{self.scope}:{request.user.pk}'
+
+
+class AnonSlidingRateThrottle(SlidingWindowRateThrottle):
+    """Overall rate per client IP for unauthenticated requests."""
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f'{KEY_PREFIX}:{self.scope}:{self.get_ident(request)}'
+
+
+class ScopedSlidingRateThrottle(SlidingWindowRateThrottle):
+    """Rate per user (or IP when anonymous) for views that set ``throttle_scope``.
+
+    Viewsets that limit a single action set ``self.throttle_scope`` in
+    ``get_throttles()``.
+    """
+
+    def __init__(self):
+        # The scope, and so the rate, depends on the view being throttled
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f'{KEY_PREFIX}:{self.scope}:{ident}'
+